@@ -0,0 +1,109 @@
+"""Bundles of files streamed back-to-back in one body
+
+A bundle is a sequence of frames without any separator, and every frame is:
+
+* path length: unsigned 4 bytes integer in network byte order
+* path: utf-8 encoded file path
+* size: unsigned 8 bytes integer in network byte order
+* content: `size` bytes of file content
+
+A file truncated while streaming is padded to its frame size, and followed
+by a failed frame of the same path, which is a frame header of the max size
+without content.
+"""
+import asyncio
+import struct
+from typing import (
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Dict,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from distributed.hashing import MultiHash
+
+_PATH_LENGTH = struct.Struct("!I")
+_SIZE = struct.Struct("!Q")
+# size of failed frame
+_FAILED_SIZE = 2 ** 64 - 1
+
+
+def pack_frame_header(file_path: str, size: int) -> bytes:
+    """Pack frame header to be followed by `size` bytes of file content"""
+    path = file_path.encode("utf-8")
+    return _PATH_LENGTH.pack(len(path)) + path + _SIZE.pack(size)
+
+
+def pack_failed_frame(file_path: str) -> bytes:
+    """Pack failed frame telling that the previous frame of path is invalid"""
+    return pack_frame_header(file_path, _FAILED_SIZE)
+
+
+async def read_frame_header(
+    read_exactly: Callable[[int], Awaitable[bytes]]
+) -> Optional[Tuple[str, int]]:
+    """Read file path and size of the next frame, `None` at end of bundle
+
+    Raise `asyncio.IncompleteReadError` for truncated bundle.
+    """
+    try:
+        data = await read_exactly(_PATH_LENGTH.size)
+    except asyncio.IncompleteReadError as ex:
+        if ex.partial:
+            raise
+        return None
+    (path_length,) = _PATH_LENGTH.unpack(data)
+    file_path = (await read_exactly(path_length)).decode("utf-8")
+    (size,) = _SIZE.unpack(await read_exactly(_SIZE.size))
+    return file_path, size
+
+
+async def iter_bundle_hashes(
+    read_exactly: Callable[[int], Awaitable[bytes]],
+    chunk_size: int,
+    algorithms: Sequence[str],
+) -> AsyncGenerator[Tuple[str, Optional[Dict[str, str]]], None]:
+    """Hash files of a bundle incrementally while parsing it
+
+    Yield file path and hex digests of hash algorithms of every frame, or
+    `None` for failed frame. Raise `asyncio.IncompleteReadError` for
+    truncated bundle after frames complete so far.
+    """
+    while True:
+        header = await read_frame_header(read_exactly)
+        if header is None:
+            break
+        file_path, remaining = header
+        if remaining == _FAILED_SIZE:
+            yield file_path, None
+            continue
+        h = MultiHash(algorithms)
+        while remaining:
+            chunk = await read_exactly(min(chunk_size, remaining))
+            h.update(chunk)
+            remaining -= len(chunk)
+        yield file_path, h.hexdigests()
+
+
+async def hash_bundle(
+    read_exactly: Callable[[int], Awaitable[bytes]],
+    chunk_size: int,
+    algorithms: Sequence[str],
+) -> Dict[str, Dict[str, str]]:
+    """Hash files of a bundle incrementally while parsing it
+
+    Return file path -> hex digests of hash algorithms, without failed
+    files.
+    """
+    result: Dict[str, Dict[str, str]] = {}
+    async for file_path, hashes in iter_bundle_hashes(
+        read_exactly, chunk_size, algorithms
+    ):
+        if hashes is None:
+            result.pop(file_path, None)
+        else:
+            result[file_path] = hashes
+    return result
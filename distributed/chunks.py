@@ -0,0 +1,47 @@
+from typing import List, Optional, Tuple
+
+from distributed.hashing import new_hash
+
+# file path can not contain NUL character
+_CHUNK_KEY_SEPARATOR = "\0"
+
+
+def get_chunk_key(file_path: str, chunk: int) -> str:
+    """Key of a file chunk job, along with file paths as job keys"""
+    return f"{file_path}{_CHUNK_KEY_SEPARATOR}{chunk}"
+
+
+def split_chunk_key(key: str) -> Tuple[str, Optional[int]]:
+    """Split job key into file path and chunk index (`None` for file job)"""
+    file_path, sep, chunk = key.partition(_CHUNK_KEY_SEPARATOR)
+    if not sep:
+        return file_path, None
+    return file_path, int(chunk)
+
+
+def is_chunk_key(key: str) -> bool:
+    return _CHUNK_KEY_SEPARATOR in key
+
+
+def get_chunks_number(file_size: int, chunk_size: int) -> int:
+    return (file_size + chunk_size - 1) // chunk_size
+
+
+def get_chunk_range(
+    file_size: int, chunk_size: int, chunk: int
+) -> Tuple[int, int]:
+    """Get offset and length of a file chunk"""
+    offset = chunk * chunk_size
+    return offset, min(chunk_size, file_size - offset)
+
+
+def calc_tree_hash(chunk_hashes: List[str], algorithm: str = "sha1") -> str:
+    """Combine hex digests of file chunks into a tree hash
+
+    The tree hash is the hex digest of all raw chunk digests in order, by the
+    same hash algorithm of the chunk digests.
+    """
+    h = new_hash(algorithm)
+    for chunk_hash in chunk_hashes:
+        h.update(bytes.fromhex(chunk_hash))
+    return h.hexdigest()
@@ -0,0 +1,48 @@
+import os.path
+import time
+from typing import Any
+
+import psutil
+
+
+class CompressionPolicy:
+    """Decide whether to compress a file transferred to a worker
+
+    Files are transferred as is if compression is disabled, if they are
+    small or already compressed (by file extension), or while master
+    process is busy, so that compression does not become the bottleneck.
+    CPU percent of master process is per core, since files are compressed
+    in its event loop thread, regardless of other processes of the host.
+    """
+
+    def __init__(self, config: Any) -> None:
+        self.config = config
+        self._skip_extensions = {
+            extension.lower()
+            for extension in self.config.COMPRESSION_SKIP_EXTENSIONS
+        }
+        self._process = psutil.Process()
+        self._cpu_busy = False
+        self._cpu_checked_at = 0.0
+
+    def _is_cpu_busy(self) -> bool:
+        """Check CPU percent of master process at most once per second"""
+        now = time.time()
+        if now - self._cpu_checked_at >= 1:
+            self._cpu_checked_at = now
+            # since the previous check, 100 for a core fully used
+            cpu_percent = self._process.cpu_percent(interval=None)
+            self._cpu_busy = (
+                cpu_percent >= self.config.COMPRESSION_MAX_CPU_PERCENT
+            )
+        return self._cpu_busy
+
+    def should_compress(self, file_path: str, file_size: int) -> bool:
+        if not self.config.COMPRESSION:
+            return False
+        if file_size < self.config.COMPRESSION_MIN_SIZE:
+            return False
+        _, extension = os.path.splitext(file_path)
+        if extension.lower() in self._skip_extensions:
+            return False
+        return not self._is_cpu_busy()
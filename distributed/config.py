@@ -1,5 +1,8 @@
 MASTER = ("127.0.0.1", 8000)
 
+# (host, port) of simple worker servers, optionally with max number of
+# concurrent jobs as (host, port, concurrency). Push worker servers too, whose
+# concurrency is reported by themselves
 WORKERS = [
     ("127.0.0.1", 8001),
     ("127.0.0.1", 8002),
@@ -9,7 +12,116 @@ WORKERS = [
 
 CHUNK_SIZE = 256 * 1024
 
+# hash algorithms of hashlib (or xxhash, e.g. "xxh64", if installed), hex
+# digests of all algorithms are calculated in one pass over file data, and
+# those of the first one are kept as file hashes
+HASH_ALGORITHMS = ["sha1"]
+
+# max number of files and max total bytes of files leased to a worker in batch
+LEASE_MAX_FILES = 64
+LEASE_MAX_BYTES = 64 * 1024 * 1024
+# max number of files streamed to a worker in one bundle, up to
+# `LEASE_MAX_BYTES` bytes
+BUNDLE_MAX_FILES = 1024
+
+# number of threads scanning home directories concurrently
+HOME_SCAN_WORKERS = 8
+
+# path of persistent file hash index (sqlite database), hashes of unchanged
+# files are reused across runs. `None` to disable it
+HOME_INDEX_PATH = None
+
+# keep home files in a memory efficient table, for huge number of files
+HOME_COMPACT_FILES = False
+# hash files of the same inode (hardlinks, bind mounts) only once
+HOME_DEDUP_INODES = False
+# only detect duplicate files, files of a unique size are not hashed
+HOME_DUPLICATES_ONLY = False
+
+# files not smaller than this size are split into chunks and hashed by
+# workers cooperatively, and a tree hash of the chunk hashes is calculated.
+# `None` to disable it. Workers should lease files in batch for file chunks,
+# otherwise chunked files are hashed whole while no worker leases chunks
+CHUNKED_HASHING_FILE_SIZE = None
+CHUNKED_HASHING_CHUNK_SIZE = 256 * 1024 * 1024
+# calculate plain hash of chunked files too, otherwise chunked files have
+# tree hashes only, which are reported as `tree_hashes` in home status
+CHUNKED_HASHING_PLAIN_HASH = False
+
+# workers share the home storage with master and hash files in place
+SHARED_STORAGE = False
+
+# compress files transferred to workers (deflate), of `get_file` responses
+# of pull master and uploads of simple master. workers hash decompressed data
+COMPRESSION = False
+# files smaller than this size, or of these already compressed types, are
+# transferred as is
+COMPRESSION_MIN_SIZE = 4 * 1024
+COMPRESSION_SKIP_EXTENSIONS = [
+    ".7z",
+    ".br",
+    ".bz2",
+    ".gif",
+    ".gz",
+    ".jpeg",
+    ".jpg",
+    ".mkv",
+    ".mp3",
+    ".mp4",
+    ".png",
+    ".rar",
+    ".tgz",
+    ".webp",
+    ".xz",
+    ".zip",
+    ".zst",
+]
+# files are transferred as is while CPU percent of master process (per core,
+# i.e. 100 for a core fully used) is not lower than this
+COMPRESSION_MAX_CPU_PERCENT = 80
+
+# threads of a simple worker server hashing uploaded files off the event loop,
+# `None` for the number of CPUs
+SIMPLE_WORKER_HASH_THREADS = None
+# uploaded chunks of a file buffered for hashing before reading is paused
+SIMPLE_WORKER_HASH_QUEUE_SIZE = 4
+
+# max number of jobs of a push worker server at the same time, `None` for the
+# number of CPUs
+PUSH_WORKER_JOBS = None
+# push master collects status (total/idle jobs) of workers in this interval
+PUSH_MASTER_STATUS_SECONDS = 1
+
+# worker processes of local recipe, `None` for the number of CPUs
+LOCAL_WORKER_PROCESSES = None
+# jobs queued to every local worker process, so that it does not wait for
+# master between jobs
+LOCAL_WORKER_JOBS = 2
+
 # master checks if a file processing timeout in worker
 WORKER_PROCESSING_TIMEOUT_SECONDS = 4
 # workers wait for file processing file timeout from master to get a file
 WORKER_WAIT_FOR_TIMEOUT_FILE_SECONDS = 4
+# workers ask master to hold requests for files up to these seconds instead
+# of waiting locally, `0` to disable long polling
+WORKER_LONG_POLL_SECONDS = 30
+# files kept in flight concurrently by every worker process, so that fetching
+# a file overlaps hashing and reporting others
+WORKER_PIPELINE_DEPTH = 1
+# server side deadline of long polling requests
+MASTER_LONG_POLL_MAX_SECONDS = 60
+# long polling requests check processing files timeout in this interval
+MASTER_LONG_POLL_CHECK_SECONDS = 0.5
+
+# workers send heartbeats to master in this interval, `0` to disable it
+WORKER_HEARTBEAT_SECONDS = 5
+# master evicts workers without any request for these seconds, and requeues
+# their processing files at once. `None` to disable it
+MASTER_WORKER_EVICT_SECONDS = 60
+
+# path of append-only journal of file hashes of pull master, a crashed master
+# resumes from it with only unfinished files rescheduled. It takes precedence
+# over `HOME_INDEX_PATH`. `None` to disable it
+MASTER_JOURNAL_PATH = None
+# journal is fsynced in a thread in this interval
+MASTER_JOURNAL_SYNC_SECONDS = 1
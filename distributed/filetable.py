@@ -0,0 +1,155 @@
+from array import array
+from typing import Dict, Iterator, List, MutableMapping, Optional, Tuple
+
+# file dir id of deleted files
+_DELETED = 0xFFFFFFFF
+
+
+class CompactFileTable(MutableMapping[str, Optional[str]]):
+    """Memory efficient mapping of file path to hex digest
+
+    Directory prefixes are interned, file names are indexed by integer file
+    ids per directory, and digests are kept as raw bytes in a bytearray
+    indexed by file id. File sizes are kept in an array as well and exposed
+    by the `sizes` mapping.
+    """
+
+    def __init__(self, digest_size: int = 20) -> None:
+        self.digest_size = digest_size
+
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        # dir id -> file name -> file id
+        self._dir_files: List[Dict[str, int]] = []
+
+        # file id -> dir id, file name, digest, digest set flag and size
+        self._file_dirs = array("I")
+        self._file_names: List[str] = []
+        self._digests = bytearray()
+        self._digests_set = bytearray()
+        self._sizes = array("Q")
+
+        self._len = 0
+        self.sizes = _CompactFileSizes(self)
+
+    @staticmethod
+    def _split_path(path: str) -> Tuple[str, str]:
+        dir_, _, name = path.rpartition("/")
+        return dir_, name
+
+    def _get_file_id(self, path: str) -> Optional[int]:
+        dir_, name = self._split_path(path)
+        dir_id = self._dir_ids.get(dir_)
+        if dir_id is None:
+            return None
+        return self._dir_files[dir_id].get(name)
+
+    def _ensure_file_id(self, path: str) -> int:
+        file_id = self._get_file_id(path)
+        if file_id is not None:
+            return file_id
+
+        dir_, name = self._split_path(path)
+        dir_id = self._dir_ids.get(dir_)
+        if dir_id is None:
+            dir_id = len(self._dirs)
+            self._dirs.append(dir_)
+            self._dir_ids[dir_] = dir_id
+            self._dir_files.append({})
+        file_id = len(self._file_names)
+        self._dir_files[dir_id][name] = file_id
+        self._file_dirs.append(dir_id)
+        self._file_names.append(name)
+        self._digests.extend(bytes(self.digest_size))
+        self._digests_set.append(0)
+        self._sizes.append(0)
+        self._len += 1
+        return file_id
+
+    def _get_path(self, file_id: int) -> str:
+        dir_ = self._dirs[self._file_dirs[file_id]]
+        name = self._file_names[file_id]
+        return f"{dir_}/{name}" if dir_ else name
+
+    def _get_digest(self, file_id: int) -> Optional[str]:
+        if not self._digests_set[file_id]:
+            return None
+        start = file_id * self.digest_size
+        return self._digests[start:start + self.digest_size].hex()
+
+    def _set_digest(self, file_id: int, hash_: Optional[str]) -> None:
+        start = file_id * self.digest_size
+        if hash_ is None:
+            self._digests[start:start + self.digest_size] = bytes(
+                self.digest_size
+            )
+            self._digests_set[file_id] = 0
+            return
+
+        digest = bytes.fromhex(hash_)
+        if len(digest) != self.digest_size:
+            raise ValueError(f"invalid digest size of hash {hash_}")
+        self._digests[start:start + self.digest_size] = digest
+        self._digests_set[file_id] = 1
+
+    def __getitem__(self, path: str) -> Optional[str]:
+        file_id = self._get_file_id(path)
+        if file_id is None:
+            raise KeyError(path)
+        return self._get_digest(file_id)
+
+    def __setitem__(self, path: str, hash_: Optional[str]) -> None:
+        file_id = self._ensure_file_id(path)
+        self._set_digest(file_id, hash_)
+
+    def __delitem__(self, path: str) -> None:
+        dir_, name = self._split_path(path)
+        dir_id = self._dir_ids.get(dir_)
+        if dir_id is None or name not in self._dir_files[dir_id]:
+            raise KeyError(path)
+        file_id = self._dir_files[dir_id].pop(name)
+        self._set_digest(file_id, None)
+        self._file_dirs[file_id] = _DELETED
+        self._sizes[file_id] = 0
+        self._len -= 1
+
+    def __contains__(self, path: object) -> bool:
+        return isinstance(path, str) and self._get_file_id(path) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        for file_id in range(len(self._file_names)):
+            if self._file_dirs[file_id] != _DELETED:
+                yield self._get_path(file_id)
+
+    def __len__(self) -> int:
+        return self._len
+
+
+class _CompactFileSizes(MutableMapping[str, int]):
+    """File sizes view of compact file table"""
+
+    def __init__(self, table: CompactFileTable) -> None:
+        self._table = table
+
+    def __getitem__(self, path: str) -> int:
+        file_id = self._table._get_file_id(path)
+        if file_id is None:
+            raise KeyError(path)
+        return self._table._sizes[file_id]
+
+    def __setitem__(self, path: str, size: int) -> None:
+        file_id = self._table._get_file_id(path)
+        if file_id is None:
+            # sizes are only kept for files in table
+            raise KeyError(path)
+        self._table._sizes[file_id] = size
+
+    def __delitem__(self, path: str) -> None:
+        # sizes are deleted along with files in table
+        raise TypeError("can not delete file size from compact file table")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._table)
+
+    def __len__(self) -> int:
+        return len(self._table)
@@ -0,0 +1,89 @@
+import hashlib
+from typing import Any, Dict, List, Optional, Sequence
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+DEFAULT_HASH_ALGORITHMS = ("sha1",)
+
+
+def new_hash(algorithm: str) -> Any:
+    """Create a hash object of a hashlib algorithm or an xxhash algorithm
+
+    xxhash algorithms (e.g. `xxh64`) are available only if the optional
+    xxhash package is installed. Raise ValueError for unsupported algorithm.
+    """
+    if algorithm.startswith("xxh"):
+        if xxhash is None or not hasattr(xxhash, algorithm):
+            raise ValueError(f"unsupported hash type {algorithm}")
+        return getattr(xxhash, algorithm)()
+    return hashlib.new(algorithm)
+
+
+def parse_hash_algorithms(value: Optional[str]) -> List[str]:
+    """Parse comma separated hash algorithms, default ones if empty
+
+    Raise ValueError for unsupported algorithm.
+    """
+    if not value:
+        return list(DEFAULT_HASH_ALGORITHMS)
+    algorithms = [algorithm.strip() for algorithm in value.split(",")]
+    for algorithm in algorithms:
+        new_hash(algorithm)
+    return algorithms
+
+
+class MultiHash:
+    """Calculate hex digests of several algorithms in one pass over data"""
+
+    def __init__(self, algorithms: Sequence[str]) -> None:
+        self._hashes = {
+            algorithm: new_hash(algorithm) for algorithm in algorithms
+        }
+
+    def update(self, data: bytes) -> None:
+        for h in self._hashes.values():
+            h.update(data)
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {
+            algorithm: h.hexdigest() for algorithm, h in self._hashes.items()
+        }
+
+
+def calc_file_hashes(
+    full_path: str,
+    chunk_size: int,
+    algorithms: Sequence[str] = DEFAULT_HASH_ALGORITHMS,
+    offset: int = 0,
+    length: Optional[int] = None,
+) -> Dict[str, str]:
+    """Calculate hex digests of a local file or a range of it in one pass"""
+    h = MultiHash(algorithms)
+    with open(full_path, "rb") as f:
+        f.seek(offset)
+        remaining = length
+        while remaining is None or remaining > 0:
+            if remaining is not None:
+                chunk_size = min(chunk_size, remaining)
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return h.hexdigests()
+
+
+def calc_file_hash(
+    full_path: str,
+    chunk_size: int,
+    offset: int = 0,
+    length: Optional[int] = None,
+) -> str:
+    """Calculate sha1 hex digest of a local file or a range of it"""
+    return calc_file_hashes(
+        full_path, chunk_size, ("sha1",), offset=offset, length=length
+    )["sha1"]
@@ -1,22 +1,266 @@
+import asyncio
+import json
 import os
 import os.path
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    AsyncGenerator,
+    Dict,
+    Generator,
+    List,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from distributed.filetable import CompactFileTable
+from distributed.hashing import DEFAULT_HASH_ALGORITHMS, new_hash
+from distributed.index import FileSignature, HashIndex
+from distributed.journal import HashJournal
+
+# (st_dev, st_ino) of a directory, for detecting symlink loops
+_DirKey = Tuple[int, int]
+# (st_dev, st_ino) of a file, for detecting hardlinks and duplicate mounts
+_FileKey = Tuple[int, int]
+
+
+def _get_dir_key(stat: os.stat_result) -> _DirKey:
+    return stat.st_dev, stat.st_ino
+
+
+def _scan_dir(
+    dir_: str
+) -> Tuple[List[Tuple[str, os.stat_result]], List[Tuple[str, _DirKey]]]:
+    """Scan a directory for files and sub directories with their stats
+
+    Directories and entries which can not be accessed are skipped.
+    """
+    files = []
+    dirs = []
+    try:
+        with os.scandir(dir_) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        files.append((entry.path, entry.stat()))
+                    elif entry.is_dir():
+                        dirs.append((entry.path, _get_dir_key(entry.stat())))
+                except OSError as ex:
+                    print(ex)
+                    print(f"entry(path={entry.path}) skipped.")
+    except OSError as ex:
+        print(ex)
+        print(f"directory(path={dir_}) skipped.")
+    return files, dirs
+
+
+async def _scan_dir_tree(
+    dir_: str, max_workers: int
+) -> AsyncGenerator[List[Tuple[str, os.stat_result]], None]:
+    """Scan a directory tree concurrently in threads
+
+    Files are yielded per directory as soon as the directory is scanned.
+    Every directory is scanned only once even through symlinks.
+    """
+    loop = asyncio.get_running_loop()
+    visited: Set[_DirKey] = {_get_dir_key(os.stat(dir_))}
+    with ThreadPoolExecutor(max_workers) as executor:
+        pending = {loop.run_in_executor(executor, _scan_dir, dir_)}
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                files, dirs = future.result()
+                for sub_dir, dir_key in dirs:
+                    if dir_key not in visited:
+                        visited.add(dir_key)
+                        pending.add(
+                            loop.run_in_executor(executor, _scan_dir, sub_dir)
+                        )
+                yield files
 
 
 class Home:
-    def __init__(self, home_dir: str) -> None:
+    def __init__(
+        self,
+        home_dir: str,
+        index: Optional[Union[HashIndex, HashJournal]] = None,
+        compact: bool = False,
+        algorithms: Sequence[str] = DEFAULT_HASH_ALGORITHMS,
+        dedup: bool = False,
+        duplicates_only: bool = False,
+    ) -> None:
         self.home_dir = home_dir
         self._files_loaded = False
-        self.files: Dict[str, Optional[str]] = {}
+
+        # hex digests of the first algorithm are kept in `files`, and those
+        # of other algorithms in `hashes`
+        self.algorithms = list(algorithms)
+        self.hashes: Dict[str, Dict[str, str]] = {
+            algorithm: {} for algorithm in self.algorithms[1:]
+        }
+        self._digest_sizes = {
+            algorithm: new_hash(algorithm).digest_size
+            for algorithm in self.algorithms
+        }
+
+        self._files: MutableMapping[str, Optional[str]]
+        self.file_sizes: MutableMapping[str, int]
+        if compact:
+            # memory efficient storage for huge number of files
+            table = CompactFileTable(self._digest_sizes[self.algorithms[0]])
+            self._files = table
+            self.file_sizes = table.sizes
+        else:
+            self._files = {}
+            self.file_sizes = {}
+
+        # running counters for constant time progress reporting
+        self._finished_files = 0
+        self._total_bytes = 0
+        self._finished_bytes = 0
+
+        # persistent index (or journal) of file hashes from previous runs
+        self.index = index
+        # path -> stat signature of files to be saved into index along with
+        # their hashes
+        self._signatures: Dict[str, FileSignature] = {}
+
+        # path -> tree hash of large files hashed in chunks
+        self.tree_hashes: Dict[str, str] = {}
+        # files finished with tree hashes only, without hashes of algorithms
+        # in `files`. Tree hashes are not saved into index
+        self._tree_hashed_files: Set[str] = set()
+
+        # files of the same inode are hashed once, and their hashes are set
+        # to all paths of the inode
+        self.dedup = dedup or duplicates_only
+        # (st_dev, st_ino) -> path of the first file of the inode
+        self._inode_files: Dict[_FileKey, str] = {}
+        # path of the first file of an inode -> other paths of the inode
+        self._linked_files: Dict[str, List[str]] = {}
+
+        # only files which may have duplicates are hashed, files of a unique
+        # size among all inodes are skipped
+        self.duplicates_only = duplicates_only
+        # file size -> number of inodes of the size
+        self._size_inodes: Dict[int, int] = {}
+        self._skipped_files: Set[str] = set()
+
+        # files which can not be read or hashed, they are not hashed again
+        # in this run
+        self._failed_files: Set[str] = set()
+
+    @property
+    def files(self) -> MutableMapping[str, Optional[str]]:
+        return self._files
+
+    @files.setter
+    def files(self, files: MutableMapping[str, Optional[str]]) -> None:
+        self._files = files
+        self._reset_counters()
+
+    def _reset_counters(self) -> None:
+        self._finished_files = 0
+        self._total_bytes = 0
+        self._finished_bytes = 0
+        for path, hash_ in self._files.items():
+            file_size = self.file_sizes.get(path, 0)
+            self._total_bytes += file_size
+            if hash_ is not None or path in self._tree_hashed_files:
+                self._finished_files += 1
+                self._finished_bytes += file_size
 
     def _load_files(self, dir_: str) -> None:
-        for entry in os.scandir(dir_):
-            if entry.is_file():
-                path = self._get_rel_path(os.path.join(dir_, entry.path))
-                self.files[path] = None
-            elif entry.is_dir():
-                # max recursive?
-                self._load_files(entry.path)
+        visited = {_get_dir_key(os.stat(dir_))}
+        dirs = [dir_]
+        while dirs:
+            files, sub_dirs = _scan_dir(dirs.pop())
+            for full_path, stat in files:
+                self._add_file(self._get_rel_path(full_path), stat)
+            for sub_dir, dir_key in sub_dirs:
+                # symlink loops
+                if dir_key not in visited:
+                    visited.add(dir_key)
+                    dirs.append(sub_dir)
+
+    def _encode_index_hashes(
+        self, hash_: str, extra_hashes: Dict[str, str]
+    ) -> str:
+        if self.algorithms == ["sha1"]:
+            # plain sha1 hex digest as in the index of previous versions
+            return hash_
+        hashes = {self.algorithms[0]: hash_}
+        for algorithm in self.hashes:
+            if algorithm in extra_hashes:
+                hashes[algorithm] = extra_hashes[algorithm]
+        return json.dumps(hashes, sort_keys=True)
+
+    def _decode_index_hashes(self, value: str) -> Optional[Dict[str, str]]:
+        """Decode hashes from index, `None` if any algorithm is missing"""
+        if value.startswith("{"):
+            hashes = json.loads(value)
+        else:
+            hashes = {"sha1": value}
+        if not all(algorithm in hashes for algorithm in self.algorithms):
+            return None
+        return hashes
+
+    def _add_file(self, path: str, stat: os.stat_result) -> bool:
+        """Add a file, return whether the file needs to be hashed"""
+        hash_ = None
+        if self.index is not None:
+            signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            value = self.index.get_file_hash(path, signature)
+            hashes = (
+                self._decode_index_hashes(value)
+                if value is not None
+                else None
+            )
+            if hashes is None:
+                self._signatures[path] = signature
+            else:
+                hash_ = hashes[self.algorithms[0]]
+                for algorithm, file_hashes in self.hashes.items():
+                    file_hashes[path] = hashes[algorithm]
+        self._files[path] = hash_
+        self.file_sizes[path] = stat.st_size
+        self._total_bytes += stat.st_size
+        if hash_ is not None:
+            self._finished_files += 1
+            self._finished_bytes += stat.st_size
+
+        if self.dedup:
+            file_key = (stat.st_dev, stat.st_ino)
+            first_path = self._inode_files.setdefault(file_key, path)
+            if first_path != path:
+                # hashed along with the first file of the inode
+                self._linked_files.setdefault(first_path, []).append(path)
+                first_hash = self._files.get(first_path)
+                if hash_ is None and first_hash is not None:
+                    self.set_file_hash(
+                        path, first_hash, self.get_file_hashes(first_path)
+                    )
+                return False
+            self._size_inodes[stat.st_size] = (
+                self._size_inodes.get(stat.st_size, 0) + 1
+            )
+        return hash_ is None
+
+    def _skip_unique_size_files(self, paths: List[str]) -> List[str]:
+        """Skip files of a unique size which can not have duplicates"""
+        result = []
+        for path in paths:
+            if self._size_inodes.get(self.file_sizes[path], 0) > 1:
+                result.append(path)
+            else:
+                self._skipped_files.add(path)
+                self._skipped_files.update(self._linked_files.get(path, ()))
+        return result
 
     def _get_rel_path(self, full_path: str) -> str:
         return full_path[len(self.home_dir) + 1:]
@@ -27,9 +271,134 @@ class Home:
 
         self._load_files(self.home_dir)
         self._files_loaded = True
+        if self.duplicates_only:
+            self._skip_unique_size_files(
+                [path for path, hash_ in self._files.items() if hash_ is None]
+            )
+
+    async def stream_files(
+        self, max_workers: int
+    ) -> AsyncGenerator[List[str], None]:
+        """Load files by scanning directories concurrently in threads
+
+        Paths of loaded files needing to be hashed are yielded in batches
+        while scanning, so that they can be processed before all files
+        loaded. With `duplicates_only`, sizes of all files are needed to skip
+        files of unique sizes, so paths are yielded after scanning.
+        """
+        if self._files_loaded:
+            raise Exception("files loaded")
+
+        pending_paths = []
+        async for files in _scan_dir_tree(self.home_dir, max_workers):
+            paths = []
+            for full_path, stat in files:
+                path = self._get_rel_path(full_path)
+                if self._add_file(path, stat):
+                    paths.append(path)
+            if self.duplicates_only:
+                pending_paths.extend(paths)
+            else:
+                yield paths
+        self._files_loaded = True
+        if self.duplicates_only:
+            yield self._skip_unique_size_files(pending_paths)
+
+    def check_file_hashes(
+        self, hash_: str, extra_hashes: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Raise ValueError for invalid hex digests of `algorithms`
+
+        Hex digests of algorithms not in `algorithms` are not checked.
+        """
+        hashes = dict(extra_hashes or {})
+        hashes[self.algorithms[0]] = hash_
+        for algorithm, digest_size in self._digest_sizes.items():
+            if algorithm not in hashes:
+                continue
+            if len(bytes.fromhex(hashes[algorithm])) != digest_size:
+                raise ValueError(
+                    f"invalid digest size of {algorithm} hash"
+                    f" {hashes[algorithm]}"
+                )
+
+    def set_file_hash(
+        self,
+        path: str,
+        hash_: str,
+        extra_hashes: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Set hex digest of the first algorithm, and of other algorithms
+
+        Hex digests of algorithms not in `algorithms` are ignored. Raise
+        ValueError for invalid hex digests, see `check_file_hashes`.
+        """
+        self.check_file_hashes(hash_, extra_hashes)
+        if self._files.get(path) is None:
+            if path in self._tree_hashed_files:
+                # finished by tree hash already
+                self._tree_hashed_files.discard(path)
+            else:
+                self._finished_files += 1
+                self._finished_bytes += self.file_sizes.get(path, 0)
+        self._files[path] = hash_
+        self._failed_files.discard(path)
+
+        extra_hashes = extra_hashes or {}
+        for algorithm, file_hashes in self.hashes.items():
+            if algorithm in extra_hashes:
+                file_hashes[path] = extra_hashes[algorithm]
+
+        if self.index is not None:
+            signature = self._signatures.pop(path, None)
+            if signature is not None:
+                self.index.set_file_hash(
+                    path,
+                    signature,
+                    self._encode_index_hashes(hash_, extra_hashes),
+                )
+
+        for linked_path in self._linked_files.get(path, ()):
+            self.set_file_hash(linked_path, hash_, extra_hashes)
 
-    def set_file_hash(self, path: str, hash_: str) -> None:
-        self.files[path] = hash_
+    def set_file_failed(self, path: str) -> None:
+        """Mark a file which can not be hashed, along with its linked files"""
+        if self._files.get(path) is not None:
+            return
+        self._failed_files.add(path)
+        self._failed_files.update(self._linked_files.get(path, ()))
+
+    def get_file_hashes(self, path: str) -> Dict[str, str]:
+        """Get hex digests of a file of all algorithms which are set"""
+        hashes = {}
+        hash_ = self._files.get(path)
+        if hash_ is not None:
+            hashes[self.algorithms[0]] = hash_
+        for algorithm, file_hashes in self.hashes.items():
+            if path in file_hashes:
+                hashes[algorithm] = file_hashes[path]
+        return hashes
+
+    def set_file_tree_hash(
+        self, path: str, tree_hash: str, finished: bool = False
+    ) -> None:
+        """Set tree hash of a file hashed in chunks
+
+        With `finished`, the file is finished without plain hashes, and it is
+        hashed again by the next run with index.
+        """
+        self.tree_hashes[path] = tree_hash
+        if not finished:
+            return
+        for tree_path in [path, *self._linked_files.get(path, ())]:
+            if (
+                self._files.get(tree_path) is None
+                and tree_path not in self._tree_hashed_files
+            ):
+                self._tree_hashed_files.add(tree_path)
+                self._finished_files += 1
+                self._finished_bytes += self.file_sizes.get(tree_path, 0)
+            self._failed_files.discard(tree_path)
 
     def get_full_path(self, path: str) -> str:
         return os.path.join(self.home_dir, path)
@@ -37,19 +406,65 @@ class Home:
     def file_exists(self, path: str) -> bool:
         return path in self.files
 
+    def iter_unfinished_files(self) -> Generator[str, None, None]:
+        """Iterate files without hash set which need to be hashed
+
+        Files hashed along with the first files of their inodes, skipped
+        files of unique sizes and failed files are not included.
+        """
+        linked_paths = {
+            path for paths in self._linked_files.values() for path in paths
+        }
+        for f in self.files:
+            if (
+                self.files[f] is None
+                and f not in linked_paths
+                and f not in self._skipped_files
+                and f not in self._failed_files
+                and f not in self._tree_hashed_files
+            ):
+                yield f
+
+    def iter_duplicates(self) -> Generator[List[str], None, None]:
+        """Iterate groups of paths of files with the same hash"""
+        groups: Dict[str, List[str]] = {}
+        for path, hash_ in self.files.items():
+            if hash_ is not None:
+                groups.setdefault(hash_, []).append(path)
+        for paths in groups.values():
+            if len(paths) > 1:
+                yield paths
+
+    def close(self) -> None:
+        if self.index is not None:
+            self.index.close()
+
     @property
     def finished(self) -> bool:
-        """Check if all files have hash set"""
-        for f in self.files:
-            if self.files[f] is None:
-                return False
-        return True
+        """Check if all files have hash set, except skipped and failed files
+
+        Files with tree hashes only are finished too.
+        """
+        return (
+            self._finished_files
+            + len(self._skipped_files)
+            + len(self._failed_files)
+            == len(self._files)
+        )
 
     @property
     def state(self) -> Dict[str, int]:
         """Report files hash set state"""
-        result = {"total": len(self.files), "finished": 0}
-        for f in self.files:
-            if self.files[f] is not None:
-                result["finished"] += 1
-        return result
+        state = {
+            "total": len(self._files),
+            "finished": self._finished_files,
+            "bytes_total": self._total_bytes,
+            "bytes_finished": self._finished_bytes,
+        }
+        if self.duplicates_only:
+            state["skipped"] = len(self._skipped_files)
+        if self._failed_files:
+            state["failed"] = len(self._failed_files)
+        if self._tree_hashed_files:
+            state["tree_hashed"] = len(self._tree_hashed_files)
+        return state
@@ -0,0 +1,61 @@
+import sqlite3
+from typing import Optional, Tuple
+
+# (size, mtime_ns, inode)
+FileSignature = Tuple[int, int, int]
+
+
+class HashIndex:
+    """Persistent file hash index keyed on file stat signature
+
+    A file hash from previous runs is reused only if the file size, mtime
+    and inode are all unchanged.
+    """
+
+    def __init__(self, index_path: str, commit_every: int = 1000) -> None:
+        self.index_path = index_path
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        self._conn = sqlite3.connect(index_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " inode INTEGER NOT NULL,"
+            " hash TEXT NOT NULL"
+            ")"
+        )
+        self._conn.commit()
+
+    def get_file_hash(
+        self, path: str, signature: FileSignature
+    ) -> Optional[str]:
+        """Get file hash if the file signature is unchanged"""
+        row = self._conn.execute(
+            "SELECT size, mtime_ns, inode, hash FROM files WHERE path = ?",
+            (path,),
+        ).fetchone()
+        if row is None or tuple(row[:3]) != signature:
+            return None
+        return row[3]
+
+    def set_file_hash(
+        self, path: str, signature: FileSignature, hash_: str
+    ) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO files"
+            " (path, size, mtime_ns, inode, hash) VALUES (?, ?, ?, ?, ?)",
+            (path, *signature, hash_),
+        )
+        self._uncommitted += 1
+        if self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self) -> None:
+        self._conn.commit()
+        self._uncommitted = 0
+
+    def close(self) -> None:
+        self.commit()
+        self._conn.close()
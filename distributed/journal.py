@@ -0,0 +1,132 @@
+import json
+import os
+from typing import Dict, Optional, Tuple
+
+from distributed.index import FileSignature
+
+
+class HashJournal:
+    """Append-only journal of file hashes keyed on file stat signature
+
+    It can be used in place of `HashIndex`. Every file hash is appended as a
+    json line, so that a crashed run can be resumed with only unfinished
+    files rehashed. Appended lines are flushed and fsynced in batches by
+    `commit`, or by `flush` and `sync` separately so that the slow fsync can
+    be done in another thread. With `commit_every` of `None`, lines are
+    committed only by calling them explicitly.
+    """
+
+    def __init__(
+        self, journal_path: str, commit_every: Optional[int] = 1000
+    ) -> None:
+        self.journal_path = journal_path
+        self.commit_every = commit_every
+        self._uncommitted = 0
+        # path -> (signature, hash)
+        self._entries: Dict[str, Tuple[FileSignature, str]] = {}
+
+        lines = self._load()
+        if lines > 2 * len(self._entries):
+            self._compact()
+        self._file = open(journal_path, "a")
+
+    def _load(self) -> int:
+        """Load entries from journal, return number of lines
+
+        A torn line at the end written while crashing is truncated, so that
+        lines appended later are not joined to it.
+        """
+        lines = 0
+        # size of complete lines
+        size = 0
+        torn = False
+        try:
+            f = open(self.journal_path, "rb")
+        except FileNotFoundError:
+            return lines
+        with f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # torn line written while crashing
+                    torn = True
+                    break
+                lines += 1
+                size += len(line)
+                try:
+                    entry = json.loads(line)
+                    signature = (
+                        entry["size"],
+                        entry["mtime_ns"],
+                        entry["inode"],
+                    )
+                    self._entries[entry["path"]] = signature, entry["hash"]
+                except (ValueError, KeyError, TypeError):
+                    # corrupted line
+                    continue
+        if torn:
+            os.truncate(self.journal_path, size)
+        return lines
+
+    @staticmethod
+    def _dump_entry(path: str, signature: FileSignature, hash_: str) -> str:
+        size, mtime_ns, inode = signature
+        entry = {
+            "path": path,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "inode": inode,
+            "hash": hash_,
+        }
+        return json.dumps(entry) + "\n"
+
+    def _compact(self) -> None:
+        """Rewrite journal with the latest entry of every file only"""
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, "w") as f:
+            for path, (signature, hash_) in self._entries.items():
+                f.write(self._dump_entry(path, signature, hash_))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+
+    def get_file_hash(
+        self, path: str, signature: FileSignature
+    ) -> Optional[str]:
+        """Get file hash if the file signature is unchanged"""
+        entry = self._entries.get(path)
+        if entry is None or entry[0] != signature:
+            return None
+        return entry[1]
+
+    def set_file_hash(
+        self, path: str, signature: FileSignature, hash_: str
+    ) -> None:
+        self._entries[path] = signature, hash_
+        self._file.write(self._dump_entry(path, signature, hash_))
+        self._uncommitted += 1
+        if (
+            self.commit_every is not None
+            and self._uncommitted >= self.commit_every
+        ):
+            self.commit()
+
+    @property
+    def uncommitted(self) -> int:
+        return self._uncommitted
+
+    def flush(self) -> None:
+        """Write buffered lines to the operating system"""
+        self._file.flush()
+        self._uncommitted = 0
+
+    def sync(self) -> None:
+        """Fsync flushed lines to disk, can be called in another thread"""
+        os.fsync(self._file.fileno())
+
+    def commit(self) -> None:
+        self.flush()
+        self.sync()
+
+    def close(self) -> None:
+        self.commit()
+        self._file.close()
@@ -0,0 +1,239 @@
+import asyncio
+import multiprocessing
+import os
+from multiprocessing.queues import SimpleQueue
+from typing import Any, Dict, List, Optional, Tuple
+
+from distributed.chunks import split_chunk_key
+from distributed.hashing import new_hash
+import distributed.local.worker as local_worker
+import distributed.pull.master as pull_master
+
+# (slot, full_path, offset, length, first_only), see `local_worker.work`
+_Job = Tuple[int, str, int, Optional[int], bool]
+# (index, slot, ok)
+_Result = Tuple[int, int, bool]
+
+
+class _LocalWorker:
+    def __init__(
+        self,
+        index: int,
+        process: multiprocessing.Process,
+        jobs_queue: "SimpleQueue[Optional[_Job]]",
+        slots: List[int],
+    ) -> None:
+        self.index = index
+        self.name = f"local-{index}"
+        self.process = process
+        self.jobs_queue = jobs_queue
+        # slot of shared memory results -> job key leased in it, `None` for
+        # idle slot
+        self.slots: Dict[int, Optional[str]] = dict.fromkeys(slots)
+
+
+class Master(pull_master.Master):
+    """Pull master leasing files to local worker processes without HTTP
+
+    Jobs are put into queues of worker processes, and digests are written
+    back into slots of shared memory, so that only small tuples are pickled
+    between processes. Leasing, timeouts and eviction of dead workers are
+    the same as pull recipe.
+    """
+
+    def __init__(
+        self,
+        home_dir: str,
+        config: Optional[Any] = None,
+        processes_number: Optional[int] = None,
+    ) -> None:
+        super().__init__(home_dir, config=config)
+        self.processes_number: int = (
+            processes_number
+            or self.config.LOCAL_WORKER_PROCESSES
+            or os.cpu_count()
+            or 1
+        )
+
+        # digests of all algorithms of a job in a slot one after another
+        self._digest_sizes = [
+            new_hash(algorithm).digest_size
+            for algorithm in self.home.algorithms
+        ]
+        self._slot_size = sum(self._digest_sizes)
+        slots_number = self.processes_number * self.config.LOCAL_WORKER_JOBS
+        self._results = multiprocessing.RawArray(
+            "B", slots_number * self._slot_size
+        )
+        self._results_view = memoryview(self._results).cast("B")
+        self._results_queue: SimpleQueue[Optional[_Result]] = SimpleQueue(
+            ctx=multiprocessing.get_context()
+        )
+
+        self._local_workers: List[_LocalWorker] = []
+
+    def start_workers(self) -> None:
+        jobs_number = self.config.LOCAL_WORKER_JOBS
+        for index in range(self.processes_number):
+            jobs_queue: SimpleQueue[Optional[_Job]] = SimpleQueue(
+                ctx=multiprocessing.get_context()
+            )
+            process = multiprocessing.Process(
+                target=local_worker.work,
+                args=(
+                    index,
+                    jobs_queue,
+                    self._results_queue,
+                    self._results,
+                    self._slot_size,
+                    self.config.CHUNK_SIZE,
+                    self.home.algorithms,
+                ),
+                daemon=True,
+            )
+            process.start()
+            slots = list(
+                range(index * jobs_number, (index + 1) * jobs_number)
+            )
+            worker = _LocalWorker(index, process, jobs_queue, slots)
+            self._local_workers.append(worker)
+            self.worker_register(worker.name)
+
+    def stop_workers(self) -> None:
+        for worker in self._local_workers:
+            if worker.process.is_alive():
+                worker.jobs_queue.put(None)
+        for worker in self._local_workers:
+            worker.process.join()
+
+    def _evict_dead_workers(self) -> None:
+        alive = False
+        for worker in self._local_workers:
+            if not self.worker_registered(worker.name):
+                continue
+            if worker.process.is_alive():
+                alive = True
+                continue
+            print(f"worker process(name={worker.name}) died.")
+            self.evict_worker(worker.name)
+            worker.slots = dict.fromkeys(worker.slots)
+        if not alive:
+            raise RuntimeError("all local worker processes died")
+
+    def _lease_jobs(self) -> None:
+        """Lease files and file chunks to idle slots of worker processes"""
+        for worker in self._local_workers:
+            if not self.worker_registered(worker.name):
+                continue
+            for slot, key in worker.slots.items():
+                if key is not None:
+                    continue
+                leased = self.lease_file(worker.name, chunks=True)
+                if leased is None:
+                    return
+                key, file_stat = leased
+                file_path, chunk = split_chunk_key(key)
+                offset, length = 0, None
+                if chunk is not None:
+                    offset, length = self.get_chunk_range(
+                        file_stat.st_size, chunk
+                    )
+                worker.slots[slot] = key
+                worker.jobs_queue.put(
+                    (
+                        slot,
+                        self.home.get_full_path(file_path),
+                        offset,
+                        length,
+                        chunk is not None,
+                    )
+                )
+
+    def _get_slot_hashes(self, slot: int, number: int) -> List[str]:
+        """Hex digests of the first `number` algorithms in a slot"""
+        hashes = []
+        start = slot * self._slot_size
+        for digest_size in self._digest_sizes[:number]:
+            hashes.append(
+                self._results_view[start : start + digest_size].hex()
+            )
+            start += digest_size
+        return hashes
+
+    def _job_finished(self, index: int, slot: int, ok: bool) -> None:
+        worker = self._local_workers[index]
+        key = worker.slots.get(slot)
+        if key is None or not self.worker_registered(worker.name):
+            # worker evicted already
+            return
+        worker.slots[slot] = None
+
+        if not ok:
+            self.file_processing_failed(worker.name, key)
+            return
+
+        file_path, chunk = split_chunk_key(key)
+        if chunk is not None:
+            (chunk_hash,) = self._get_slot_hashes(slot, 1)
+            self.file_chunk_processing_finished(
+                worker.name, file_path, chunk, chunk_hash
+            )
+            return
+        algorithms = self.home.algorithms
+        hashes = dict(
+            zip(algorithms, self._get_slot_hashes(slot, len(algorithms)))
+        )
+        file_hash = hashes.pop(algorithms[0])
+        self.file_processing_finished(
+            worker.name, file_path, file_hash, hashes
+        )
+
+    def _read_results(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Pass finished jobs to event loop until `None`, in a thread"""
+        while True:
+            result = self._results_queue.get()
+            if result is None:
+                break
+            loop.call_soon_threadsafe(self._job_finished, *result)
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self.start_workers()
+        reading = loop.run_in_executor(None, self._read_results, loop)
+        loading = asyncio.ensure_future(self.load_files())
+        try:
+            while not self.no_more_files():
+                self._evict_dead_workers()
+                self._lease_jobs()
+                await self.wait_files_changed(
+                    self.config.MASTER_LONG_POLL_CHECK_SECONDS
+                )
+            # loading home files raises if any error
+            await loading
+        finally:
+            loading.cancel()
+            self.stop_workers()
+            self._results_queue.put(None)
+            await reading
+            self.home.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="distributed local master")
+    parser.add_argument("--home")
+    parser.add_argument(
+        "--processes", type=int, help="worker processes hashing files"
+    )
+    args = parser.parse_args()
+
+    home_dir = args.home or os.getcwd()
+    master = Master(home_dir, processes_number=args.processes)
+    asyncio.run(master.run())
+
+    for path, hash_ in master.home.files.items():
+        print(f"{path} -> {hash_}")
+
+    print(f"state: {master.home.state}")
+    print("done")
@@ -0,0 +1,44 @@
+from multiprocessing.queues import SimpleQueue
+from typing import Any, Sequence
+
+from distributed.hashing import calc_file_hashes
+
+
+def work(
+    index: int,
+    jobs_queue: SimpleQueue,
+    results_queue: SimpleQueue,
+    results: Any,
+    slot_size: int,
+    chunk_size: int,
+    algorithms: Sequence[str],
+) -> None:
+    """Hash jobs from jobs queue until `None` in a worker process
+
+    A job is `(slot, full_path, offset, length, first_only)`. Digests of the
+    job are written into its slot of the shared memory `results` in order of
+    algorithms, so that only `(index, slot, ok)` is put into results queue.
+    File chunks are hashed by the first algorithm only.
+    """
+    results_view = memoryview(results).cast("B")
+    while True:
+        job = jobs_queue.get()
+        if job is None:
+            break
+        slot, full_path, offset, length, first_only = job
+        job_algorithms = algorithms[:1] if first_only else algorithms
+        try:
+            hashes = calc_file_hashes(
+                full_path, chunk_size, job_algorithms, offset, length
+            )
+        except OSError as ex:
+            print(ex)
+            results_queue.put((index, slot, False))
+            continue
+
+        start = slot * slot_size
+        for algorithm in job_algorithms:
+            digest = bytes.fromhex(hashes[algorithm])
+            results_view[start : start + len(digest)] = digest
+            start += len(digest)
+        results_queue.put((index, slot, True))
@@ -1,16 +1,46 @@
 import asyncio
+import heapq
+import os
 import os.path
+import statistics
 import time
-from typing import Any, Dict, Generator, List, Optional, Tuple, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from aiohttp import web
 from aiohttp.web_fileresponse import FileResponse
 
+from distributed.bundles import pack_failed_frame, pack_frame_header
+from distributed.chunks import (
+    calc_tree_hash,
+    get_chunk_key,
+    get_chunk_range,
+    get_chunks_number,
+    is_chunk_key,
+    split_chunk_key,
+)
+from distributed.compression import CompressionPolicy
 from distributed.home import Home
+from distributed.index import HashIndex
+from distributed.journal import HashJournal
+from distributed.queues import FileSizeQueue
 from distributed import config as default_config
 from distributed import constants
 
 
+_T = TypeVar("_T")
+
+
 class _Worker:
     def __init__(self, name: str, config: Any) -> None:
         self.name = name
@@ -20,8 +50,15 @@ class _Worker:
         self._total_file_size: int = 0
         self._total_processing_seconds: float = 0
         self._total_files: int = 0
-        # file_path -> (file_size, start_at)
-        self._current_processing_files: Dict[str, Tuple[int, float]] = {}
+        # file_path -> (file_size, start_at, timeout_at)
+        self._current_processing_files: Dict[
+            str, Tuple[int, float, float]
+        ] = {}
+
+        # time of the last request from worker, for evicting dead workers
+        self.last_seen_at = time.time()
+        # whether worker leases file chunks, see `Master.lease_file`
+        self.leases_chunks = False
 
     @property
     def processing_speed(self) -> Union[int, float]:
@@ -39,18 +76,36 @@ class _Worker:
         else:
             return self._total_processing_seconds / self._total_files
 
-    def new_processing_file(self, file_path: str, file_size: int) -> None:
+    def new_processing_file(self, file_path: str, file_size: int) -> float:
+        """Return the time after which processing the file is timeout
+
+        The timeout time is estimated by worker's processing speed.
+        """
         if file_path in self._current_processing_files:
             print(
                 f"file(path={file_path}) is in current processing files"
                 " already. override it."
             )
-        self._current_processing_files[file_path] = (file_size, time.time())
+        start_at = time.time()
+        timeout_at = (
+            start_at
+            + self.estimate_file_processing_seconds(file_size)
+            + self.config.WORKER_PROCESSING_TIMEOUT_SECONDS
+        )
+        self._current_processing_files[file_path] = (
+            file_size,
+            start_at,
+            timeout_at,
+        )
+        return timeout_at
 
-    def file_processing_finished(self, file_path: str) -> None:
+    def file_processing_finished(self, file_path: str) -> bool:
+        """Return `False` if the file is not in current processing files"""
         if file_path in self._current_processing_files:
             # pop from current processing files
-            file_size, start_at = self._current_processing_files.pop(file_path)
+            file_size, start_at, _ = self._current_processing_files.pop(
+                file_path
+            )
             processing_seconds = time.time() - start_at
             if processing_seconds < 0:
                 print(
@@ -62,11 +117,13 @@ class _Worker:
                 self._total_file_size += file_size
                 self._total_processing_seconds += time.time() - start_at
                 self._total_files += 1
+            return True
         else:
             print(
                 f"file(path={file_path}) is not in current processing files."
                 " ignore it."
             )
+            return False
 
     def estimate_file_processing_seconds(
         self, file_size: int
@@ -74,21 +131,26 @@ class _Worker:
         return file_size * self.processing_speed
 
     def iter_timeout_files(self) -> Generator[Tuple[str, float], None, None]:
-        # calculate based on worker's processing speed
-        timeout_before = (
-            time.time() - self.config.WORKER_PROCESSING_TIMEOUT_SECONDS
-        )
+        now = time.time()
         for (
             file_path,
-            (file_size, start_at),
+            (_, start_at, timeout_at),
         ) in self._current_processing_files.items():
-            estimated_processing_seconds = self.estimate_file_processing_seconds(
-                file_size
-            )
-            expected_finished_at = start_at + estimated_processing_seconds
-            if expected_finished_at < timeout_before:
+            if timeout_at < now:
                 yield file_path, start_at
 
+    def pop_processing_files(self) -> List[str]:
+        """Remove and return all current processing files"""
+        file_paths = list(self._current_processing_files)
+        self._current_processing_files.clear()
+        return file_paths
+
+    def get_processing_file(
+        self, file_path: str
+    ) -> Optional[Tuple[int, float, float]]:
+        """Get file size, start time and timeout time of processing file"""
+        return self._current_processing_files.get(file_path)
+
     @property
     def timeout_files(self) -> List[Tuple[str, float]]:
         return list(self.iter_timeout_files())
@@ -111,66 +173,348 @@ class _Worker:
     def remove_current_processing_file(self, file_path: str) -> bool:
         return self._current_processing_files.pop(file_path, None) is not None
 
+    def is_processing_file(self, file_path: str) -> bool:
+        return file_path in self._current_processing_files
+
 
 class Master:
     def __init__(self, home_dir: str, config: Optional[Any] = None) -> None:
-        self.home = Home(home_dir)
         self.config = config if config is not None else default_config
+        index: Optional[Union[HashIndex, HashJournal]] = None
+        # journal of file hashes for resuming crashed master
+        self.journal: Optional[HashJournal] = None
+        if self.config.MASTER_JOURNAL_PATH is not None:
+            # fsynced in a thread by `sync_journal` only, not blocking event
+            # loop
+            self.journal = HashJournal(
+                self.config.MASTER_JOURNAL_PATH, commit_every=None
+            )
+            index = self.journal
+        elif self.config.HOME_INDEX_PATH is not None:
+            index = HashIndex(self.config.HOME_INDEX_PATH)
+        self.home = Home(
+            home_dir,
+            index=index,
+            compact=self.config.HOME_COMPACT_FILES,
+            algorithms=self.config.HASH_ALGORITHMS,
+            dedup=self.config.HOME_DEDUP_INODES,
+            duplicates_only=self.config.HOME_DUPLICATES_ONLY,
+        )
 
-        print("loading home files...")
-        self.home.load_files()
+        # home files are loaded into files queue while scanning, see
+        # `load_files`
+        self.files_queue = FileSizeQueue(self.home.file_sizes)
+        self.files_loaded = False
+        # error of loading home files if any, reported in home status
+        self.load_error: Optional[str] = None
+
+        # chunks of large files hashed by workers cooperatively, chunk jobs
+        # are only leased to workers leasing files in batch, and files of
+        # them are queued whole if no such worker
+        self.chunks_queue: asyncio.Queue[str] = asyncio.Queue()
+        # file path -> chunk hashes
+        self._chunked_files: Dict[str, List[Optional[str]]] = {}
+
+        # worker name -> worker
+        self._workers: Dict[str, _Worker] = {}
+        # number of files and file chunks processing by all workers
+        self._processing_files_number = 0
+        # median processing speed of workers of known speeds, updated when
+        # speeds of workers are changed, see `is_slow_worker`
+        self._median_speed: Union[int, float] = 0
+        # heaps of (timeout_at, seq, worker_name, file_path) of processing
+        # files and of processing file chunks, items of files which are not
+        # processing by the worker any more are removed lazily
+        self._file_deadlines: List[Tuple[float, int, str, str]] = []
+        self._chunk_deadlines: List[Tuple[float, int, str, str]] = []
+        self._deadline_seq = 0
+
+        # for waking up long polling workers, created lazily in event loop
+        self._files_changed: Optional[asyncio.Event] = None
+
+        # whether to compress files of `get_file` responses
+        self.compression = CompressionPolicy(self.config)
+
+        # fsync of journal running in a thread
+        self._journal_syncing: Optional[asyncio.Future] = None
+
+    async def load_files(self) -> None:
+        """Load home files into files queue while scanning
+
+        If loading fails, files loaded already are still processed, and the
+        error is reported in home status.
+        """
+        print("loading home files into files queue...")
+        try:
+            await self._load_files()
+        except Exception as ex:
+            self.load_error = f"{type(ex).__name__}: {ex}"
+            print(f"loading home files failed. {self.load_error}")
+            raise
+        finally:
+            self.files_loaded = True
+            self.notify_files_changed()
         print("home files loaded.")
 
-        print("preparing home files queue...")
-        self.files_queue: asyncio.Queue[str] = asyncio.Queue()
-        for file_path in self.home.files:
-            self.files_queue.put_nowait(file_path)
-        print("home files queue prepared.")
+    async def _load_files(self) -> None:
+        chunked_file_size = self.config.CHUNKED_HASHING_FILE_SIZE
+        async for file_paths in self.home.stream_files(
+            self.config.HOME_SCAN_WORKERS
+        ):
+            for file_path in file_paths:
+                file_size = self.home.file_sizes[file_path]
+                if (
+                    chunked_file_size is not None
+                    and file_size >= chunked_file_size
+                ):
+                    self._queue_file_chunks(file_path, file_size)
+                    if not self.config.CHUNKED_HASHING_PLAIN_HASH:
+                        continue
+                self.files_queue.put_nowait(file_path)
+            if file_paths:
+                self.notify_files_changed()
+
+    async def sync_journal(self) -> None:
+        """Flush journal and fsync it in a thread
+
+        Request handling is not blocked by the fsync, and hashes set in the
+        meantime are fsynced by the next call.
+        """
+        if self.journal is None or not self.journal.uncommitted:
+            return
+        self.journal.flush()
+        loop = asyncio.get_running_loop()
+        self._journal_syncing = loop.run_in_executor(None, self.journal.sync)
+        # keep fsync running even if cancelled, see `wait_journal_synced`
+        await asyncio.shield(self._journal_syncing)
+
+    async def wait_journal_synced(self) -> None:
+        """Wait for running fsync of journal before closing it"""
+        if self._journal_syncing is not None:
+            await asyncio.wait([self._journal_syncing])
+
+    def _queue_file_chunks(self, file_path: str, file_size: int) -> None:
+        chunks_number = get_chunks_number(
+            file_size, self.config.CHUNKED_HASHING_CHUNK_SIZE
+        )
+        self._chunked_files[file_path] = [None] * chunks_number
+        for chunk in range(chunks_number):
+            self.chunks_queue.put_nowait(get_chunk_key(file_path, chunk))
+
+    def _has_chunk_workers(self) -> bool:
+        return any(worker.leases_chunks for worker in self.current_workers)
+
+    def _queue_chunked_files_whole(self) -> None:
+        """Queue files of queued chunks as whole files
+
+        For workers not leasing file chunks while no worker leases them.
+        Chunk hashes got already are dropped, and files queued whole for
+        plain hashes already are not queued again.
+        """
+        while self.has_queued_chunks():
+            self.chunks_queue.get_nowait()
+            self.chunks_queue.task_done()
+        for file_path in self._chunked_files:
+            if not self.config.CHUNKED_HASHING_PLAIN_HASH:
+                self.files_queue.put_nowait(file_path)
+        print(
+            f"{len(self._chunked_files)} chunked files queued whole, since"
+            " no worker leases file chunks."
+        )
+        self._chunked_files.clear()
+
+    def get_chunk_range(self, file_size: int, chunk: int) -> Tuple[int, int]:
+        """Get offset and length of a file chunk"""
+        return get_chunk_range(
+            file_size, self.config.CHUNKED_HASHING_CHUNK_SIZE, chunk
+        )
 
-        self.current_workers: List[_Worker] = []
+    def get_job_size(self, key: str, file_stat: os.stat_result) -> int:
+        """Get bytes to process of a file or file chunk job"""
+        _, chunk = split_chunk_key(key)
+        if chunk is None:
+            return file_stat.st_size
+        return self.get_chunk_range(file_stat.st_size, chunk)[1]
+
+    @property
+    def current_workers(self) -> List[_Worker]:
+        return list(self._workers.values())
 
     def _get_worker(self, worker_name: str) -> Optional[_Worker]:
-        for worker in self.current_workers:
-            if worker.name == worker_name:
-                return worker
-        return None
+        return self._workers.get(worker_name)
 
     def worker_register(self, worker_name: str) -> bool:
         if self._get_worker(worker_name) is not None:
             return False
 
         worker = _Worker(worker_name, self.config)
-        self.current_workers.append(worker)
+        self._workers[worker_name] = worker
         print(f"worker(name={worker_name}) registered.")
         return True
 
+    def _update_median_speed(self) -> None:
+        speeds = [
+            w.processing_speed
+            for w in self.current_workers
+            if w.processing_speed != 0
+        ]
+        self._median_speed = statistics.median(speeds) if speeds else 0
+
     def worker_registered(self, worker_name: str) -> bool:
         return self._get_worker(worker_name) is not None
 
-    def new_processing_file(self, worker_name: str, file_path: str) -> None:
-        full_path = self.home.get_full_path(file_path)
-        file_size = os.path.getsize(full_path)
+    def worker_seen(self, worker_name: str) -> None:
+        # worker should be registered before this
+        worker = self._get_worker(worker_name)
+        worker = cast(_Worker, worker)
+        worker.last_seen_at = time.time()
+
+    def evict_worker(self, worker_name: str) -> None:
+        """Forget a worker and requeue its processing files at once"""
+        worker = self._workers.pop(worker_name)
+        self._update_median_speed()
+        file_paths = worker.pop_processing_files()
+        self._processing_files_number -= len(file_paths)
+        self._compact_deadlines()
+        for file_path in file_paths:
+            if is_chunk_key(file_path):
+                self.chunks_queue.put_nowait(file_path)
+            else:
+                self.files_queue.put_nowait(file_path)
+        print(
+            f"worker(name={worker_name}) evicted."
+            f" {len(file_paths)} processing files requeued."
+        )
+        if file_paths:
+            self.notify_files_changed()
+
+    def evict_silent_workers(self) -> List[str]:
+        """Evict workers without any request for a while, return names"""
+        seen_before = time.time() - self.config.MASTER_WORKER_EVICT_SECONDS
+        worker_names = [
+            worker.name
+            for worker in self._workers.values()
+            if worker.last_seen_at < seen_before
+        ]
+        for worker_name in worker_names:
+            self.evict_worker(worker_name)
+        return worker_names
+
+    def new_processing_file(
+        self, worker_name: str, file_path: str
+    ) -> os.stat_result:
+        """`file_path` can be a file chunk key too"""
+        full_path = self.home.get_full_path(split_chunk_key(file_path)[0])
+        file_stat = os.stat(full_path)
 
         # worker should be registered before this
         worker = self._get_worker(worker_name)
         worker = cast(_Worker, worker)
-        worker.new_processing_file(file_path, file_size)
+        if not worker.is_processing_file(file_path):
+            self._processing_files_number += 1
+        timeout_at = worker.new_processing_file(
+            file_path, self.get_job_size(file_path, file_stat)
+        )
+        deadlines = (
+            self._chunk_deadlines
+            if is_chunk_key(file_path)
+            else self._file_deadlines
+        )
+        self._deadline_seq += 1
+        heapq.heappush(
+            deadlines, (timeout_at, self._deadline_seq, worker_name, file_path)
+        )
+        return file_stat
+
+    def _worker_file_processing_finished(
+        self, worker: _Worker, file_path: str
+    ) -> None:
+        if worker.file_processing_finished(file_path):
+            self._processing_files_number -= 1
+            self._update_median_speed()
+            self._compact_deadlines()
 
     def file_processing_finished(
-        self, worker_name: str, file_path: str, file_hash: str
+        self,
+        worker_name: str,
+        file_path: str,
+        file_hash: str,
+        extra_hashes: Optional[Dict[str, str]] = None,
     ) -> None:
-        self.home.set_file_hash(file_path, file_hash)
+        """`extra_hashes` are hashes of algorithms other than the first one"""
+        self.home.set_file_hash(file_path, file_hash, extra_hashes)
 
         # worker should be registered before this
         worker = self._get_worker(worker_name)
         worker = cast(_Worker, worker)
-        worker.file_processing_finished(file_path)
+        self._worker_file_processing_finished(worker, file_path)
+        self.notify_files_changed()
+
+    def file_chunk_processing_finished(
+        self, worker_name: str, file_path: str, chunk: int, chunk_hash: str
+    ) -> bool:
+        """Set hash of a file chunk, `False` if no such file chunk
+
+        Tree hash of the file is set when hashes of all chunks are set.
+        """
+        chunk_hashes = self._chunked_files.get(file_path)
+        if chunk_hashes is None or not 0 <= chunk < len(chunk_hashes):
+            # no such file chunk, or the file is failed
+            self.remove_current_processing_file(
+                worker_name, get_chunk_key(file_path, chunk)
+            )
+            return False
+        chunk_hashes[chunk] = chunk_hash
+
+        # worker should be registered before this
+        worker = self._get_worker(worker_name)
+        worker = cast(_Worker, worker)
+        self._worker_file_processing_finished(
+            worker, get_chunk_key(file_path, chunk)
+        )
+
+        if None not in chunk_hashes:
+            del self._chunked_files[file_path]
+            # file chunks are hashed by the first algorithm only
+            tree_hash = calc_tree_hash(
+                cast(List[str], chunk_hashes), self.home.algorithms[0]
+            )
+            # finished without plain hash of the file unless it is queued
+            self.home.set_file_tree_hash(
+                file_path,
+                tree_hash,
+                finished=not self.config.CHUNKED_HASHING_PLAIN_HASH,
+            )
+        self.notify_files_changed()
+        return True
+
+    def file_processing_failed(self, worker_name: str, key: str) -> None:
+        """Mark a file which can not be read as failed instead of requeuing
+
+        `key` can be a file chunk key too, and the whole file is failed.
+        """
+        self.remove_current_processing_file(worker_name, key)
+        file_path, _ = split_chunk_key(key)
+        if self._chunked_files.pop(file_path, None) is not None:
+            # drop other queued chunks of the file, and those processing are
+            # ignored when finished
+            keys = []
+            while self.has_queued_chunks():
+                keys.append(self.chunks_queue.get_nowait())
+                self.chunks_queue.task_done()
+            for key in keys:
+                if split_chunk_key(key)[0] != file_path:
+                    self.chunks_queue.put_nowait(key)
+        self.home.set_file_failed(file_path)
+        self.notify_files_changed()
 
     def iter_timeout_files(
-        self
+        self, chunks: bool = True
     ) -> Generator[Tuple[str, str, float], None, None]:
         for worker in self.current_workers:
             for file_path, start_at in worker.iter_timeout_files():
+                if not chunks and is_chunk_key(file_path):
+                    continue
                 yield worker.name, file_path, start_at
 
     @property
@@ -183,18 +527,84 @@ class Master:
         else:
             return None
 
-    def get_earlist_timeout_file(self) -> Optional[Tuple[str, str, float]]:
-        result = None
-        for worker_name, file_path, start_at in self.iter_timeout_files():
-            if result is None or start_at < result[2]:
-                result = worker_name, file_path, start_at
-        return result
+    def _get_deadline_start_at(
+        self, deadline: Tuple[float, int, str, str]
+    ) -> Optional[float]:
+        """Get start time of processing file of a deadline item
+
+        `None` is returned if the file is not processing by the worker any
+        more, i.e. finished, reclaimed or leased again.
+        """
+        timeout_at, _, worker_name, file_path = deadline
+        worker = self._get_worker(worker_name)
+        if worker is None:
+            return None
+        processing_file = worker.get_processing_file(file_path)
+        if processing_file is None or processing_file[2] != timeout_at:
+            return None
+        return processing_file[1]
+
+    def _compact_deadlines(self) -> None:
+        """Drop items of files not processing any more from heaps
+
+        Heaps are rebuilt only when stale items outnumber processing files,
+        so that it takes amortized constant time per finished file.
+        """
+        stale = (
+            len(self._file_deadlines)
+            + len(self._chunk_deadlines)
+            - self._processing_files_number
+        )
+        if stale <= max(self._processing_files_number, 64):
+            return
+        for deadlines in (self._file_deadlines, self._chunk_deadlines):
+            deadlines[:] = [
+                deadline
+                for deadline in deadlines
+                if self._get_deadline_start_at(deadline) is not None
+            ]
+            heapq.heapify(deadlines)
+
+    def _get_earliest_deadline(
+        self, deadlines: List[Tuple[float, int, str, str]]
+    ) -> Optional[Tuple[float, str, str, float]]:
+        """Get the earliest deadline of processing files in heap
+
+        Timeout time, worker name, file path and start time are returned.
+        Items of files not processing by the worker any more are dropped.
+        """
+        while deadlines:
+            start_at = self._get_deadline_start_at(deadlines[0])
+            if start_at is None:
+                heapq.heappop(deadlines)
+                continue
+            timeout_at, _, worker_name, file_path = deadlines[0]
+            return timeout_at, worker_name, file_path, start_at
+        return None
+
+    def get_earlist_timeout_file(
+        self, chunks: bool = True
+    ) -> Optional[Tuple[str, str, float]]:
+        """Get the timeout file (or file chunk) with the earliest deadline
+
+        Worker name, file path and start time of the file are returned.
+        """
+        candidates = [self._get_earliest_deadline(self._file_deadlines)]
+        if chunks:
+            candidates.append(
+                self._get_earliest_deadline(self._chunk_deadlines)
+            )
+        earliest = min(
+            (candidate for candidate in candidates if candidate is not None),
+            default=None,
+        )
+        if earliest is None or earliest[0] >= time.time():
+            return None
+        _, worker_name, file_path, start_at = earliest
+        return worker_name, file_path, start_at
 
     def has_processing_files(self) -> bool:
-        for worker in self.current_workers:
-            if worker.has_processing_files():
-                return True
-        return False
+        return self._processing_files_number > 0
 
     def remove_current_processing_file(
         self, worker_name: str, file_path: str
@@ -202,7 +612,193 @@ class Master:
         # worker should be registered before this
         worker = self._get_worker(worker_name)
         worker = cast(_Worker, worker)
-        worker.remove_current_processing_file(file_path)
+        if worker.remove_current_processing_file(file_path):
+            self._processing_files_number -= 1
+            self._compact_deadlines()
+
+    def is_processing_file(self, worker_name: str, file_path: str) -> bool:
+        # worker should be registered before this
+        worker = self._get_worker(worker_name)
+        worker = cast(_Worker, worker)
+        return worker.is_processing_file(file_path)
+
+    def is_slow_worker(self, worker_name: str) -> bool:
+        """Check if worker is slower than the median of known workers"""
+        # worker should be registered before this
+        worker = self._get_worker(worker_name)
+        worker = cast(_Worker, worker)
+        if worker.processing_speed == 0:
+            # unknown yet
+            return False
+        return worker.processing_speed > self._median_speed
+
+    def has_queued_chunks(self) -> bool:
+        return not self.chunks_queue.empty()
+
+    def no_more_files(self) -> bool:
+        """Check if all files are loaded and processed"""
+        return (
+            self.files_loaded
+            and self.files_queue.empty()
+            and not self.has_queued_chunks()
+            and not self.has_processing_files()
+        )
+
+    def notify_files_changed(self) -> None:
+        """Wake up workers waiting for files"""
+        if self._files_changed is not None:
+            self._files_changed.set()
+            self._files_changed = None
+
+    async def wait_files_changed(self, timeout: float) -> None:
+        """Wait until files changed or timeout"""
+        if self._files_changed is None:
+            self._files_changed = asyncio.Event()
+        try:
+            await asyncio.wait_for(self._files_changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _wait_for_lease(
+        self, worker_name: str, lease: Callable[[], _T], wait: float
+    ) -> Optional[_T]:
+        """Try to lease until leased or no more files or `wait` seconds past
+
+        Files may come from loading home files, and timeout files which are
+        checked every `MASTER_LONG_POLL_CHECK_SECONDS`. `None` is returned
+        if worker is evicted while waiting.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        while True:
+            if not self.worker_registered(worker_name):
+                # evicted while waiting
+                return None
+            leased = lease()
+            if leased or self.no_more_files():
+                return leased
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return leased
+            await self.wait_files_changed(
+                min(remaining, self.config.MASTER_LONG_POLL_CHECK_SECONDS)
+            )
+
+    async def wait_lease_file(
+        self, worker_name: str, wait: float
+    ) -> Optional[Tuple[str, os.stat_result]]:
+        """Lease a file, wait up to `wait` seconds if no file available"""
+        return await self._wait_for_lease(
+            worker_name, lambda: self.lease_file(worker_name), wait
+        )
+
+    async def wait_lease_files(
+        self,
+        worker_name: str,
+        max_files: int,
+        max_bytes: Optional[int],
+        wait: float,
+        chunks: bool = True,
+    ) -> List[Tuple[str, os.stat_result]]:
+        """Lease files, wait up to `wait` seconds if no file available"""
+        leased_files = await self._wait_for_lease(
+            worker_name,
+            lambda: self.lease_files(
+                worker_name, max_files, max_bytes, chunks
+            ),
+            wait,
+        )
+        return leased_files or []
+
+    def _get_next_job(self, worker_name: str, chunks: bool) -> Optional[str]:
+        """Get the next file or file chunk to lease, see `lease_file`"""
+        if chunks:
+            # worker should be registered before this
+            cast(_Worker, self._get_worker(worker_name)).leases_chunks = True
+        elif (
+            self.files_queue.empty()
+            and self.has_queued_chunks()
+            and not self._has_chunk_workers()
+        ):
+            self._queue_chunked_files_whole()
+
+        if chunks and self.has_queued_chunks():
+            file_path = self.chunks_queue.get_nowait()
+            self.chunks_queue.task_done()
+            return file_path
+
+        try:
+            if self.is_slow_worker(worker_name):
+                file_path = self.files_queue.get_smallest_nowait()
+            else:
+                file_path = self.files_queue.get_nowait()
+        except asyncio.QueueEmpty:
+            # try to get timeout task
+            timeout_file = self.get_earlist_timeout_file(chunks)
+            if timeout_file is None:
+                return None
+            _worker_name, file_path, _ = timeout_file
+            # remove old processing file
+            self.remove_current_processing_file(_worker_name, file_path)
+        else:
+            self.files_queue.task_done()
+        return file_path
+
+    def lease_file(
+        self, worker_name: str, chunks: bool = False
+    ) -> Optional[Tuple[str, os.stat_result]]:
+        """Lease a file to worker, return file path and file stat
+
+        Files in files queue go first, and then timeout files from other
+        workers. `None` is returned if no file is available at the moment.
+
+        Largest files in files queue are leased first, except that slow
+        workers get smallest files, so that large files are not left to slow
+        workers at the end.
+
+        With `chunks`, file chunks in chunks queue go before files, and a
+        file chunk key is returned instead of file path for a file chunk.
+        Without `chunks`, files of queued file chunks are queued whole once
+        no other files are left if no worker leases file chunks.
+
+        Files which can not be accessed any more are failed and skipped.
+        """
+        while True:
+            file_path = self._get_next_job(worker_name, chunks)
+            if file_path is None:
+                return None
+            try:
+                file_stat = self.new_processing_file(worker_name, file_path)
+            except OSError as ex:
+                print(ex)
+                self.file_processing_failed(worker_name, file_path)
+                continue
+            return file_path, file_stat
+
+    def lease_files(
+        self,
+        worker_name: str,
+        max_files: int,
+        max_bytes: Optional[int] = None,
+        chunks: bool = True,
+    ) -> List[Tuple[str, os.stat_result]]:
+        """Lease files to worker up to a files number and a bytes budget
+
+        At least one file is leased if any file is available, even it is
+        larger than the bytes budget. File chunks are leased too with
+        `chunks`.
+        """
+        result: List[Tuple[str, os.stat_result]] = []
+        total_bytes = 0
+        while len(result) < max_files:
+            if max_bytes is not None and total_bytes >= max_bytes:
+                break
+            leased = self.lease_file(worker_name, chunks=chunks)
+            if leased is None:
+                break
+            result.append(leased)
+            total_bytes += self.get_job_size(*leased)
+        return result
 
 
 def _get_worker_name(request: web.Request) -> str:
@@ -214,9 +810,10 @@ def _get_worker_name(request: web.Request) -> str:
 
 
 def _ensure_worker_registered(master: Master, worker_name: str) -> None:
-    """Ensure worker registered already"""
+    """Ensure worker registered already, and keep it alive"""
     if not master.worker_registered(worker_name):
         raise web.HTTPBadRequest(text="worker not registered yet")
+    master.worker_seen(worker_name)
 
 
 async def worker_register(request: web.Request) -> web.Response:
@@ -243,6 +840,74 @@ async def worker_register(request: web.Request) -> web.Response:
     return web.Response()
 
 
+async def worker_heartbeat(request: web.Request) -> web.Response:
+    """For worker to tell master it is alive
+
+    Workers without any request for `MASTER_WORKER_EVICT_SECONDS` are
+    evicted, and their processing files are requeued. Evicted workers should
+    register again.
+
+    request headers:
+
+    * X-DISTRIBUTED-WORKER-NAME: worker's name, worker should been registered
+                                 already. required
+
+    responses:
+
+    * 200 OK: successful
+    * 400 Bad Request: missing worker name header
+    * 400 Bad Request: worker not registered yet or evicted
+    """
+    master = request.app["master"]
+
+    worker_name = _get_worker_name(request)
+    _ensure_worker_registered(master, worker_name)
+
+    return web.Response()
+
+
+def _raise_no_available_file(master: Master) -> None:
+    """Tell worker to wait or stop while no file is available"""
+    # try to find out any processing files
+    if master.no_more_files():
+        # no more files
+        raise web.HTTPNoContent()
+    else:
+        # tell workers to wait until processing files timeout or more home
+        # files loaded
+        raise web.HTTPAccepted(
+            text="wait for processing files timeout and make request again"
+        )
+
+
+def _get_wait_query(request: web.Request, master: Master) -> float:
+    """Get seconds to wait for files from request query for long polling"""
+    value = request.query.get("wait")
+    if not value:
+        return 0
+    try:
+        wait = float(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text="invalid wait parameter")
+    if not wait >= 0:
+        raise web.HTTPBadRequest(text="invalid wait parameter")
+    return min(wait, master.config.MASTER_LONG_POLL_MAX_SECONDS)
+
+
+def _get_int_query(request: web.Request, name: str) -> Optional[int]:
+    """Get positive integer parameter from request query"""
+    value = request.query.get(name)
+    if not value:
+        return None
+    try:
+        result = int(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"invalid {name} parameter")
+    if result <= 0:
+        raise web.HTTPBadRequest(text=f"invalid {name} parameter")
+    return result
+
+
 async def get_file(request: web.Request) -> FileResponse:
     """For worker to pull file for calculating file hash task
 
@@ -251,53 +916,363 @@ async def get_file(request: web.Request) -> FileResponse:
     * X-DISTRIBUTED-WORKER-NAME: worker's name, worker should been registered
                                  already. required
 
+    request query parameters:
+
+    * wait: seconds to wait for a file if no file available at the moment,
+            capped by server side deadline. optional
+
     responses:
 
-    * 200 OK: file response
-    * 202 Accepted: wait for processing files timeout and make request again
+    * 200 OK: file response, with hash algorithms of file in header
+              X-DISTRIBUTED-HASH-ALGORITHMS
+    * 202 Accepted: wait for processing files timeout or home files loading
+                    and make request again
     * 204 No Content: no more files
     * 400 Bad Request: missing worker name header
-    * 400 Bad Request: worker not registered yet
+    * 400 Bad Request: worker not registered yet or evicted
+    * 400 Bad Request: invalid wait parameter
     """
     master = request.app["master"]
 
     worker_name = _get_worker_name(request)
     _ensure_worker_registered(master, worker_name)
+    wait = _get_wait_query(request, master)
 
-    try:
-        file_path = master.files_queue.get_nowait()
-    except asyncio.QueueEmpty:
-        # try to get timeout task
-        timeout_file = master.get_earlist_timeout_file()
-        if timeout_file:
-            _worker_name, file_path, _ = timeout_file
-            # remove old processing file
-            master.remove_current_processing_file(_worker_name, file_path)
-        else:
-            # try to find out any processing files
-            if not master.has_processing_files():
-                # no more files
-                raise web.HTTPNoContent()
-            else:
-                # tell workers to wait until processing files timeout
-                raise web.HTTPAccepted(
-                    text=(
-                        "wait for processing files timeout and make request"
-                        " again"
+    leased = await master.wait_lease_file(worker_name, wait)
+    # worker may be evicted while waiting
+    _ensure_worker_registered(master, worker_name)
+    if leased is None:
+        _raise_no_available_file(master)
+    file_path, file_stat = leased
+
+    full_path = master.home.get_full_path(file_path)
+    headers = {
+        constants.HTTP_HEADER_X_FILE_PATH: file_path,
+        constants.HTTP_HEADER_X_HASH_ALGORITHMS: ",".join(
+            master.home.algorithms
+        ),
+    }
+    resp = FileResponse(full_path, headers=headers)
+    if master.compression.should_compress(file_path, file_stat.st_size):
+        # compressed only if accepted by worker, see `Accept-Encoding`
+        resp.enable_compression()
+    return resp
+
+
+async def lease_files(request: web.Request) -> web.Response:
+    """For worker to lease a batch of files for calculating file hash task
+
+    request headers:
+
+    * X-DISTRIBUTED-WORKER-NAME: worker's name, worker should been registered
+                                 already. required
+
+    request query parameters:
+
+    * max_files: max number of files to lease. optional
+    * max_bytes: max total size of files to lease. optional
+    * wait: seconds to wait for files if no file available at the moment,
+            capped by server side deadline. optional
+
+    responses:
+
+    * 200 OK: json response of leased files manifest and hash algorithms
+    * 202 Accepted: wait for processing files timeout or home files loading
+                    and make request again
+    * 204 No Content: no more files
+    * 400 Bad Request: missing worker name header
+    * 400 Bad Request: worker not registered yet or evicted
+    * 400 Bad Request: invalid max_files or max_bytes or wait parameter
+    """
+    master = request.app["master"]
+
+    worker_name = _get_worker_name(request)
+    _ensure_worker_registered(master, worker_name)
+
+    max_files = _get_int_query(request, "max_files")
+    if max_files is None:
+        max_files = master.config.LEASE_MAX_FILES
+    max_bytes = _get_int_query(request, "max_bytes")
+    if max_bytes is None:
+        max_bytes = master.config.LEASE_MAX_BYTES
+
+    wait = _get_wait_query(request, master)
+
+    leased_files = await master.wait_lease_files(
+        worker_name, max_files, max_bytes, wait
+    )
+    # worker may be evicted while waiting
+    _ensure_worker_registered(master, worker_name)
+    if not leased_files:
+        _raise_no_available_file(master)
+
+    manifest = [
+        _get_manifest_entry(master, file_path, file_stat)
+        for file_path, file_stat in leased_files
+    ]
+    # file chunks are hashed by the first algorithm only
+    return web.json_response(
+        {"files": manifest, "hash_algorithms": master.home.algorithms}
+    )
+
+
+async def get_bundle(request: web.Request) -> web.StreamResponse:
+    """For worker to lease a batch of files and get them in one response
+
+    Leased files are streamed back-to-back in the response body as a bundle
+    of length-prefixed frames, see `distributed.bundles`. File chunks are
+    not leased in bundles. Files truncated while streaming are failed, and
+    followed by failed frames.
+
+    request headers:
+
+    * X-DISTRIBUTED-WORKER-NAME: worker's name, worker should been registered
+                                 already. required
+
+    request query parameters:
+
+    * max_files: max number of files to lease. optional
+    * max_bytes: max total size of files to lease. optional
+    * wait: seconds to wait for files if no file available at the moment,
+            capped by server side deadline. optional
+
+    responses:
+
+    * 200 OK: bundle of leased files, with hash algorithms of files in header
+              X-DISTRIBUTED-HASH-ALGORITHMS
+    * 202 Accepted: wait for processing files timeout or home files loading
+                    and make request again
+    * 204 No Content: no more files
+    * 400 Bad Request: missing worker name header
+    * 400 Bad Request: worker not registered yet or evicted
+    * 400 Bad Request: invalid max_files or max_bytes or wait parameter
+    """
+    master = request.app["master"]
+
+    worker_name = _get_worker_name(request)
+    _ensure_worker_registered(master, worker_name)
+
+    max_files = _get_int_query(request, "max_files")
+    if max_files is None:
+        max_files = master.config.BUNDLE_MAX_FILES
+    max_bytes = _get_int_query(request, "max_bytes")
+    if max_bytes is None:
+        max_bytes = master.config.LEASE_MAX_BYTES
+
+    wait = _get_wait_query(request, master)
+
+    leased_files = await master.wait_lease_files(
+        worker_name, max_files, max_bytes, wait, chunks=False
+    )
+    # worker may be evicted while waiting
+    _ensure_worker_registered(master, worker_name)
+    if not leased_files:
+        _raise_no_available_file(master)
+
+    resp = web.StreamResponse(
+        headers={
+            "Content-Type": "application/octet-stream",
+            constants.HTTP_HEADER_X_HASH_ALGORITHMS: ",".join(
+                master.home.algorithms
+            ),
+        }
+    )
+    await resp.prepare(request)
+    loop = asyncio.get_running_loop()
+    chunk_size = master.config.CHUNK_SIZE
+    for file_path, _ in leased_files:
+        full_path = master.home.get_full_path(file_path)
+        try:
+            f = open(full_path, "rb")
+        except OSError as ex:
+            print(ex)
+            master.file_processing_failed(worker_name, file_path)
+            continue
+        with f:
+            # size of the opened file, which may be changed after leased
+            remaining = os.fstat(f.fileno()).st_size
+            await resp.write(pack_frame_header(file_path, remaining))
+            truncated = False
+            while remaining:
+                if truncated:
+                    chunk = bytes(min(chunk_size, remaining))
+                else:
+                    chunk = await loop.run_in_executor(
+                        None, f.read, min(chunk_size, remaining)
                     )
-                )
+                if not chunk:
+                    # file truncated while streaming, pad the frame so that
+                    # frames after it can still be parsed
+                    print(f"file(path={file_path}) truncated while streaming.")
+                    truncated = True
+                    continue
+                await resp.write(chunk)
+                remaining -= len(chunk)
+        if truncated:
+            await resp.write(pack_failed_frame(file_path))
+            master.file_processing_failed(worker_name, file_path)
+    await resp.write_eof()
+    return resp
+
+
+def _get_manifest_entry(
+    master: Master, key: str, file_stat: os.stat_result
+) -> Dict[str, Any]:
+    file_path, chunk = split_chunk_key(key)
+    # file size and mtime let workers sharing the home storage check their
+    # local copies before hashing them in place
+    entry = {
+        "file_path": file_path,
+        "file_size": file_stat.st_size,
+        "file_mtime_ns": file_stat.st_mtime_ns,
+    }
+    if chunk is not None:
+        offset, length = master.get_chunk_range(file_stat.st_size, chunk)
+        entry.update({"chunk": chunk, "offset": offset, "length": length})
+    return entry
+
+
+async def fetch_file(request: web.Request) -> FileResponse:
+    """For worker to fetch a leased file
+
+    request headers:
+
+    * X-DISTRIBUTED-WORKER-NAME: worker's name, worker should been registered
+                                 already. required
+    * X-DISTRIBUTED-FILE-PATH: file path. required
+    * X-DISTRIBUTED-FILE-CHUNK: file chunk index for leased file chunk, along
+                                with a Range header of the chunk. optional
 
-    master.new_processing_file(worker_name, file_path)
-    master.files_queue.task_done()
+    responses:
+
+    * 200 OK: file response
+    * 206 Partial Content: file chunk response
+    * 400 Bad Request: missing worker name header
+    * 400 Bad Request: worker not registered yet
+    * 400 Bad Request: missing file path header
+    * 400 Bad Request: invalid file chunk header
+    * 409 Conflict: file is not leased to worker
+    """
+    master = request.app["master"]
+
+    worker_name = _get_worker_name(request)
+    _ensure_worker_registered(master, worker_name)
+
+    file_path = request.headers.get(constants.HTTP_HEADER_X_FILE_PATH)
+    if not file_path:
+        raise web.HTTPBadRequest(text="missing file path header")
+    key = file_path
+    chunk = request.headers.get(constants.HTTP_HEADER_X_FILE_CHUNK)
+    if chunk is not None:
+        if not chunk.isdigit():
+            raise web.HTTPBadRequest(text="invalid file chunk header")
+        key = get_chunk_key(file_path, int(chunk))
+    if not master.is_processing_file(worker_name, key):
+        # lease timeout and file has been leased to other worker
+        raise web.HTTPConflict(text="file is not leased to worker")
 
     full_path = master.home.get_full_path(file_path)
     headers = {constants.HTTP_HEADER_X_FILE_PATH: file_path}
     return FileResponse(full_path, headers=headers)
 
 
+def _check_file_hashes(
+    master: Master,
+    file_hash: str,
+    extra_hashes: Optional[Dict[str, str]] = None,
+) -> None:
+    try:
+        master.home.check_file_hashes(file_hash, extra_hashes)
+    except ValueError:
+        raise web.HTTPBadRequest(text="invalid file_hash parameter")
+
+
+def _split_file_hashes(
+    master: Master, value: Any
+) -> Tuple[str, Dict[str, str]]:
+    """Split reported hashes of a file into the first one and others
+
+    A file hash is reported as hex digest of the first algorithm, or as a
+    mapping of algorithms to hex digests.
+    """
+    if not isinstance(value, dict):
+        value = {master.home.algorithms[0]: value}
+    for hash_ in value.values():
+        if not hash_ or not isinstance(hash_, str):
+            raise web.HTTPBadRequest(text="missing file_hash parameter")
+    extra_hashes = dict(value)
+    file_hash = extra_hashes.pop(master.home.algorithms[0], None)
+    if file_hash is None:
+        raise web.HTTPBadRequest(text="missing file_hash parameter")
+    _check_file_hashes(master, file_hash, extra_hashes)
+    return file_hash, extra_hashes
+
+
+async def _update_file_hashes(
+    request: web.Request, master: Master, worker_name: str
+) -> web.Response:
+    """Update file hashes and file chunk hashes in bulk from json body"""
+    try:
+        body = await request.json()
+        file_hashes = body.get("files", {})
+        chunk_hashes = [
+            (item["file_path"], item["chunk"], item["file_hash"])
+            for item in body.get("chunks", [])
+        ]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise web.HTTPBadRequest(text="invalid json body")
+    if not isinstance(file_hashes, dict):
+        raise web.HTTPBadRequest(text="invalid json body")
+
+    hashes = {
+        file_path: _split_file_hashes(master, file_hash)
+        for file_path, file_hash in file_hashes.items()
+    }
+    for _, chunk, chunk_hash in chunk_hashes:
+        if not isinstance(chunk, int):
+            raise web.HTTPBadRequest(text="invalid chunk parameter")
+        if not chunk_hash or not isinstance(chunk_hash, str):
+            raise web.HTTPBadRequest(text="missing file_hash parameter")
+        # file chunks are hashed by the first algorithm only
+        _check_file_hashes(master, chunk_hash)
+
+    not_found = []
+    for file_path, (file_hash, extra_hashes) in hashes.items():
+        if master.home.file_exists(file_path):
+            master.file_processing_finished(
+                worker_name, file_path, file_hash, extra_hashes
+            )
+        else:
+            not_found.append(file_path)
+    result: Dict[str, Any] = {"not_found": not_found}
+
+    if chunk_hashes:
+        not_found_chunks = []
+        for file_path, chunk, chunk_hash in chunk_hashes:
+            if not master.file_chunk_processing_finished(
+                worker_name, file_path, chunk, chunk_hash
+            ):
+                not_found_chunks.append(
+                    {"file_path": file_path, "chunk": chunk}
+                )
+        result["not_found_chunks"] = not_found_chunks
+    return web.json_response(result)
+
+
 async def update_file_hash(request: web.Request) -> web.Response:
     """For worker to report file hash
 
+    Multiple file hashes can be reported in bulk as json body
+    `{"files": {file_path: file_hash}}`, and paths of not found files are
+    responded as json `{"not_found": [file_path]}`. Hashes of several
+    algorithms are reported in bulk only, as
+    `{"files": {file_path: {algorithm: file_hash}}}` in json body.
+
+    Hashes of leased file chunks are reported in bulk only, as
+    `{"chunks": [{"file_path": ..., "chunk": ..., "file_hash": ...}]}` in
+    json body, and not found file chunks are responded as
+    `{"not_found_chunks": [{"file_path": ..., "chunk": ...}]}` in json.
+
     request headers:
 
     * X-DISTRIBUTED-WORKER-NAME: worker's name, worker should been registered
@@ -310,6 +1285,8 @@ async def update_file_hash(request: web.Request) -> web.Response:
     * 400 Bad Request: missing worker name header
     * 400 Bad Request: missing file_path parameter
     * 400 Bad Request: missing file_hash parameter
+    * 400 Bad Request: invalid file_hash parameter
+    * 400 Bad Request: invalid json body
     * 404 Bad Request: file not found
     """
     master = request.app["master"]
@@ -317,13 +1294,17 @@ async def update_file_hash(request: web.Request) -> web.Response:
     worker_name = _get_worker_name(request)
     _ensure_worker_registered(master, worker_name)
 
+    if request.content_type == "application/json":
+        return await _update_file_hashes(request, master, worker_name)
+
     form = await request.post()
     file_path = form.get("file_path")
     if not file_path:
         raise web.HTTPBadRequest(text="missing file_path parameter")
     file_hash = form.get("file_hash")
-    if not file_hash:
+    if not file_hash or not isinstance(file_hash, str):
         raise web.HTTPBadRequest(text="missing file_hash parameter")
+    _check_file_hashes(master, file_hash)
 
     if master.home.file_exists(file_path):
         master.file_processing_finished(worker_name, file_path, file_hash)
@@ -338,27 +1319,105 @@ async def home_status(request: web.Request) -> web.Response:
 
     request query parameters:
 
-    * include_files: whether including files with hashes. optional
+    * include_files: whether including files with hashes, hashes of other
+                     algorithms, tree hashes of files hashed in chunks, and
+                     groups of duplicate files if any. optional
 
     responses:
 
-    * 200 OK: json response of status
+    * 200 OK: json response of status, with error of loading home files
+              if any
     """
     master = request.app["master"]
     state = master.home.state
     outdict = {"state": state}
+    # shared by masters not loading home files in background
+    load_error = getattr(master, "load_error", None)
+    if load_error is not None:
+        outdict["load_error"] = load_error
     if request.query.get("include_files"):
-        outdict["files"] = master.home.files
+        outdict["files"] = dict(master.home.files)
+        if master.home.tree_hashes:
+            outdict["tree_hashes"] = master.home.tree_hashes
+        if master.home.hashes:
+            outdict["hashes"] = master.home.hashes
+        if master.home.duplicates_only:
+            outdict["duplicates"] = list(master.home.iter_duplicates())
     return web.json_response(outdict)
 
 
-def init(home_dir) -> web.Application:
+def _loading_files_done(task: asyncio.Task) -> None:
+    # error is reported in home status, see `load_files`
+    if not task.cancelled():
+        task.exception()
+
+
+async def _start_loading_files(app: web.Application) -> None:
+    app["load_files"] = asyncio.create_task(app["master"].load_files())
+    app["load_files"].add_done_callback(_loading_files_done)
+
+
+async def _stop_loading_files(app: web.Application) -> None:
+    app["load_files"].cancel()
+
+
+async def _sync_journal(master: Master) -> None:
+    while True:
+        await asyncio.sleep(master.config.MASTER_JOURNAL_SYNC_SECONDS)
+        await master.sync_journal()
+
+
+async def _start_syncing_journal(app: web.Application) -> None:
+    master = app["master"]
+    if master.journal is not None:
+        app["sync_journal"] = asyncio.create_task(_sync_journal(master))
+
+
+async def _stop_syncing_journal(app: web.Application) -> None:
+    if "sync_journal" in app:
+        app["sync_journal"].cancel()
+        await app["master"].wait_journal_synced()
+
+
+async def _evict_workers(master: Master) -> None:
+    while True:
+        await asyncio.sleep(master.config.MASTER_WORKER_EVICT_SECONDS / 2)
+        master.evict_silent_workers()
+
+
+async def _start_evicting_workers(app: web.Application) -> None:
+    master = app["master"]
+    if master.config.MASTER_WORKER_EVICT_SECONDS is not None:
+        app["evict_workers"] = asyncio.create_task(_evict_workers(master))
+
+
+async def _stop_evicting_workers(app: web.Application) -> None:
+    if "evict_workers" in app:
+        app["evict_workers"].cancel()
+
+
+async def _close_home(app: web.Application) -> None:
+    app["master"].home.close()
+
+
+def init(home_dir, config: Optional[Any] = None) -> web.Application:
     app = web.Application()
-    app["master"] = Master(home_dir)
+    app["master"] = Master(home_dir, config=config)
+    app.on_startup.append(_start_loading_files)
+    app.on_startup.append(_start_syncing_journal)
+    app.on_startup.append(_start_evicting_workers)
+    app.on_cleanup.append(_stop_loading_files)
+    app.on_cleanup.append(_stop_evicting_workers)
+    app.on_cleanup.append(_stop_syncing_journal)
+    app.on_cleanup.append(_close_home)
     app.add_routes(
         [
             web.post("/worker_register", worker_register),
+            web.post("/worker_heartbeat", worker_heartbeat),
             web.get("/get_file", get_file),
+            web.get("/lease_files", lease_files),
+            web.get("/fetch_file", fetch_file),
+            web.get("/get_bundle", get_bundle),
             web.put("/update_file_hash", update_file_hash),
             web.get("/home_status", home_status),
         ]
@@ -368,7 +1427,6 @@ def init(home_dir) -> web.Application:
 
 if __name__ == "__main__":
     import argparse
-    import os
 
     parser = argparse.ArgumentParser(description="distributed master server")
     parser.add_argument("--home")
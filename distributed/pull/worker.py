@@ -1,12 +1,31 @@
 import asyncio
-import hashlib
 import multiprocessing
-from typing import Any, Dict, Generator, List, Optional, Tuple, Union, cast
+import os
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Generator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+    cast,
+)
 
 import aiohttp
 
 from distributed import config as default_config
 from distributed import constants
+from distributed.bundles import iter_bundle_hashes
+from distributed.hashing import (
+    MultiHash,
+    calc_file_hashes,
+    parse_hash_algorithms,
+)
+from distributed.home import Home
 
 
 class NoMoreFiles(Exception):
@@ -17,93 +36,437 @@ class WaitForTimeoutFile(Exception):
     """Wait for processing timeout file from master"""
 
 
+class WorkerEvicted(Exception):
+    """Worker is not registered in master, evicted for example"""
+
+
 class Worker(multiprocessing.Process):
-    def __init__(self, name: str, config: Optional[Any] = None):
+    def __init__(
+        self,
+        name: str,
+        config: Optional[Any] = None,
+        batch: bool = False,
+        shared_home_dir: Optional[str] = None,
+        pipeline_depth: Optional[int] = None,
+        bundle: bool = False,
+    ):
         super().__init__()
         self.name = name
         self.config = config if config is not None else default_config
+        # lease files in batch instead of one file per request
+        self.batch = batch
+        # home directory shared with master, files in it are hashed in place
+        self.shared_home = (
+            Home(shared_home_dir) if shared_home_dir is not None else None
+        )
+        # get batches of files in bundles instead of one file per request,
+        # unless files are hashed in place in shared home
+        self.bundle = bundle
+        # files (or batches of files) in flight concurrently
+        self.pipeline_depth = (
+            pipeline_depth
+            if pipeline_depth is not None
+            else self.config.WORKER_PIPELINE_DEPTH
+        )
 
         self.master_addr = self.config.MASTER
         self.master_endpoint = "http://{0}:{1}".format(*self.master_addr)
         self.worker_register_endpoint = (
             f"{self.master_endpoint}/worker_register"
         )
+        self.worker_heartbeat_endpoint = (
+            f"{self.master_endpoint}/worker_heartbeat"
+        )
         self.get_file_endpoint = f"{self.master_endpoint}/get_file"
+        self.lease_files_endpoint = f"{self.master_endpoint}/lease_files"
+        self.fetch_file_endpoint = f"{self.master_endpoint}/fetch_file"
+        self.get_bundle_endpoint = f"{self.master_endpoint}/get_bundle"
         self.report_file_hash_endpoint = (
             f"{self.master_endpoint}/update_file_hash"
         )
 
         self.chunk_size = self.config.CHUNK_SIZE
 
+        # one keep-alive session for all requests in worker process, see
+        # `main`
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # session should be created before this
+        return cast(aiohttp.ClientSession, self.session)
+
     async def worker_register(self) -> bool:
-        async with aiohttp.ClientSession() as session:
-            headers = {constants.HTTP_HEADER_X_WORKER_NAME: self.name}
-            async with session.post(
-                self.worker_register_endpoint, headers=headers
-            ) as resp:
-                # TODO should be 200 OK
-                # print(resp.status)
-                return resp.status == 200
-
-    async def fetch_file_and_calculate_hash(self) -> Tuple[str, str]:
-        async with aiohttp.ClientSession() as session:
-            headers = {constants.HTTP_HEADER_X_WORKER_NAME: self.name}
-            async with session.get(
-                self.get_file_endpoint, headers=headers
-            ) as resp:
-                # TODO should be 200 OK or 202 Accepted or 204 No Content
-                # print(resp.status)
-                if resp.status == 202:
-                    raise WaitForTimeoutFile
-                elif resp.status == 204:
-                    raise NoMoreFiles
-                else:
-                    file_path = resp.headers.get(
-                        constants.HTTP_HEADER_X_FILE_PATH
-                    )
-                    h = hashlib.new("sha1")
-                    while True:
-                        chunk = await resp.content.read(self.chunk_size)
-                        if not chunk:
-                            break
-                        h.update(chunk)
-                    file_hash = h.hexdigest()
-                    return file_path, file_hash
+        session = self._get_session()
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: self.name}
+        async with session.post(
+            self.worker_register_endpoint, headers=headers
+        ) as resp:
+            # TODO should be 200 OK
+            # print(resp.status)
+            return resp.status == 200
+
+    async def worker_heartbeat(self) -> bool:
+        """Tell master this worker is alive, False if evicted by master"""
+        session = self._get_session()
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: self.name}
+        async with session.post(
+            self.worker_heartbeat_endpoint, headers=headers
+        ) as resp:
+            return resp.status == 200
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.WORKER_HEARTBEAT_SECONDS)
+            try:
+                if not await self.worker_heartbeat():
+                    # evicted by master, files of this worker are requeued
+                    await self.worker_register()
+            except aiohttp.ClientError as e:
+                print(f"worker(name={self.name}) heartbeat failed: {e!r}")
+
+    def _get_long_poll_params(self) -> Dict[str, Any]:
+        wait = self.config.WORKER_LONG_POLL_SECONDS
+        if not wait:
+            return {}
+        return {"wait": wait}
+
+    def _check_lease_response(self, resp: aiohttp.ClientResponse) -> None:
+        """Raise if master has no files for this worker or evicted it"""
+        if resp.status == 202:
+            raise WaitForTimeoutFile
+        elif resp.status == 204:
+            raise NoMoreFiles
+        elif resp.status == 400:
+            raise WorkerEvicted
+        resp.raise_for_status()
+
+    def _get_accept_encoding(self) -> str:
+        # deflate only, since master may send a pre-compressed sibling file
+        # `<path>.gz` for gzip
+        return "deflate" if self.config.COMPRESSION else "identity"
+
+    async def fetch_file_and_calculate_hash(
+        self
+    ) -> Tuple[str, Dict[str, str]]:
+        """Return file path and hex digests of hash algorithms from master"""
+        session = self._get_session()
+        headers = {
+            constants.HTTP_HEADER_X_WORKER_NAME: self.name,
+            "Accept-Encoding": self._get_accept_encoding(),
+        }
+        async with session.get(
+            self.get_file_endpoint,
+            headers=headers,
+            params=self._get_long_poll_params(),
+        ) as resp:
+            self._check_lease_response(resp)
+            file_path = resp.headers[constants.HTTP_HEADER_X_FILE_PATH]
+            algorithms = parse_hash_algorithms(
+                resp.headers.get(constants.HTTP_HEADER_X_HASH_ALGORITHMS)
+            )
+            file_hashes = await self._calculate_hash(resp, algorithms)
+            return file_path, file_hashes
+
+    async def _calculate_hash(
+        self, resp: aiohttp.ClientResponse, algorithms: Sequence[str]
+    ) -> Dict[str, str]:
+        h = MultiHash(algorithms)
+        while True:
+            chunk = await resp.content.read(self.chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+        return h.hexdigests()
+
+    async def lease_files(self) -> Tuple[List[Dict[str, Any]], List[str]]:
+        """Return leased files manifest and hash algorithms of files"""
+        session = self._get_session()
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: self.name}
+        params = {
+            "max_files": self.config.LEASE_MAX_FILES,
+            "max_bytes": self.config.LEASE_MAX_BYTES,
+        }
+        params.update(self._get_long_poll_params())
+        async with session.get(
+            self.lease_files_endpoint, headers=headers, params=params
+        ) as resp:
+            self._check_lease_response(resp)
+            manifest = await resp.json()
+            algorithms = manifest.get("hash_algorithms") or ["sha1"]
+            return manifest["files"], algorithms
+
+    async def fetch_leased_file_and_calculate_hash(
+        self, leased_file: Dict[str, Any], algorithms: Sequence[str]
+    ) -> Optional[Dict[str, str]]:
+        """Return `None` if file is not leased to this worker any more"""
+        session = self._get_session()
+        headers = {
+            constants.HTTP_HEADER_X_WORKER_NAME: self.name,
+            constants.HTTP_HEADER_X_FILE_PATH: leased_file["file_path"],
+            # not `<path>.gz` sibling file in place of the file
+            "Accept-Encoding": "identity",
+        }
+        chunk = leased_file.get("chunk")
+        if chunk is not None:
+            # fetch file chunk by HTTP range request
+            offset = leased_file["offset"]
+            end = offset + leased_file["length"] - 1
+            headers[constants.HTTP_HEADER_X_FILE_CHUNK] = str(chunk)
+            headers["Range"] = f"bytes={offset}-{end}"
+        async with session.get(
+            self.fetch_file_endpoint, headers=headers
+        ) as resp:
+            if resp.status == 409:
+                return None
+            if chunk is not None and resp.status != 206:
+                print(
+                    f"file(path={leased_file['file_path']}) chunk {chunk}"
+                    f" not served as partial content: {resp.status}."
+                )
+                return None
+            return await self._calculate_hash(resp, algorithms)
+
+    async def get_bundle_and_calculate_hashes(
+        self
+    ) -> Dict[str, Dict[str, str]]:
+        """Return file paths and hex digests of files in a bundle
+
+        Files are hashed incrementally while the bundle is parsed, and those
+        complete are returned if the bundle is truncated.
+        """
+        session = self._get_session()
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: self.name}
+        params = {
+            "max_files": self.config.BUNDLE_MAX_FILES,
+            "max_bytes": self.config.LEASE_MAX_BYTES,
+        }
+        params.update(self._get_long_poll_params())
+        async with session.get(
+            self.get_bundle_endpoint, headers=headers, params=params
+        ) as resp:
+            self._check_lease_response(resp)
+            algorithms = parse_hash_algorithms(
+                resp.headers.get(constants.HTTP_HEADER_X_HASH_ALGORITHMS)
+            )
+            result: Dict[str, Dict[str, str]] = {}
+            try:
+                async for file_path, hashes in iter_bundle_hashes(
+                    resp.content.readexactly, self.chunk_size, algorithms
+                ):
+                    if hashes is None:
+                        # file failed by master while streaming
+                        result.pop(file_path, None)
+                    else:
+                        result[file_path] = hashes
+            except (
+                asyncio.IncompleteReadError,
+                aiohttp.ClientPayloadError,
+            ) as e:
+                # files not complete are leased again after timeout
+                print(f"bundle truncated after {len(result)} files: {e!r}")
+            return result
 
     async def report_file_hash(self, file_path: str, file_hash: str) -> bool:
-        async with aiohttp.ClientSession() as session:
-            payload = {"file_path": file_path, "file_hash": file_hash}
-            headers = {constants.HTTP_HEADER_X_WORKER_NAME: self.name}
-            async with session.put(
-                self.report_file_hash_endpoint, data=payload, headers=headers
-            ) as resp:
-                # TODO should be 200 OK
-                # print(resp.status)
-                return resp.status == 200
+        session = self._get_session()
+        payload = {"file_path": file_path, "file_hash": file_hash}
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: self.name}
+        async with session.put(
+            self.report_file_hash_endpoint, data=payload, headers=headers
+        ) as resp:
+            # TODO should be 200 OK
+            # print(resp.status)
+            return resp.status == 200
+
+    def _get_shared_file_path(
+        self, leased_file: Dict[str, Any]
+    ) -> Optional[str]:
+        """Get full path of leased file in shared home directory
+
+        `None` is returned if the local copy does not match the expected size
+        and mtime from master.
+        """
+        shared_home = cast(Home, self.shared_home)
+        full_path = shared_home.get_full_path(leased_file["file_path"])
+        try:
+            file_stat = os.stat(full_path)
+        except OSError:
+            return None
+        if (
+            file_stat.st_size != leased_file["file_size"]
+            or file_stat.st_mtime_ns != leased_file["file_mtime_ns"]
+        ):
+            return None
+        return full_path
+
+    async def calculate_leased_file_hash(
+        self, leased_file: Dict[str, Any], algorithms: Sequence[str]
+    ) -> Optional[Dict[str, str]]:
+        """Hash leased file in place if possible, otherwise fetch it
+
+        Hex digests of all algorithms are calculated in one pass.
+        """
+        file_path = leased_file["file_path"]
+        if self.shared_home is not None:
+            full_path = self._get_shared_file_path(leased_file)
+            if full_path is not None:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    None,
+                    calc_file_hashes,
+                    full_path,
+                    self.chunk_size,
+                    algorithms,
+                    leased_file.get("offset", 0),
+                    leased_file.get("length"),
+                )
+            print(
+                f"file(path={file_path}) in shared home does not match."
+                " fetch it from master."
+            )
+        return await self.fetch_leased_file_and_calculate_hash(
+            leased_file, algorithms
+        )
+
+    async def report_file_hashes(
+        self,
+        file_hashes: Dict[str, Union[str, Dict[str, str]]],
+        chunk_hashes: Optional[List[Dict[str, Any]]] = None,
+    ) -> bool:
+        session = self._get_session()
+        payload: Dict[str, Any] = {"files": file_hashes}
+        if chunk_hashes:
+            payload["chunks"] = chunk_hashes
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: self.name}
+        async with session.put(
+            self.report_file_hash_endpoint, json=payload, headers=headers
+        ) as resp:
+            return resp.status == 200
 
     async def work(self) -> None:
-        file_path, file_hash = await self.fetch_file_and_calculate_hash()
-        await self.report_file_hash(file_path, file_hash)
+        file_path, file_hashes = await self.fetch_file_and_calculate_hash()
+        if len(file_hashes) == 1:
+            (file_hash,) = file_hashes.values()
+            await self.report_file_hash(file_path, file_hash)
+        else:
+            # hashes of several algorithms are reported in bulk only
+            await self.report_file_hashes({file_path: file_hashes})
 
-    def run(self) -> None:
-        asyncio.run(self.worker_register())
+    async def work_batch(self) -> None:
+        leased_files, algorithms = await self.lease_files()
+        file_hashes: Dict[str, Union[str, Dict[str, str]]] = {}
+        chunk_hashes = []
+        for leased_file in leased_files:
+            file_path = leased_file["file_path"]
+            chunk = leased_file.get("chunk")
+            if chunk is None:
+                hashes = await self.calculate_leased_file_hash(
+                    leased_file, algorithms
+                )
+                if hashes is None:
+                    continue
+                if len(hashes) == 1:
+                    file_hashes[file_path] = hashes[algorithms[0]]
+                else:
+                    file_hashes[file_path] = hashes
+            else:
+                # file chunks are hashed by the first algorithm only
+                hashes = await self.calculate_leased_file_hash(
+                    leased_file, algorithms[:1]
+                )
+                if hashes is None:
+                    continue
+                chunk_hashes.append(
+                    {
+                        "file_path": file_path,
+                        "chunk": chunk,
+                        "file_hash": hashes[algorithms[0]],
+                    }
+                )
+        if file_hashes or chunk_hashes:
+            await self.report_file_hashes(file_hashes, chunk_hashes)
+
+    async def work_bundle(self) -> None:
+        bundle_hashes = await self.get_bundle_and_calculate_hashes()
+        file_hashes: Dict[str, Union[str, Dict[str, str]]] = {}
+        for file_path, hashes in bundle_hashes.items():
+            if len(hashes) == 1:
+                (file_hashes[file_path],) = hashes.values()
+            else:
+                file_hashes[file_path] = hashes
+        if file_hashes:
+            await self.report_file_hashes(file_hashes)
+
+    async def _work_loop(self, work: Callable[[], Awaitable[None]]) -> None:
         while True:
             try:
-                asyncio.run(self.work())
+                await work()
             except WaitForTimeoutFile:
-                asyncio.run(
-                    asyncio.sleep(
-                        self.config.WORKER_WAIT_FOR_TIMEOUT_FILE_SECONDS
-                    )
+                if self.config.WORKER_LONG_POLL_SECONDS:
+                    # master has waited for files already
+                    continue
+                await asyncio.sleep(
+                    self.config.WORKER_WAIT_FOR_TIMEOUT_FILE_SECONDS
+                )
+            except aiohttp.ClientResponseError as e:
+                print(f"worker(name={self.name}) request failed: {e!r}")
+                await asyncio.sleep(
+                    self.config.WORKER_WAIT_FOR_TIMEOUT_FILE_SECONDS
                 )
+            except WorkerEvicted:
+                # files of this worker are requeued by master already
+                print(f"worker(name={self.name}) evicted. register again.")
+                await self.worker_register()
             except NoMoreFiles:
                 break
 
+    async def main(self) -> None:
+        async with aiohttp.ClientSession() as session:
+            self.session = session
+            heartbeat = None
+            try:
+                await self.worker_register()
+                if self.config.WORKER_HEARTBEAT_SECONDS:
+                    heartbeat = asyncio.ensure_future(self._heartbeat())
+                if self.batch or self.shared_home is not None:
+                    work = self.work_batch
+                elif self.bundle:
+                    work = self.work_bundle
+                else:
+                    work = self.work
+                # every work loop keeps one file (or batch) in flight, so
+                # that network waits of some files overlap hashing of others
+                await asyncio.gather(
+                    *(
+                        self._work_loop(work)
+                        for _ in range(max(self.pipeline_depth, 1))
+                    )
+                )
+            finally:
+                if heartbeat is not None:
+                    heartbeat.cancel()
+                self.session = None
+
+    def run(self) -> None:
+        asyncio.run(self.main())
+
 
-def main(worker_name: str, processes_number: int) -> None:
+def main(
+    worker_name: str,
+    processes_number: int,
+    batch: bool,
+    shared_home_dir: Optional[str],
+    pipeline_depth: Optional[int],
+    bundle: bool,
+) -> None:
     processes = []
     for _ in range(processes_number):
-        process = Worker(worker_name)
+        process = Worker(
+            worker_name,
+            batch=batch,
+            shared_home_dir=shared_home_dir,
+            pipeline_depth=pipeline_depth,
+            bundle=bundle,
+        )
         process.start()
         processes.append(process)
 
@@ -118,7 +481,31 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="distributed worker")
     parser.add_argument("--name", default="worker")
     parser.add_argument("--processes", default=worker_number)
+    parser.add_argument(
+        "--batch", action="store_true", help="lease files in batch"
+    )
+    parser.add_argument(
+        "--bundle",
+        action="store_true",
+        help="get files in batch in one response",
+    )
+    parser.add_argument(
+        "--shared-home",
+        help="home directory shared with master, hash files in place",
+    )
+    parser.add_argument(
+        "--pipeline-depth",
+        type=int,
+        help="files in flight concurrently in every process",
+    )
     args = parser.parse_args()
 
-    main(args.name, args.processes)
+    main(
+        args.name,
+        args.processes,
+        args.batch,
+        args.shared_home,
+        args.pipeline_depth,
+        args.bundle,
+    )
     print("done")
@@ -0,0 +1,179 @@
+import asyncio
+import os
+from typing import Any, List, Optional, Set
+
+import aiohttp
+from aiohttp import web
+
+from distributed.pull.master import home_status
+import distributed.simple.master as simple_master
+
+
+class _Worker(simple_master._Worker):
+    def __init__(
+        self, host: str, port: int, master: simple_master.BaseMaster
+    ) -> None:
+        super().__init__(host, port, master)
+        self.status_endpoint = f"http://{host}:{port}/status"
+        # reported by worker, and counted by master between reports
+        self.total = 0
+        self.idle = 0
+        self.cpu_percent = 0.0
+        self.reachable = False
+
+    async def update_status(self) -> None:
+        session = self.master.get_session()
+        timeout = aiohttp.ClientTimeout(
+            total=self.master.config.PUSH_MASTER_STATUS_SECONDS * 4
+        )
+        try:
+            async with session.get(
+                self.status_endpoint, timeout=timeout
+            ) as resp:
+                resp.raise_for_status()
+                status = await resp.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+            if self.reachable:
+                print(ex)
+                print(f"{self.status_endpoint} is unreachable.")
+            self.reachable = False
+            self.idle = 0
+            return
+
+        self.reachable = True
+        self.total = status["total"]
+        self.idle = status["idle"]
+        self.cpu_percent = status["cpu_percent"]
+
+    def _job_failed(
+        self, file_path: str, ex: aiohttp.ClientResponseError
+    ) -> bool:
+        """Put file back if worker is busy, return `False` for it"""
+        if ex.status != 503:
+            return super()._job_failed(file_path, ex)
+        # no idle job in worker, until next status report
+        self.idle = 0
+        self.master.files_queue.put_nowait(file_path)
+        return False
+
+
+class Master(simple_master.BaseMaster):
+    def __init__(self, home_dir: str, config: Optional[Any] = None) -> None:
+        super().__init__(home_dir, config=config)
+
+        # concurrency of workers is reported by workers themselves
+        self.workers: List[_Worker] = [
+            _Worker(host, port, self)
+            for host, port, *_ in self.config.WORKERS
+        ]
+        # set when idle jobs of workers may be changed, created in `dispatch`
+        self._idle_changed: Optional[asyncio.Event] = None
+
+    def _notify_idle_changed(self) -> None:
+        if self._idle_changed is not None:
+            self._idle_changed.set()
+
+    async def collect_status(self) -> None:
+        """Collect status of all workers periodically"""
+        while True:
+            await asyncio.gather(
+                *(worker.update_status() for worker in self.workers)
+            )
+            self._notify_idle_changed()
+            await asyncio.sleep(self.config.PUSH_MASTER_STATUS_SECONDS)
+
+    def _pick_worker(self) -> Optional[_Worker]:
+        """Worker of the most idle jobs, the least busy host first"""
+        workers = [worker for worker in self.workers if worker.idle > 0]
+        if not workers:
+            return None
+        return max(workers, key=lambda w: (w.idle, -w.cpu_percent))
+
+    async def _run_job(self, worker: _Worker, file_path: str) -> None:
+        idle = True
+        try:
+            idle = await worker.process_file(file_path)
+        except Exception:
+            # unexpected error, keep dispatching other files
+            self.home.set_file_failed(file_path)
+            raise
+        finally:
+            # otherwise file is put back and worker has no idle job until
+            # next status report
+            if idle:
+                worker.idle += 1
+            self.files_queue.task_done()
+            self._notify_idle_changed()
+
+    async def dispatch(self) -> None:
+        """Push files to workers of idle jobs until all files hashed
+
+        Files are pushed to workers as soon as any idle job is reported, and
+        files rejected by busy or unreachable workers are pushed again.
+        """
+        self._idle_changed = asyncio.Event()
+        jobs: Set[asyncio.Future] = set()
+        while True:
+            if self.files_queue.empty():
+                if not jobs:
+                    break
+                # files of failed jobs are put back to files queue
+                await asyncio.wait(jobs, return_when=asyncio.FIRST_COMPLETED)
+                continue
+            worker = self._pick_worker()
+            if worker is None:
+                self._idle_changed.clear()
+                await self._idle_changed.wait()
+                continue
+            worker.idle -= 1
+            file_path = self.files_queue.get_nowait()
+            job = asyncio.ensure_future(self._run_job(worker, file_path))
+            jobs.add(job)
+            job.add_done_callback(jobs.discard)
+        print(f"files dispatched. state: {self.home.state}")
+
+
+async def _start_pushing_files(app: web.Application) -> None:
+    master = app["master"]
+    master.session = aiohttp.ClientSession()
+    app["collect_status"] = asyncio.create_task(master.collect_status())
+    app["dispatch"] = asyncio.create_task(master.dispatch())
+
+
+async def _stop_pushing_files(app: web.Application) -> None:
+    master = app["master"]
+    app["dispatch"].cancel()
+    app["collect_status"].cancel()
+    await master.get_session().close()
+    master.session = None
+
+
+async def _close_home(app: web.Application) -> None:
+    app["master"].home.close()
+
+
+def init(home_dir, config: Optional[Any] = None) -> web.Application:
+    app = web.Application()
+    app["master"] = Master(home_dir, config=config)
+    app.on_startup.append(_start_pushing_files)
+    app.on_cleanup.append(_stop_pushing_files)
+    app.on_cleanup.append(_close_home)
+    app.add_routes([web.get("/home_status", home_status)])
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="distributed push master server"
+    )
+    parser.add_argument("--home")
+    parser.add_argument("--path")
+    parser.add_argument("--port")
+    args = parser.parse_args()
+
+    home_dir = args.home or os.getcwd()
+    app = init(home_dir)
+
+    web.run_app(app, path=args.path, port=args.port)
@@ -0,0 +1,123 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import psutil
+from aiohttp import web
+
+from distributed import config
+from distributed.home import Home
+import distributed.simple.worker as simple_worker
+
+
+class _Status:
+    """Total and busy jobs of worker server"""
+
+    def __init__(self, total: int) -> None:
+        self.total = total
+        self.busy = 0
+
+    @property
+    def idle(self) -> int:
+        return max(self.total - self.busy, 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total": self.total,
+            "idle": self.idle,
+            # since the previous call, i.e. the previous status request
+            "cpu_percent": psutil.cpu_percent(interval=None),
+        }
+
+
+async def _run_job(
+    request: web.Request,
+    handler: Callable[[web.Request], Awaitable[web.Response]],
+) -> web.Response:
+    """Run a job of simple worker if any idle job, otherwise 503"""
+    status = request.app["status"]
+    if not status.idle:
+        raise web.HTTPServiceUnavailable(text="no idle job")
+    status.busy += 1
+    try:
+        return await handler(request)
+    finally:
+        status.busy -= 1
+
+
+async def new_file(request: web.Request) -> web.Response:
+    """Starting calculating file hash
+
+    Same as `new_file` of simple worker, see it for request and responses.
+
+    responses:
+
+    * 503 Service Unavailable: no idle job, master should push file to
+                               another worker
+    """
+    return await _run_job(request, simple_worker.new_file)
+
+
+async def hash_file(request: web.Request) -> web.Response:
+    """Calculating hash of file in home directory shared with master
+
+    Same as `hash_file` of simple worker, see it for request and responses.
+
+    responses:
+
+    * 503 Service Unavailable: no idle job, master should push file to
+                               another worker
+    """
+    return await _run_job(request, simple_worker.hash_file)
+
+
+async def status(request: web.Request) -> web.Response:
+    """Reporting total and idle jobs for master to push files
+
+    responses:
+
+    * 200 OK: json of total jobs, idle jobs and cpu percent of host
+    """
+    return web.json_response(request.app["status"].to_dict())
+
+
+async def _shutdown_hash_executor(app: web.Application) -> None:
+    app["hash_executor"].shutdown()
+
+
+def init(
+    home_dir: Optional[str] = None, jobs_number: Optional[int] = None
+) -> web.Application:
+    total = jobs_number or config.PUSH_WORKER_JOBS or psutil.cpu_count()
+    app = web.Application()
+    app["status"] = _Status(total)
+    # hashlib releases the GIL, so jobs are hashed in threads in parallel
+    app["hash_executor"] = ThreadPoolExecutor(total)
+    app.on_cleanup.append(_shutdown_hash_executor)
+    app.add_routes(
+        [web.post("/new_file", new_file), web.get("/status", status)]
+    )
+    if home_dir is not None:
+        app["home"] = Home(home_dir)
+        app.add_routes([web.post("/hash_file", hash_file)])
+    return app
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="distributed push worker server"
+    )
+    parser.add_argument("--path")
+    parser.add_argument("--port", type=int)
+    parser.add_argument(
+        "--shared-home",
+        help="home directory shared with master, hash files in place",
+    )
+    parser.add_argument(
+        "--jobs", type=int, help="max number of jobs at the same time"
+    )
+    args = parser.parse_args()
+
+    app = init(args.shared_home, args.jobs)
+    web.run_app(app, path=args.path, port=args.port)
@@ -0,0 +1,112 @@
+import asyncio
+import operator
+from array import array
+from typing import List, Mapping
+
+
+class FileSizeQueue(asyncio.Queue):
+    """Queue of file paths getting largest files first
+
+    Smallest files can be got from the other end by `get_smallest_nowait`.
+    """
+
+    def __init__(self, file_sizes: Mapping[str, int], maxsize: int = 0):
+        self._file_sizes = file_sizes
+        super().__init__(maxsize)
+
+    def _init(self, maxsize: int) -> None:
+        # min-max heap of file paths with their sizes in a parallel array,
+        # about 16 bytes per queued file. Sizes on even levels are the
+        # smallest of their subtrees, and those on odd levels the largest
+        self._queue: List[str] = []
+        self._sizes = array("q")
+
+    def _swap(self, i: int, j: int) -> None:
+        sizes, paths = self._sizes, self._queue
+        sizes[i], sizes[j] = sizes[j], sizes[i]
+        paths[i], paths[j] = paths[j], paths[i]
+
+    def _precedes(self, i: int, j: int, is_min: bool) -> bool:
+        """Whether item `i` goes before item `j` on levels of a kind"""
+        sizes = self._sizes
+        return sizes[i] < sizes[j] if is_min else sizes[i] > sizes[j]
+
+    def _bubble_up(self, i: int, is_min: bool) -> None:
+        """Move an item up by its grandparents on levels of its kind"""
+        while i > 2:
+            grandparent = ((i - 1) // 2 - 1) // 2
+            if not self._precedes(i, grandparent, is_min):
+                break
+            self._swap(i, grandparent)
+            i = grandparent
+
+    def _put(self, item: str) -> None:
+        self._sizes.append(self._file_sizes.get(item, 0))
+        self._queue.append(item)
+        i = len(self._queue) - 1
+        if i == 0:
+            return
+        parent = (i - 1) // 2
+        # even levels are min levels
+        is_min = (i + 1).bit_length() % 2 == 1
+        if self._precedes(parent, i, is_min):
+            self._swap(i, parent)
+            self._bubble_up(parent, not is_min)
+        else:
+            self._bubble_up(i, is_min)
+
+    def _trickle_down(self, i: int, is_min: bool) -> None:
+        """Move an item down to its place among children and grandchildren"""
+        sizes = self._sizes
+        precedes = operator.lt if is_min else operator.gt
+        n = len(sizes)
+        while True:
+            child = 2 * i + 1
+            if child >= n:
+                break
+            # the first of children and grandchildren
+            m = child
+            if child + 1 < n and precedes(sizes[child + 1], sizes[m]):
+                m = child + 1
+            grandchild = 2 * child + 1
+            for j in range(grandchild, min(grandchild + 4, n)):
+                if precedes(sizes[j], sizes[m]):
+                    m = j
+            if not precedes(sizes[m], sizes[i]):
+                break
+            self._swap(m, i)
+            if m < grandchild:
+                break
+            parent = (m - 1) // 2
+            if precedes(sizes[parent], sizes[m]):
+                self._swap(m, parent)
+            i = m
+
+    def _pop(self, i: int, is_min: bool) -> str:
+        sizes, paths = self._sizes, self._queue
+        item = paths[i]
+        last_size = sizes.pop()
+        last_path = paths.pop()
+        if i < len(paths):
+            sizes[i] = last_size
+            paths[i] = last_path
+            self._trickle_down(i, is_min)
+        return item
+
+    def _get(self) -> str:
+        sizes = self._sizes
+        if len(sizes) == 1:
+            return self._pop(0, True)
+        i = 1 if len(sizes) == 2 or sizes[1] >= sizes[2] else 2
+        return self._pop(i, False)
+
+    def get_smallest_nowait(self) -> str:
+        """Remove and return the smallest file path if available
+
+        Raise QueueEmpty otherwise.
+        """
+        if self.empty():
+            raise asyncio.QueueEmpty
+        item = self._pop(0, True)
+        self._wakeup_next(self._putters)  # type: ignore
+        return item
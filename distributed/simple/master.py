@@ -1,53 +1,155 @@
 import asyncio
-from typing import Any, Awaitable, Callable, List, Optional
+import os
+from typing import Any, Dict, List, Optional, Set, cast
 
 import aiohttp
 
 from distributed import config as default_config
+from distributed import constants
+from distributed.compression import CompressionPolicy
 from distributed.home import Home
+from distributed.index import HashIndex
 
 
 class _Worker:
-    def __init__(self, host: str, port: int, master: "Master") -> None:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        master: "BaseMaster",
+        concurrency: int = 1,
+    ) -> None:
         self.host = host
         self.port = port
         self.master = master
+        # max number of jobs sent to worker at the same time
+        self.concurrency = concurrency
         self.job_endpoint = f"http://{host}:{port}/new_file"
+        self.shared_job_endpoint = f"http://{host}:{port}/hash_file"
+
+    def _get_job_headers(self) -> Dict[str, str]:
+        return {
+            constants.HTTP_HEADER_X_HASH_ALGORITHMS: ",".join(
+                self.master.home.algorithms
+            )
+        }
+
+    async def _process_shared_job(
+        self, file_path: str
+    ) -> Optional[Dict[str, str]]:
+        """Let worker hash file in place in shared home directory
+
+        `None` is returned if worker can not find the file or the file does
+        not match, and other error responses are raised.
+        """
+        session = self.master.get_session()
+        full_path = self.master.home.get_full_path(file_path)
+        file_stat = os.stat(full_path)
+        payload = {
+            "file_path": file_path,
+            "file_size": str(file_stat.st_size),
+            "file_mtime_ns": str(file_stat.st_mtime_ns),
+        }
+        async with session.post(
+            self.shared_job_endpoint,
+            data=payload,
+            headers=self._get_job_headers(),
+        ) as resp:
+            if resp.status in (404, 409):
+                print(
+                    f"{self.shared_job_endpoint} can not hash"
+                    f" file(path={file_path}) in place: {resp.status}."
+                    " upload it."
+                )
+                return None
+            # e.g. 503 of push worker without idle job
+            resp.raise_for_status()
+            return await resp.json()
+
+    async def _process_job(self, file_path: str) -> Dict[str, str]:
+        """Return hex digests of hash algorithms of home"""
+        if self.master.config.SHARED_STORAGE:
+            result = await self._process_shared_job(file_path)
+            if result is not None:
+                return result
+
+        session = self.master.get_session()
+        full_path = self.master.home.get_full_path(file_path)
+        # stream file as raw request body instead of multipart form data
+        headers = self._get_job_headers()
+        headers["Content-Type"] = "application/octet-stream"
+        with open(full_path, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            # decompressed by worker server before hashing
+            compress = (
+                "deflate"
+                if self.master.compression.should_compress(
+                    file_path, file_size
+                )
+                else None
+            )
+            async with session.post(
+                self.job_endpoint, data=f, headers=headers, compress=compress
+            ) as resp:
+                resp.raise_for_status()
+                return await resp.json()
+
+    def _job_failed(
+        self, file_path: str, ex: aiohttp.ClientResponseError
+    ) -> bool:
+        """Handle error response of a job, return `False` to drop worker
+
+        The file is marked as failed by default, since worker can not hash
+        it.
+        """
+        print(ex)
+        print(f"{self.job_endpoint} can not hash file(path={file_path}).")
+        self.master.home.set_file_failed(file_path)
+        return True
+
+    async def process_file(self, file_path: str) -> bool:
+        """Process a file, return `False` if worker is unreachable
+
+        Files which can not be read or hashed are marked as failed.
+        """
+        try:
+            hashes = await self._process_job(file_path)
+        except aiohttp.ClientConnectionError as ex:
+            print(ex)
+            print(f"{self.job_endpoint} is unreachable.")
+            # put file_path back to queue
+            self.master.files_queue.put_nowait(file_path)
+            return False
+        except aiohttp.ClientResponseError as ex:
+            return self._job_failed(file_path, ex)
+        except OSError as ex:
+            print(ex)
+            print(f"file(path={file_path}) can not be read.")
+            self.master.home.set_file_failed(file_path)
+            return True
+        else:
+            self.master.home.set_file_hash(
+                file_path, hashes[self.master.home.algorithms[0]], hashes
+            )
+            return True
 
-    async def _process_job(self, file_path: str) -> str:
-        async with aiohttp.ClientSession() as session:
-            full_path = self.master.home.get_full_path(file_path)
-            files = {"file": open(full_path, "rb")}
-            async with session.post(self.job_endpoint, data=files) as resp:
-                # TODO should be 200 OK
-                # print(resp.status)
-                return await resp.text()
-
-    async def start_task(self) -> None:
-        while not self.master.files_queue.empty():
-            file_path = await self.master.files_queue.get()
-            # if bad worker, put file_path back to queue
-            try:
-                result = await self._process_job(file_path)
-            except aiohttp.ClientConnectionError as ex:
-                print(ex)
-                print(f"{self.job_endpoint} is unreachable.")
-                self.master.files_queue.task_done()
-                # put file_path back to queue
-                await self.master.files_queue.put(file_path)
-                # remove worker
-                # self.master.workers.remove(self)
-                # exit worker task
-                break
-            else:
-                self.master.home.set_file_hash(file_path, result)
-                self.master.files_queue.task_done()
 
+class BaseMaster:
+    """Home files and session shared by masters pushing files to workers"""
 
-class Master:
     def __init__(self, home_dir: str, config: Optional[Any] = None) -> None:
-        self.home = Home(home_dir)
         self.config = config if config is not None else default_config
+        index = None
+        if self.config.HOME_INDEX_PATH is not None:
+            index = HashIndex(self.config.HOME_INDEX_PATH)
+        self.home = Home(
+            home_dir,
+            index=index,
+            compact=self.config.HOME_COMPACT_FILES,
+            algorithms=self.config.HASH_ALGORITHMS,
+            dedup=self.config.HOME_DEDUP_INODES,
+            duplicates_only=self.config.HOME_DUPLICATES_ONLY,
+        )
 
         print("loading home files...")
         self.home.load_files()
@@ -55,35 +157,101 @@ class Master:
 
         print("preparing home files queue...")
         self.files_queue: asyncio.Queue[str] = asyncio.Queue()
-        for file_path in self.home.files:
+        for file_path in self.home.iter_unfinished_files():
             self.files_queue.put_nowait(file_path)
         print("home files queue prepared.")
 
+        # whether to compress uploaded files
+        self.compression = CompressionPolicy(self.config)
+
+        # one keep-alive session for all jobs
+        self.session: Optional[aiohttp.ClientSession] = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        # session should be created before this
+        return cast(aiohttp.ClientSession, self.session)
+
+
+class Master(BaseMaster):
+    def __init__(self, home_dir: str, config: Optional[Any] = None) -> None:
+        super().__init__(home_dir, config=config)
+
         print("creating workers...")
         self.workers: List[_Worker] = []
-        for host, port in self.config.WORKERS:
-            worker = _Worker(host, port, self)
+        # one slot per job which can be sent to a worker at the same time,
+        # `None` tells dispatcher that all workers are unreachable
+        self.worker_slots: asyncio.Queue[Optional[_Worker]] = asyncio.Queue()
+        for host, port, *options in self.config.WORKERS:
+            # optional max number of concurrent jobs of worker
+            concurrency = options[0] if options else 1
+            worker = _Worker(host, port, self, concurrency)
             self.workers.append(worker)
+            for _ in range(concurrency):
+                self.worker_slots.put_nowait(worker)
+        self._alive_worker_slots = self.worker_slots.qsize()
         print("workers created.")
 
-        self._worker_tasks: List[asyncio.Task] = []
+    async def _run_job(self, worker: _Worker, file_path: str) -> None:
+        reachable = True
+        try:
+            reachable = await worker.process_file(file_path)
+        except Exception:
+            # unexpected error, keep dispatching other files
+            self.home.set_file_failed(file_path)
+            raise
+        finally:
+            if reachable:
+                # release worker slot
+                self.worker_slots.put_nowait(worker)
+            else:
+                # drop worker slot of unreachable worker
+                self._alive_worker_slots -= 1
+                if not self._alive_worker_slots:
+                    self.worker_slots.put_nowait(None)
+            self.files_queue.task_done()
+
+    async def dispatch(self) -> None:
+        """Send files to workers while any worker slot available
 
-    async def _start_worker_tasks(self) -> None:
-        print("preparing worker tasks...")
-        for worker in self.workers:
-            task = asyncio.create_task(worker.start_task())
-            self._worker_tasks.append(task)
-        print("worker tasks prepared.")
+        Every worker gets up to its concurrency number of files at the same
+        time, and files of failed jobs are put back to files queue.
+        """
+        jobs: Set[asyncio.Future] = set()
+        while self._alive_worker_slots:
+            if self.files_queue.empty():
+                if not jobs:
+                    break
+                # files of failed jobs are put back to files queue
+                _, jobs = await asyncio.wait(
+                    jobs, return_when=asyncio.FIRST_COMPLETED
+                )
+                continue
+            worker = await self.worker_slots.get()
+            if worker is None:
+                # all workers are unreachable
+                break
+            file_path = self.files_queue.get_nowait()
+            jobs.add(asyncio.ensure_future(self._run_job(worker, file_path)))
+        if jobs:
+            await asyncio.wait(jobs)
 
     async def run(self) -> None:
-        await self._start_worker_tasks()
-        await asyncio.gather(*self._worker_tasks)
+        async with aiohttp.ClientSession() as session:
+            self.session = session
+            try:
+                print("dispatching files to workers...")
+                await self.dispatch()
+                print("files dispatched.")
+            finally:
+                self.session = None
 
         for path, hash_ in self.home.files.items():
             print(f"{path} -> {hash_}")
 
         print(f"state: {self.home.state}")
 
+        self.home.close()
+
 
 if __name__ == "__main__":
     import argparse
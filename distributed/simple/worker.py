@@ -1,37 +1,286 @@
-import hashlib
+import asyncio
+import multiprocessing
+import os
+import os.path
+import socket
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
 
 from aiohttp import web
 
+from distributed import config
+from distributed import constants
+from distributed.hashing import (
+    MultiHash,
+    calc_file_hashes,
+    parse_hash_algorithms,
+)
+from distributed.home import Home
 
-async def new_file(request: web.Request) -> web.Response:
-    """Starting calculating file hash"""
-    reader = await request.multipart()
-    field = await reader.next()
-    assert field.name == "file"
-    h = hashlib.new("sha1")
+
+async def _hash_chunks(
+    queue: "asyncio.Queue[bytes]",
+    executor: ThreadPoolExecutor,
+    algorithms: Sequence[str],
+) -> Dict[str, str]:
+    """Hash chunks from queue in executor until an empty chunk"""
+    loop = asyncio.get_running_loop()
+    h = MultiHash(algorithms)
     while True:
-        chunk = await field.read_chunk()
+        chunk = await queue.get()
         if not chunk:
             break
-        h.update(chunk)
-    result = h.hexdigest()
-    return web.Response(text=result)
+        # hashlib releases the GIL while hashing large buffers
+        await loop.run_in_executor(executor, h.update, chunk)
+    return h.hexdigests()
+
+
+async def _hash_stream(
+    read_chunk: Callable[[int], Awaitable[bytes]],
+    executor: ThreadPoolExecutor,
+    algorithms: Sequence[str],
+) -> Dict[str, str]:
+    """Hash a stream in threads while reading the next chunks"""
+    queue: "asyncio.Queue[bytes]" = asyncio.Queue(
+        config.SIMPLE_WORKER_HASH_QUEUE_SIZE
+    )
+    hashing = asyncio.ensure_future(
+        _hash_chunks(queue, executor, algorithms)
+    )
+    try:
+        buffer = bytearray()
+        while True:
+            chunk = await read_chunk(config.CHUNK_SIZE)
+            if chunk:
+                buffer.extend(chunk)
+                if len(buffer) < config.CHUNK_SIZE:
+                    continue
+            if buffer:
+                await queue.put(bytes(buffer))
+                buffer.clear()
+            if not chunk:
+                break
+        await queue.put(b"")
+        return await hashing
+    finally:
+        hashing.cancel()
+
+
+def _get_hash_algorithms(request: web.Request) -> List[str]:
+    try:
+        return parse_hash_algorithms(
+            request.headers.get(constants.HTTP_HEADER_X_HASH_ALGORITHMS)
+        )
+    except ValueError:
+        raise web.HTTPBadRequest(text="unsupported hash algorithm")
+
+
+def _hashes_response(
+    request: web.Request, hashes: Dict[str, str]
+) -> web.Response:
+    if constants.HTTP_HEADER_X_HASH_ALGORITHMS in request.headers:
+        return web.json_response(hashes)
+    # sha1 hex digest as text for masters not requesting hash algorithms
+    return web.Response(text=hashes["sha1"])
+
+
+async def new_file(request: web.Request) -> web.Response:
+    """Starting calculating file hash
+
+    File is uploaded as raw request body with content type
+    `application/octet-stream`, or as field `file` of multipart form data.
+
+    Uploaded chunks are hashed in threads while reading the next chunks, so
+    that hashing does not block other uploads on the event loop.
+
+    request headers:
+
+    * X-DISTRIBUTED-HASH-ALGORITHMS: comma separated hash algorithms. optional
+
+    responses:
+
+    * 200 OK: sha1 hex digest of file, or json of hex digests of hash
+              algorithms if requested
+    * 400 Bad Request: unsupported hash algorithm
+    """
+    algorithms = _get_hash_algorithms(request)
+    read_chunk: Callable[[int], Awaitable[bytes]]
+    if request.content_type == "application/octet-stream":
+        read_chunk = request.content.read
+    else:
+        reader = await request.multipart()
+        field = await reader.next()
+        assert field.name == "file"
+        read_chunk = field.read_chunk
+    hashes = await _hash_stream(
+        read_chunk, request.app["hash_executor"], algorithms
+    )
+    return _hashes_response(request, hashes)
+
+
+async def hash_file(request: web.Request) -> web.Response:
+    """Calculating hash of file in home directory shared with master
+
+    request form parameters:
 
+    * file_path: file path relative to home directory. required
+    * file_size: expected file size. required
+    * file_mtime_ns: expected file mtime in nanoseconds. required
 
-def init() -> web.Application:
+    request headers:
+
+    * X-DISTRIBUTED-HASH-ALGORITHMS: comma separated hash algorithms. optional
+
+    responses:
+
+    * 200 OK: sha1 hex digest of file, or json of hex digests of hash
+              algorithms if requested
+    * 400 Bad Request: missing or invalid parameters
+    * 400 Bad Request: unsupported hash algorithm
+    * 404 Not Found: file not found
+    * 409 Conflict: file does not match expected size and mtime
+    """
+    home = request.app["home"]
+    algorithms = _get_hash_algorithms(request)
+
+    form = await request.post()
+    file_path = form.get("file_path")
+    if not file_path or not isinstance(file_path, str):
+        raise web.HTTPBadRequest(text="missing file_path parameter")
+    file_size_value = form.get("file_size")
+    file_mtime_ns_value = form.get("file_mtime_ns")
+    # uploaded files are not valid values
+    if not isinstance(file_size_value, str) or not isinstance(
+        file_mtime_ns_value, str
+    ):
+        raise web.HTTPBadRequest(text="invalid file_size or file_mtime_ns")
+    try:
+        file_size = int(file_size_value)
+        file_mtime_ns = int(file_mtime_ns_value)
+    except ValueError:
+        raise web.HTTPBadRequest(text="invalid file_size or file_mtime_ns")
+
+    full_path = home.get_full_path(file_path)
+    if not os.path.abspath(full_path).startswith(
+        os.path.join(os.path.abspath(home.home_dir), "")
+    ):
+        raise web.HTTPBadRequest(text="invalid file_path parameter")
+    try:
+        file_stat = os.stat(full_path)
+    except OSError:
+        raise web.HTTPNotFound(text="file not found")
+    if (
+        file_stat.st_size != file_size
+        or file_stat.st_mtime_ns != file_mtime_ns
+    ):
+        raise web.HTTPConflict(text="file does not match")
+
+    loop = asyncio.get_running_loop()
+    hashes = await loop.run_in_executor(
+        request.app["hash_executor"],
+        calc_file_hashes,
+        full_path,
+        config.CHUNK_SIZE,
+        algorithms,
+    )
+    return _hashes_response(request, hashes)
+
+
+async def _shutdown_hash_executor(app: web.Application) -> None:
+    app["hash_executor"].shutdown()
+
+
+def init(home_dir: Optional[str] = None) -> web.Application:
     app = web.Application()
+    app["hash_executor"] = ThreadPoolExecutor(
+        config.SIMPLE_WORKER_HASH_THREADS or os.cpu_count()
+    )
+    app.on_cleanup.append(_shutdown_hash_executor)
     app.add_routes([web.post("/new_file", new_file)])
+    if home_dir is not None:
+        app["home"] = Home(home_dir)
+        app.add_routes([web.post("/hash_file", hash_file)])
     return app
 
 
+def _bind_sockets(
+    path: Optional[str] = None, port: Optional[int] = None
+) -> List[socket.socket]:
+    """Bind listening sockets like `web.run_app` does with path and port"""
+    socks = []
+    if path is not None:
+        try:
+            if stat.S_ISSOCK(os.stat(path).st_mode):
+                # stale socket file
+                os.unlink(path)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        socks.append(sock)
+    if port is not None or path is None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(("0.0.0.0", port if port is not None else 8080))
+        socks.append(sock)
+    for sock in socks:
+        sock.listen(128)
+    return socks
+
+
+def _run_app(socks: List[socket.socket], home_dir: Optional[str]) -> None:
+    web.run_app(init(home_dir), sock=socks)
+
+
+def run(
+    path: Optional[str] = None,
+    port: Optional[int] = None,
+    home_dir: Optional[str] = None,
+    processes_number: int = 1,
+) -> None:
+    """Run worker server in processes sharing the same listening sockets
+
+    Listening sockets are bound before forking (pre-fork), and connections
+    are accepted by all processes, so one worker server uses all cores.
+    """
+    if processes_number <= 1:
+        web.run_app(init(home_dir), path=path, port=port)
+        return
+
+    socks = _bind_sockets(path, port)
+    processes = []
+    for _ in range(processes_number):
+        process = multiprocessing.Process(
+            target=_run_app, args=(socks, home_dir)
+        )
+        process.start()
+        processes.append(process)
+
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            process.terminate()
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="distributed worker server")
     parser.add_argument("--path")
-    parser.add_argument("--port")
+    parser.add_argument("--port", type=int)
+    parser.add_argument(
+        "--shared-home",
+        help="home directory shared with master, hash files in place",
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=1,
+        help="server processes sharing the same listening sockets",
+    )
     args = parser.parse_args()
 
-    app = init()
-
-    web.run_app(app, path=args.path, port=args.port)
+    run(args.path, args.port, args.shared_home, args.processes)
@@ -0,0 +1,134 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import os.path
+import socket
+import tempfile
+import time
+import unittest
+import urllib.request
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import unused_port
+
+import distributed.pull.master as pull_master
+from distributed.pull.worker import NoMoreFiles, WaitForTimeoutFile, Worker
+
+from ...util import create_fake_config
+
+FILES_NUMBER = 500
+FILE_SIZE = 4 * 1024
+
+
+def start_master_server(home_dir, port, config):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    app = pull_master.init(home_dir, config=config)
+    web.run_app(app, port=port, print=None)
+
+
+def wait_for_server(port, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+class PerFileSessionWorker(Worker):
+    """Worker with a new session and a new event loop per file, as before"""
+
+    def run(self):
+        async def worker_register():
+            async with aiohttp.ClientSession() as session:
+                self.session = session
+                await self.worker_register()
+
+        async def work():
+            async with aiohttp.ClientSession() as session:
+                self.session = session
+                await self.work()
+
+        asyncio.run(worker_register())
+        while True:
+            try:
+                asyncio.run(work())
+            except WaitForTimeoutFile:
+                pass
+            except NoMoreFiles:
+                break
+
+
+class WorkerSessionBenchmark(unittest.TestCase):
+    """Files per second of a worker process on a small files tree"""
+
+    def setUp(self):
+        self._home_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._home_dir.cleanup)
+        self.home_dir = self._home_dir.name
+        for i in range(FILES_NUMBER):
+            dir_path = os.path.join(self.home_dir, f"dir{i % 10}")
+            os.makedirs(dir_path, exist_ok=True)
+            with open(os.path.join(dir_path, f"file{i}"), "wb") as f:
+                f.write(os.urandom(FILE_SIZE))
+
+    def _run_worker(self, worker_class, **kwargs):
+        port = unused_port()
+        fake_config = create_fake_config(MASTER=("127.0.0.1", port))
+        process = multiprocessing.Process(
+            target=start_master_server,
+            args=(self.home_dir, port, fake_config),
+        )
+        process.start()
+        try:
+            wait_for_server(port)
+            worker = worker_class("worker-1", config=fake_config, **kwargs)
+            start_at = time.time()
+            worker.run()
+            seconds = time.time() - start_at
+
+            url = f"http://127.0.0.1:{port}/home_status"
+            with urllib.request.urlopen(url) as resp:
+                state = json.load(resp)["state"]
+            self.assertEqual(state["finished"], FILES_NUMBER)
+        finally:
+            process.terminate()
+            process.join()
+        return FILES_NUMBER / seconds
+
+    def test_files_per_second(self):
+        before = self._run_worker(PerFileSessionWorker)
+        after = self._run_worker(Worker)
+        print(
+            f"\nfiles/s of {FILES_NUMBER} files of {FILE_SIZE} bytes:"
+            f" {before:.1f} with a session and an event loop per file,"
+            f" {after:.1f} with one session and event loop"
+        )
+
+    def test_files_per_second_with_pipeline(self):
+        sequential = self._run_worker(Worker)
+        pipelined = self._run_worker(Worker, pipeline_depth=4)
+        print(
+            f"\nfiles/s of {FILES_NUMBER} files of {FILE_SIZE} bytes:"
+            f" {sequential:.1f} with one file in flight,"
+            f" {pipelined:.1f} with 4 files in flight"
+        )
+
+    def test_files_per_second_with_bundle(self):
+        batch = self._run_worker(Worker, batch=True)
+        bundle = self._run_worker(Worker, bundle=True)
+        print(
+            f"\nfiles/s of {FILES_NUMBER} files of {FILE_SIZE} bytes:"
+            f" {batch:.1f} fetching leased files one by one,"
+            f" {bundle:.1f} getting them in bundles"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import time
+import unittest
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import unused_port
+
+import distributed.simple.worker as simple_worker
+
+from ..pull.test_worker import wait_for_server
+
+FILES_NUMBER = 8
+FILE_SIZE = 32 * 1024 * 1024
+
+
+def start_worker_server(port):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    web.run_app(simple_worker.init(), port=port, print=None)
+
+
+class UploadBenchmark(unittest.TestCase):
+    """MB/s of uploading files to a worker server as multipart or raw body"""
+
+    def setUp(self):
+        self._home_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._home_dir.cleanup)
+        self.file_paths = []
+        for i in range(FILES_NUMBER):
+            file_path = os.path.join(self._home_dir.name, f"file{i}")
+            with open(file_path, "wb") as f:
+                f.write(os.urandom(FILE_SIZE))
+            self.file_paths.append(file_path)
+
+        port = unused_port()
+        self.url = f"http://127.0.0.1:{port}/new_file"
+        process = multiprocessing.Process(
+            target=start_worker_server, args=(port,)
+        )
+        process.start()
+        self.addCleanup(process.join)
+        self.addCleanup(process.terminate)
+        wait_for_server(port)
+
+    async def _post_multipart(self, session, file_path):
+        with open(file_path, "rb") as f:
+            async with session.post(self.url, data={"file": f}) as resp:
+                self.assertEqual(resp.status, 200)
+
+    async def _post_raw(self, session, file_path):
+        headers = {"Content-Type": "application/octet-stream"}
+        with open(file_path, "rb") as f:
+            async with session.post(
+                self.url, data=f, headers=headers
+            ) as resp:
+                self.assertEqual(resp.status, 200)
+
+    def _upload(self, post):
+        async def upload():
+            async with aiohttp.ClientSession() as session:
+                for file_path in self.file_paths:
+                    await post(session, file_path)
+
+        start_at = time.time()
+        asyncio.run(upload())
+        seconds = time.time() - start_at
+        return FILES_NUMBER * FILE_SIZE / seconds / 1024 / 1024
+
+    def test_megabytes_per_second(self):
+        multipart = self._upload(self._post_multipart)
+        raw = self._upload(self._post_raw)
+        print(
+            f"\nMB/s of {FILES_NUMBER} files of {FILE_SIZE} bytes:"
+            f" {multipart:.1f} as multipart form data,"
+            f" {raw:.1f} as raw body"
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,227 @@
+"""End-to-end benchmarks of recipes on synthetic home trees
+
+Every recipe hashes every tree with local worker processes, and files/s,
+MB/s, time to the first result and tail time (from 90% of files finished
+to the last one) are reported. Results are saved as json to the path of
+environment variable `DISTRIBUTED_BENCHMARK_RESULTS` (a file in the
+temporary directory by default). With environment variable
+`DISTRIBUTED_BENCHMARK_BASELINE` of results saved before, a benchmark fails
+if its files/s drops more than `REGRESSION_TOLERANCE` from the baseline.
+"""
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import os.path
+import tempfile
+import time
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import unused_port
+
+import distributed.local.master as local_master
+import distributed.pull.master as pull_master
+from distributed.pull.worker import Worker
+import distributed.simple.master as simple_master
+import distributed.simple.worker as simple_worker
+
+from .pull.test_worker import wait_for_server
+from ..util import create_fake_config
+
+KB = 1024
+MB = 1024 * 1024
+
+# tree name -> [(files number, file size)]
+TREES = {
+    "tiny": [(2000, 4 * KB)],
+    "huge": [(4, 32 * MB)],
+    "mixed": [(1000, 4 * KB), (100, 256 * KB), (2, 16 * MB)],
+}
+WORKER_PROCESSES = 2
+REGRESSION_TOLERANCE = 0.2
+
+RESULTS_PATH = os.environ.get(
+    "DISTRIBUTED_BENCHMARK_RESULTS",
+    os.path.join(tempfile.gettempdir(), "distributed_benchmarks.json"),
+)
+BASELINE_PATH = os.environ.get("DISTRIBUTED_BENCHMARK_BASELINE")
+
+
+def generate_tree(home_dir, tree):
+    for group, (files_number, file_size) in enumerate(tree):
+        for i in range(files_number):
+            dir_path = os.path.join(home_dir, f"group{group}", f"dir{i % 10}")
+            os.makedirs(dir_path, exist_ok=True)
+            with open(os.path.join(dir_path, f"file{i}"), "wb") as f:
+                f.write(os.urandom(file_size))
+
+
+def record_results(home):
+    """Record time of every file hash set in home"""
+    finished_at = []
+    set_file_hash = home.set_file_hash
+
+    def _set_file_hash(*args, **kwargs):
+        finished_at.append(time.perf_counter())
+        return set_file_hash(*args, **kwargs)
+
+    home.set_file_hash = _set_file_hash
+    return finished_at
+
+
+def summarize(started_at, finished_at, state):
+    seconds = finished_at[-1] - started_at
+    tail_start = finished_at[max(math.ceil(len(finished_at) * 0.9) - 1, 0)]
+    return {
+        "files": state["total"],
+        "bytes": state["bytes_total"],
+        "seconds": seconds,
+        "files_per_second": state["total"] / seconds,
+        "mb_per_second": state["bytes_total"] / MB / seconds,
+        "first_result_seconds": finished_at[0] - started_at,
+        "tail_seconds": finished_at[-1] - tail_start,
+    }
+
+
+def start_simple_worker_server(port):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    web.run_app(simple_worker.init(), port=port, print=None)
+
+
+class RecipesBenchmark(unittest.TestCase):
+    """Throughput and latency of recipes on synthetic home trees"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp_dir = tempfile.TemporaryDirectory()
+        cls.home_dirs = {}
+        for name, tree in TREES.items():
+            home_dir = os.path.join(cls._tmp_dir.name, name)
+            generate_tree(home_dir, tree)
+            cls.home_dirs[name] = home_dir
+
+        cls.baseline = {}
+        if BASELINE_PATH is not None:
+            with open(BASELINE_PATH) as f:
+                cls.baseline = json.load(f)
+        cls.results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp_dir.cleanup()
+        with open(RESULTS_PATH, "w") as f:
+            json.dump(cls.results, f, indent=2, sort_keys=True)
+
+        print(f"\nbenchmark results saved to {RESULTS_PATH}")
+        for key, result in sorted(cls.results.items()):
+            print(
+                f"{key}: {result['files_per_second']:.1f} files/s,"
+                f" {result['mb_per_second']:.1f} MB/s,"
+                f" first result {result['first_result_seconds']:.3f}s,"
+                f" tail {result['tail_seconds']:.3f}s"
+            )
+
+    def _add_result(self, key, result):
+        self.assertEqual(result["files"], self._files_number(key))
+        self.results[key] = result
+        baseline = self.baseline.get(key)
+        if baseline is not None:
+            self.assertGreaterEqual(
+                result["files_per_second"],
+                baseline["files_per_second"] * (1 - REGRESSION_TOLERANCE),
+                f"{key} regressed",
+            )
+
+    def _files_number(self, key):
+        _, name = key.split("/")
+        return sum(files_number for files_number, _ in TREES[name])
+
+    def test_simple(self):
+        ports = [unused_port() for _ in range(WORKER_PROCESSES)]
+        for port in ports:
+            process = multiprocessing.Process(
+                target=start_simple_worker_server, args=(port,)
+            )
+            process.start()
+            self.addCleanup(process.join)
+            self.addCleanup(process.terminate)
+        for port in ports:
+            wait_for_server(port)
+
+        # several jobs in flight per worker server, hashed in threads
+        fake_config = create_fake_config(
+            WORKERS=[("127.0.0.1", port, 4) for port in ports]
+        )
+        for name, home_dir in self.home_dirs.items():
+            with self.subTest(tree=name):
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+                started_at = time.perf_counter()
+                master = simple_master.Master(home_dir, config=fake_config)
+                finished_at = record_results(master.home)
+                loop.run_until_complete(master.run())
+                loop.close()
+                self._add_result(
+                    f"simple/{name}",
+                    summarize(started_at, finished_at, master.home.state),
+                )
+
+    async def _run_pull(self, home_dir, **worker_kwargs):
+        port = unused_port()
+        fake_config = create_fake_config(MASTER=("127.0.0.1", port))
+        started_at = time.perf_counter()
+        app = pull_master.init(home_dir, config=fake_config)
+        master = app["master"]
+        finished_at = record_results(master.home)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, "127.0.0.1", port).start()
+            workers = [
+                Worker(f"worker-{i}", config=fake_config, **worker_kwargs)
+                for i in range(WORKER_PROCESSES)
+            ]
+            for worker in workers:
+                worker.start()
+            loop = asyncio.get_running_loop()
+            for worker in workers:
+                await loop.run_in_executor(None, worker.join)
+            return summarize(started_at, finished_at, master.home.state)
+        finally:
+            await runner.cleanup()
+
+    def test_pull(self):
+        for name, home_dir in self.home_dirs.items():
+            with self.subTest(tree=name):
+                self._add_result(
+                    f"pull/{name}", asyncio.run(self._run_pull(home_dir))
+                )
+
+    def test_pull_with_bundle(self):
+        for name, home_dir in self.home_dirs.items():
+            with self.subTest(tree=name):
+                self._add_result(
+                    f"pull_bundle/{name}",
+                    asyncio.run(self._run_pull(home_dir, bundle=True)),
+                )
+
+    def test_local(self):
+        for name, home_dir in self.home_dirs.items():
+            with self.subTest(tree=name):
+                started_at = time.perf_counter()
+                master = local_master.Master(
+                    home_dir, processes_number=WORKER_PROCESSES
+                )
+                finished_at = record_results(master.home)
+                asyncio.run(master.run())
+                self._add_result(
+                    f"local/{name}",
+                    summarize(started_at, finished_at, master.home.state),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
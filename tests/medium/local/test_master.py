@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import os
+import os.path
+import random
+import tempfile
+import unittest
+
+from distributed.chunks import calc_tree_hash
+from distributed.local.master import Master
+
+from ...util import calc_file_hash, create_fake_config
+
+
+class MasterTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp_dir.cleanup)
+        self.home_dir = self._tmp_dir.name
+        dir_path = os.path.join(self.home_dir, "var/dir1")
+        os.makedirs(dir_path)
+        self.chunks = {}
+        for i in range(16):
+            file_path = os.path.join(dir_path, f"file{i}")
+            size = random.randint(0, 256 * 1024)
+            chunk = os.urandom(size)
+            self.chunks[f"var/dir1/file{i}"] = chunk
+            with open(file_path, "wb") as f:
+                f.write(chunk)
+
+    def test_run(self):
+        fake_config = create_fake_config(HASH_ALGORITHMS=["sha1", "sha256"])
+        master = Master(self.home_dir, config=fake_config, processes_number=2)
+        asyncio.run(master.run())
+
+        expected_files = {
+            path: calc_file_hash(chunk) for path, chunk in self.chunks.items()
+        }
+        self.assertEqual(dict(master.home.files), expected_files)
+        expected_hashes = {
+            path: hashlib.sha256(chunk).hexdigest()
+            for path, chunk in self.chunks.items()
+        }
+        self.assertEqual(master.home.hashes["sha256"], expected_hashes)
+        for worker in master._local_workers:
+            self.assertFalse(worker.process.is_alive())
+
+    def test_run_with_chunked_hashing(self):
+        fake_config = create_fake_config(
+            CHUNKED_HASHING_FILE_SIZE=64 * 1024,
+            CHUNKED_HASHING_CHUNK_SIZE=64 * 1024,
+        )
+        master = Master(self.home_dir, config=fake_config, processes_number=2)
+        asyncio.run(master.run())
+
+        expected_files = {}
+        expected_tree_hashes = {}
+        for path, chunk in self.chunks.items():
+            if len(chunk) < 64 * 1024:
+                expected_files[path] = calc_file_hash(chunk)
+                continue
+            chunk_hashes = [
+                calc_file_hash(chunk[offset : offset + 64 * 1024])
+                for offset in range(0, len(chunk), 64 * 1024)
+            ]
+            expected_files[path] = None
+            expected_tree_hashes[path] = calc_tree_hash(chunk_hashes)
+        self.assertEqual(dict(master.home.files), expected_files)
+        self.assertEqual(master.home.tree_hashes, expected_tree_hashes)
+        self.assertTrue(master.home.finished)
+
+    def test_run_while_worker_process_died(self):
+        master = Master(self.home_dir, processes_number=2)
+        start_workers = master.start_workers
+
+        def start_workers_and_kill_one():
+            start_workers()
+            process = master._local_workers[0].process
+            process.terminate()
+            process.join()
+
+        master.start_workers = start_workers_and_kill_one
+        asyncio.run(master.run())
+
+        expected_files = {
+            path: calc_file_hash(chunk) for path, chunk in self.chunks.items()
+        }
+        self.assertEqual(dict(master.home.files), expected_files)
+        self.assertFalse(master.worker_registered("local-0"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,12 +1,23 @@
+import asyncio
+import os
 import os.path
+import tempfile
 import unittest
+import unittest.mock
 
 from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
 
 from distributed import constants
+from distributed.bundles import hash_bundle
+from distributed.chunks import calc_tree_hash
 import distributed.pull.master as pull_master
+import distributed.pull.worker as pull_worker
 
-from ...util import gen_random_file_hash
+from ...util import (
+    calc_file_hash,
+    create_fake_config,
+    gen_random_file_hash,
+)
 
 
 class MasterHTTPTestCase(AioHTTPTestCase):
@@ -14,6 +25,9 @@ class MasterHTTPTestCase(AioHTTPTestCase):
         home_dir = os.path.dirname(__file__)
         return pull_master.init(home_dir)
 
+    async def wait_files_loaded(self):
+        await self.app["load_files"]
+
     @unittest_run_loop
     async def test_worker_register(self):
         headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
@@ -77,6 +91,22 @@ class MasterHTTPTestCase(AioHTTPTestCase):
             got_current_worker_names, expected_current_worker_names
         )
 
+    @unittest_run_loop
+    async def test_worker_heartbeat(self):
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_heartbeat", headers=headers)
+        self.assertEqual(resp.status, 400)
+
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+        resp = await self.client.post("/worker_heartbeat", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        # evicted worker should register again
+        self.app["master"].evict_worker("worker-1")
+        resp = await self.client.post("/worker_heartbeat", headers=headers)
+        self.assertEqual(resp.status, 400)
+
     @unittest_run_loop
     async def test_get_file(self):
         pass
@@ -85,8 +115,285 @@ class MasterHTTPTestCase(AioHTTPTestCase):
     async def test_update_file_hash(self):
         pass
 
+    @unittest_run_loop
+    async def test_update_file_hash_with_invalid_hash(self):
+        await self.wait_files_loaded()
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        master = self.app["master"]
+        file_path = next(iter(master.home.files))
+        for file_hash in ("zz", "0" * 38):
+            payload = {"file_path": file_path, "file_hash": file_hash}
+            resp = await self.client.put(
+                "/update_file_hash", data=payload, headers=headers
+            )
+            self.assertEqual(resp.status, 400)
+            resp = await self.client.put(
+                "/update_file_hash",
+                json={"files": {file_path: file_hash}},
+                headers=headers,
+            )
+            self.assertEqual(resp.status, 400)
+        self.assertIsNone(master.home.files[file_path])
+        self.assertEqual(master.home.state["finished"], 0)
+
+    @unittest_run_loop
+    async def test_lease_files(self):
+        await self.wait_files_loaded()
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        master = self.app["master"]
+        total = len(master.home.files)
+        params = {"max_files": 2}
+        resp = await self.client.get(
+            "/lease_files", headers=headers, params=params
+        )
+        self.assertEqual(resp.status, 200)
+        got_manifest = await resp.json()
+        self.assertEqual(len(got_manifest["files"]), min(total, 2))
+        for leased_file in got_manifest["files"]:
+            file_path = leased_file["file_path"]
+            self.assertTrue(master.is_processing_file("worker-1", file_path))
+            full_path = master.home.get_full_path(file_path)
+            file_stat = os.stat(full_path)
+            self.assertEqual(leased_file["file_size"], file_stat.st_size)
+            self.assertEqual(
+                leased_file["file_mtime_ns"], file_stat.st_mtime_ns
+            )
+
+        # lease all the rest files, at least one file for a tiny budget
+        params = {"max_files": total, "max_bytes": 1}
+        resp = await self.client.get(
+            "/lease_files", headers=headers, params=params
+        )
+        self.assertEqual(resp.status, 200)
+        got_manifest = await resp.json()
+        self.assertEqual(len(got_manifest["files"]), 1)
+
+    @unittest_run_loop
+    async def test_lease_files_with_invalid_parameter(self):
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        params = {"max_files": "zero"}
+        resp = await self.client.get(
+            "/lease_files", headers=headers, params=params
+        )
+        self.assertEqual(resp.status, 400)
+
+    @unittest_run_loop
+    async def test_fetch_file_and_update_file_hashes(self):
+        await self.wait_files_loaded()
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        master = self.app["master"]
+        params = {"max_files": len(master.home.files)}
+        resp = await self.client.get(
+            "/lease_files", headers=headers, params=params
+        )
+        got_manifest = await resp.json()
+
+        file_hashes = {}
+        for leased_file in got_manifest["files"]:
+            file_path = leased_file["file_path"]
+            _headers = {constants.HTTP_HEADER_X_FILE_PATH: file_path}
+            _headers.update(headers)
+            resp = await self.client.get("/fetch_file", headers=_headers)
+            self.assertEqual(resp.status, 200)
+            file_hashes[file_path] = calc_file_hash(await resp.read())
+
+        not_found_hashes = {"does/not/exist": gen_random_file_hash()}
+        payload = {"files": dict(file_hashes, **not_found_hashes)}
+        resp = await self.client.put(
+            "/update_file_hash", json=payload, headers=headers
+        )
+        self.assertEqual(resp.status, 200)
+        got_result = await resp.json()
+        self.assertDictEqual(got_result, {"not_found": ["does/not/exist"]})
+        self.assertDictEqual(master.home.files, file_hashes)
+        self.assertFalse(master.has_processing_files())
+
+        resp = await self.client.get("/lease_files", headers=headers)
+        self.assertEqual(resp.status, 204)
+
+    @unittest_run_loop
+    async def test_get_bundle_and_update_file_hashes(self):
+        await self.wait_files_loaded()
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        master = self.app["master"]
+        resp = await self.client.get("/get_bundle", headers=headers)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(
+            resp.headers[constants.HTTP_HEADER_X_HASH_ALGORITHMS], "sha1"
+        )
+        hashes = await hash_bundle(resp.content.readexactly, 1024, ["sha1"])
+        self.assertEqual(set(hashes), set(master.home.files))
+        file_path = os.path.basename(__file__)
+        self.assertEqual(
+            hashes[file_path]["sha1"],
+            calc_file_hash(open(__file__, "rb").read()),
+        )
+
+        payload = {
+            "files": {
+                file_path: file_hashes["sha1"]
+                for file_path, file_hashes in hashes.items()
+            }
+        }
+        resp = await self.client.put(
+            "/update_file_hash", json=payload, headers=headers
+        )
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(master.home.state["finished"], len(hashes))
+
+        resp = await self.client.get("/get_bundle", headers=headers)
+        self.assertEqual(resp.status, 204)
+
+    @unittest_run_loop
+    async def test_lease_files_with_long_polling(self):
+        await self.wait_files_loaded()
+        headers1 = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers1)
+        self.assertEqual(resp.status, 200)
+        headers2 = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-2"}
+        resp = await self.client.post("/worker_register", headers=headers2)
+        self.assertEqual(resp.status, 200)
+
+        master = self.app["master"]
+        params = {"max_files": len(master.home.files)}
+        resp = await self.client.get(
+            "/lease_files", headers=headers1, params=params
+        )
+        got_manifest = await resp.json()
+
+        # wait until deadline
+        params = {"wait": 0.1}
+        resp = await self.client.get(
+            "/lease_files", headers=headers2, params=params
+        )
+        self.assertEqual(resp.status, 202)
+
+        # wake up once all files processed
+        params = {"wait": 10}
+        waiting = asyncio.ensure_future(
+            self.client.get("/lease_files", headers=headers2, params=params)
+        )
+        await asyncio.sleep(0.1)
+        self.assertFalse(waiting.done())
+
+        file_hashes = {
+            leased_file["file_path"]: gen_random_file_hash()
+            for leased_file in got_manifest["files"]
+        }
+        resp = await self.client.put(
+            "/update_file_hash", json={"files": file_hashes}, headers=headers1
+        )
+        self.assertEqual(resp.status, 200)
+        resp = await asyncio.wait_for(waiting, 1)
+        self.assertEqual(resp.status, 204)
+
+    @unittest_run_loop
+    async def test_get_file_while_evicted_with_long_polling(self):
+        await self.wait_files_loaded()
+        headers1 = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers1)
+        self.assertEqual(resp.status, 200)
+        headers2 = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-2"}
+        resp = await self.client.post("/worker_register", headers=headers2)
+        self.assertEqual(resp.status, 200)
+
+        master = self.app["master"]
+        params = {"max_files": len(master.home.files)}
+        resp = await self.client.get(
+            "/lease_files", headers=headers1, params=params
+        )
+        self.assertEqual(resp.status, 200)
+
+        params = {"wait": 10}
+        waiting = asyncio.ensure_future(
+            self.client.get("/get_file", headers=headers2, params=params)
+        )
+        await asyncio.sleep(0.1)
+        self.assertFalse(waiting.done())
+
+        # files of worker-1 are requeued and wake up evicted worker-2
+        master.evict_worker("worker-2")
+        master.evict_worker("worker-1")
+        resp = await asyncio.wait_for(waiting, 1)
+        self.assertEqual(resp.status, 400)
+
+    @unittest_run_loop
+    async def test_worker_evicted_while_working(self):
+        await self.wait_files_loaded()
+        headers1 = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers1)
+        self.assertEqual(resp.status, 200)
+
+        master = self.app["master"]
+        params = {"max_files": len(master.home.files)}
+        resp = await self.client.get(
+            "/lease_files", headers=headers1, params=params
+        )
+        self.assertEqual(resp.status, 200)
+
+        config = create_fake_config(
+            MASTER=(self.server.host, self.server.port),
+            WORKER_HEARTBEAT_SECONDS=0,
+        )
+        worker = pull_worker.Worker("worker-2", config=config)
+        working = asyncio.ensure_future(worker.main())
+        await asyncio.sleep(0.1)
+        self.assertTrue(master.worker_registered("worker-2"))
+
+        # evicted worker registers again instead of exiting
+        master.evict_worker("worker-2")
+        for _ in range(20):
+            await asyncio.sleep(0.1)
+            if master.worker_registered("worker-2"):
+                break
+        self.assertTrue(master.worker_registered("worker-2"))
+        self.assertFalse(working.done())
+
+        # files of worker-1 are requeued and hashed by worker-2
+        master.evict_worker("worker-1")
+        await asyncio.wait_for(working, 5)
+        self.assertTrue(master.home.finished)
+
+    @unittest_run_loop
+    async def test_get_file_with_invalid_wait_parameter(self):
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        params = {"wait": "-1"}
+        resp = await self.client.get(
+            "/get_file", headers=headers, params=params
+        )
+        self.assertEqual(resp.status, 400)
+
+    @unittest_run_loop
+    async def test_fetch_file_while_file_not_leased(self):
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        headers[constants.HTTP_HEADER_X_FILE_PATH] = "__init__.py"
+        resp = await self.client.get("/fetch_file", headers=headers)
+        self.assertEqual(resp.status, 409)
+
     @unittest_run_loop
     async def test_home_status(self):
+        await self.wait_files_loaded()
         # XXX mocked
         master = self.app["master"]
         master.home.files = {
@@ -98,11 +405,19 @@ class MasterHTTPTestCase(AioHTTPTestCase):
         resp = await self.client.get("/home_status")
         self.assertEqual(resp.status, 200)
         got_status = await resp.json()
-        expected_status = {"state": {"total": 3, "finished": 1}}
+        expected_status = {
+            "state": {
+                "total": 3,
+                "finished": 1,
+                "bytes_total": 0,
+                "bytes_finished": 0,
+            }
+        }
         self.assertDictEqual(got_status, expected_status)
 
     @unittest_run_loop
     async def test_home_status_with_optional_include_files(self):
+        await self.wait_files_loaded()
         # XXX mocked
         _files = {
             "var/file1": None,
@@ -117,11 +432,364 @@ class MasterHTTPTestCase(AioHTTPTestCase):
         self.assertEqual(resp.status, 200)
         got_status = await resp.json()
         expected_status = {
-            "state": {"total": 3, "finished": 1},
+            "state": {
+                "total": 3,
+                "finished": 1,
+                "bytes_total": 0,
+                "bytes_finished": 0,
+            },
             "files": _files,
         }
         self.assertDictEqual(got_status, expected_status)
 
 
+class ChunkedHashingHTTPTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        _home_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(_home_dir.cleanup)
+        home_dir = _home_dir.name
+        self.chunked_content = os.urandom(250)
+        with open(os.path.join(home_dir, "large"), "wb") as f:
+            f.write(self.chunked_content)
+        with open(os.path.join(home_dir, "small"), "wb") as f:
+            f.write(os.urandom(10))
+
+        fake_config = create_fake_config(
+            CHUNKED_HASHING_FILE_SIZE=100, CHUNKED_HASHING_CHUNK_SIZE=100
+        )
+        return pull_master.init(home_dir, config=fake_config)
+
+    @unittest_run_loop
+    async def test_chunked_hashing(self):
+        await self.app["load_files"]
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        # chunks are leased first
+        resp = await self.client.get("/lease_files", headers=headers)
+        self.assertEqual(resp.status, 200)
+        got_manifest = await resp.json()
+        got_chunks = [
+            (f["file_path"], f.get("chunk"), f.get("offset"), f.get("length"))
+            for f in got_manifest["files"]
+        ]
+        expected_chunks = [
+            ("large", 0, 0, 100),
+            ("large", 1, 100, 100),
+            ("large", 2, 200, 50),
+            ("small", None, None, None),
+        ]
+        self.assertListEqual(got_chunks, expected_chunks)
+
+        # legacy get_file does not get chunks
+        resp = await self.client.get("/get_file", headers=headers)
+        self.assertEqual(resp.status, 202)
+
+        chunk_hashes = []
+        for leased_file in got_manifest["files"][:3]:
+            offset = leased_file["offset"]
+            end = offset + leased_file["length"] - 1
+            _headers = {
+                constants.HTTP_HEADER_X_FILE_PATH: "large",
+                constants.HTTP_HEADER_X_FILE_CHUNK: str(leased_file["chunk"]),
+                "Range": f"bytes={offset}-{end}",
+            }
+            _headers.update(headers)
+            resp = await self.client.get("/fetch_file", headers=_headers)
+            self.assertEqual(resp.status, 206)
+            chunk = await resp.read()
+            self.assertEqual(chunk, self.chunked_content[offset:end + 1])
+            chunk_hashes.append(
+                {
+                    "file_path": "large",
+                    "chunk": leased_file["chunk"],
+                    "file_hash": calc_file_hash(chunk),
+                }
+            )
+
+        payload = {
+            "chunks": chunk_hashes
+            + [
+                {
+                    "file_path": "small",
+                    "chunk": 0,
+                    "file_hash": gen_random_file_hash(),
+                }
+            ]
+        }
+        resp = await self.client.put(
+            "/update_file_hash", json=payload, headers=headers
+        )
+        self.assertEqual(resp.status, 200)
+        got_result = await resp.json()
+        expected_result = {
+            "not_found": [],
+            "not_found_chunks": [{"file_path": "small", "chunk": 0}],
+        }
+        self.assertDictEqual(got_result, expected_result)
+
+        master = self.app["master"]
+        expected_tree_hash = calc_tree_hash(
+            [chunk_hash["file_hash"] for chunk_hash in chunk_hashes]
+        )
+        self.assertEqual(master.home.tree_hashes["large"], expected_tree_hash)
+        # tree hash is not the sha1 of the file
+        self.assertIsNone(master.home.files["large"])
+        self.assertIsNone(master.home.files["small"])
+        self.assertEqual(master.home.state["finished"], 1)
+        self.assertEqual(master.home.state["tree_hashed"], 1)
+
+    @unittest_run_loop
+    async def test_get_file_without_chunk_workers(self):
+        await self.app["load_files"]
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        # chunked files are leased whole instead of waiting forever
+        file_hashes = {}
+        for _ in range(2):
+            resp = await self.client.get("/get_file", headers=headers)
+            self.assertEqual(resp.status, 200)
+            file_path = resp.headers[constants.HTTP_HEADER_X_FILE_PATH]
+            file_hashes[file_path] = calc_file_hash(await resp.read())
+        self.assertSetEqual(set(file_hashes), {"large", "small"})
+
+        resp = await self.client.put(
+            "/update_file_hash", json={"files": file_hashes}, headers=headers
+        )
+        self.assertEqual(resp.status, 200)
+        resp = await self.client.get("/get_file", headers=headers)
+        self.assertEqual(resp.status, 204)
+
+        master = self.app["master"]
+        self.assertEqual(
+            master.home.files["large"], calc_file_hash(self.chunked_content)
+        )
+        self.assertNotIn("large", master.home.tree_hashes)
+
+    @unittest_run_loop
+    async def test_get_bundle_while_file_removed(self):
+        await self.app["load_files"]
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        master = self.app["master"]
+        os.remove(master.home.get_full_path("small"))
+        resp = await self.client.get("/get_bundle", headers=headers)
+        self.assertEqual(resp.status, 200)
+        hashes = await hash_bundle(resp.content.readexactly, 1024, ["sha1"])
+        self.assertSetEqual(set(hashes), {"large"})
+
+        # removed file is failed instead of leased again
+        self.assertEqual(master.home.state["failed"], 1)
+        self.assertFalse(master.is_processing_file("worker-1", "small"))
+        self.assertTrue(master.files_queue.empty())
+
+
+    @unittest_run_loop
+    async def test_get_bundle_while_file_truncated(self):
+        await self.app["load_files"]
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        # "large" is truncated by 5 bytes after opened
+        fstat = os.fstat
+
+        def _fstat(fd):
+            stat = fstat(fd)
+            if stat.st_size != len(self.chunked_content):
+                return stat
+            return os.stat_result(
+                stat[:6] + (stat.st_size + 5,) + stat[7:]
+            )
+
+        master = self.app["master"]
+        with unittest.mock.patch("os.fstat", _fstat):
+            resp = await self.client.get("/get_bundle", headers=headers)
+            self.assertEqual(resp.status, 200)
+            hashes = await hash_bundle(
+                resp.content.readexactly, 1024, ["sha1"]
+            )
+        # frames after the truncated file are still parsed
+        self.assertSetEqual(set(hashes), {"small"})
+        self.assertEqual(master.home.state["failed"], 1)
+        self.assertFalse(master.is_processing_file("worker-1", "large"))
+        self.assertTrue(master.is_processing_file("worker-1", "small"))
+
+
+class CompressionHTTPTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        _home_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(_home_dir.cleanup)
+        home_dir = _home_dir.name
+        self.chunks = {
+            "file.log": b"log line\n" * 10000,
+            "file.gz": b"0" * 10000,
+        }
+        for file_path, chunk in self.chunks.items():
+            with open(os.path.join(home_dir, file_path), "wb") as f:
+                f.write(chunk)
+
+        fake_config = create_fake_config(
+            COMPRESSION=True, COMPRESSION_MAX_CPU_PERCENT=100
+        )
+        return pull_master.init(home_dir, config=fake_config)
+
+    @unittest_run_loop
+    async def test_get_file_with_compression(self):
+        await self.app["load_files"]
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        headers["Accept-Encoding"] = "deflate"
+        got_encodings = {}
+        for _ in self.chunks:
+            resp = await self.client.get("/get_file", headers=headers)
+            self.assertEqual(resp.status, 200)
+            file_path = resp.headers[constants.HTTP_HEADER_X_FILE_PATH]
+            got_encodings[file_path] = resp.headers.get("Content-Encoding")
+            # decompressed by client
+            self.assertEqual(await resp.read(), self.chunks[file_path])
+        # already compressed file type is transferred as is
+        self.assertEqual(
+            got_encodings, {"file.log": "deflate", "file.gz": None}
+        )
+
+
+class HashAlgorithmsHTTPTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        _home_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(_home_dir.cleanup)
+        home_dir = _home_dir.name
+        for file_path in ("file1", "file2"):
+            with open(os.path.join(home_dir, file_path), "wb") as f:
+                f.write(os.urandom(10))
+
+        fake_config = create_fake_config(HASH_ALGORITHMS=["sha1", "sha256"])
+        return pull_master.init(home_dir, config=fake_config)
+
+    @unittest_run_loop
+    async def test_update_file_hashes_of_hash_algorithms(self):
+        await self.app["load_files"]
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+
+        resp = await self.client.get("/get_file", headers=headers)
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(
+            resp.headers[constants.HTTP_HEADER_X_HASH_ALGORITHMS],
+            "sha1,sha256",
+        )
+        await resp.read()
+        resp = await self.client.get("/lease_files", headers=headers)
+        self.assertEqual(resp.status, 200)
+        got_manifest = await resp.json()
+        self.assertListEqual(
+            got_manifest["hash_algorithms"], ["sha1", "sha256"]
+        )
+
+        master = self.app["master"]
+        sha256_hash = "0" * 64
+        payload = {
+            "files": {
+                "file1": {"sha1": gen_random_file_hash()},
+                "file2": {"sha256": sha256_hash},
+            }
+        }
+        resp = await self.client.put(
+            "/update_file_hash", json=payload, headers=headers
+        )
+        # missing hash of the first algorithm
+        self.assertEqual(resp.status, 400)
+        self.assertFalse(master.home.finished)
+
+        file1_hash = gen_random_file_hash()
+        file2_hash = gen_random_file_hash()
+        payload = {
+            "files": {
+                "file1": file1_hash,
+                "file2": {"sha1": file2_hash, "sha256": sha256_hash},
+            }
+        }
+        resp = await self.client.put(
+            "/update_file_hash", json=payload, headers=headers
+        )
+        self.assertEqual(resp.status, 200)
+        self.assertTrue(master.home.finished)
+        self.assertDictEqual(
+            master.home.get_file_hashes("file2"),
+            {"sha1": file2_hash, "sha256": sha256_hash},
+        )
+
+        params = {"include_files": "1"}
+        resp = await self.client.get("/home_status", params=params)
+        got_status = await resp.json()
+        self.assertDictEqual(
+            got_status["hashes"], {"sha256": {"file2": sha256_hash}}
+        )
+
+
+class MasterJournalTestCase(unittest.TestCase):
+    def test_resume_from_journal(self):
+        with tempfile.TemporaryDirectory() as home_dir:
+            for file_path in ("file1", "file2", "file3"):
+                with open(os.path.join(home_dir, file_path), "wb") as f:
+                    f.write(os.urandom(10))
+            with tempfile.TemporaryDirectory() as journal_dir:
+                fake_config = create_fake_config(
+                    MASTER_JOURNAL_PATH=os.path.join(journal_dir, "journal")
+                )
+
+                async def run(file_hashes):
+                    master = pull_master.Master(home_dir, config=fake_config)
+                    await master.load_files()
+                    queued_files = set()
+                    while not master.files_queue.empty():
+                        queued_files.add(master.files_queue.get_nowait())
+                    for file_path, file_hash in file_hashes.items():
+                        master.home.set_file_hash(file_path, file_hash)
+                    await master.sync_journal()
+                    await master.wait_journal_synced()
+                    # crash without closing home
+                    return queued_files, dict(master.home.files)
+
+                file1_hash = gen_random_file_hash()
+                queued_files, _ = asyncio.run(run({"file1": file1_hash}))
+                self.assertSetEqual(queued_files, {"file1", "file2", "file3"})
+
+                queued_files, files = asyncio.run(run({}))
+                self.assertSetEqual(queued_files, {"file2", "file3"})
+                self.assertEqual(files["file1"], file1_hash)
+
+
+class MasterLoadErrorHTTPTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        home_dir = os.path.join(os.path.dirname(__file__), "does-not-exist")
+        return pull_master.init(home_dir)
+
+    @unittest_run_loop
+    async def test_home_status_with_load_error(self):
+        with self.assertRaises(FileNotFoundError):
+            await self.app["load_files"]
+
+        resp = await self.client.get("/home_status")
+        self.assertEqual(resp.status, 200)
+        got_status = await resp.json()
+        self.assertIn("FileNotFoundError", got_status["load_error"])
+
+        # workers are told to stop instead of waiting forever
+        headers = {constants.HTTP_HEADER_X_WORKER_NAME: "worker-1"}
+        resp = await self.client.post("/worker_register", headers=headers)
+        self.assertEqual(resp.status, 200)
+        resp = await self.client.get("/get_file", headers=headers)
+        self.assertEqual(resp.status, 204)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,132 @@
+import asyncio
+import hashlib
+import os
+import os.path
+import unittest
+
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
+
+from distributed import constants
+from distributed.bundles import pack_frame_header
+from distributed.pull.worker import NoMoreFiles, Worker
+
+from ...util import calc_file_hash, create_fake_config
+
+
+class WorkerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.home_dir = os.path.dirname(__file__)
+        self.worker = Worker("worker-1", shared_home_dir=self.home_dir)
+
+    def test_calculate_leased_file_hash_in_shared_home(self):
+        file_stat = os.stat(__file__)
+        leased_file = {
+            "file_path": os.path.basename(__file__),
+            "file_size": file_stat.st_size,
+            "file_mtime_ns": file_stat.st_mtime_ns,
+        }
+        got_hashes = asyncio.run(
+            self.worker.calculate_leased_file_hash(
+                leased_file, ["sha1", "sha256"]
+            )
+        )
+        data = open(__file__, "rb").read()
+        expected_hashes = {
+            "sha1": calc_file_hash(data),
+            "sha256": hashlib.sha256(data).hexdigest(),
+        }
+        self.assertEqual(got_hashes, expected_hashes)
+
+    def test_get_shared_file_path_while_file_not_match(self):
+        file_stat = os.stat(__file__)
+        leased_file = {
+            "file_path": os.path.basename(__file__),
+            "file_size": file_stat.st_size,
+            "file_mtime_ns": file_stat.st_mtime_ns + 1,
+        }
+        self.assertIsNone(self.worker._get_shared_file_path(leased_file))
+
+        leased_file = {
+            "file_path": "does/not/exist",
+            "file_size": 0,
+            "file_mtime_ns": 0,
+        }
+        self.assertIsNone(self.worker._get_shared_file_path(leased_file))
+
+
+class PipelineWorkerTestCase(unittest.TestCase):
+    def test_files_in_flight_concurrently(self):
+        worker = Worker("worker-1", pipeline_depth=3)
+        in_flight = 0
+        max_in_flight = 0
+        files_number = 9
+
+        async def worker_register():
+            return True
+
+        async def work():
+            nonlocal in_flight, max_in_flight, files_number
+            if files_number == 0:
+                raise NoMoreFiles
+            files_number -= 1
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        worker.worker_register = worker_register
+        worker.work = work
+        worker.run()
+        self.assertEqual(files_number, 0)
+        self.assertEqual(max_in_flight, 3)
+
+
+class BundleWorkerTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        self.reported = []
+        self.bundles = 0
+
+        async def worker_register(request):
+            return web.Response()
+
+        async def get_bundle(request):
+            self.bundles += 1
+            if self.bundles > 1:
+                return web.Response(status=204)
+            resp = web.StreamResponse(
+                headers={constants.HTTP_HEADER_X_HASH_ALGORITHMS: "sha1"}
+            )
+            await resp.prepare(request)
+            await resp.write(pack_frame_header("complete", 1) + b"0")
+            await resp.write(pack_frame_header("truncated", 10) + b"0")
+            # connection is closed in the middle of a frame
+            raise ConnectionResetError
+
+        async def update_file_hash(request):
+            self.reported.append(await request.json())
+            return web.json_response({"not_found": []})
+
+        app = web.Application()
+        app.router.add_post("/worker_register", worker_register)
+        app.router.add_get("/get_bundle", get_bundle)
+        app.router.add_put("/update_file_hash", update_file_hash)
+        return app
+
+    @unittest_run_loop
+    async def test_work_bundle_while_bundle_truncated(self):
+        config = create_fake_config(
+            MASTER=(self.server.host, self.server.port),
+            WORKER_HEARTBEAT_SECONDS=0,
+        )
+        worker = Worker("worker-1", config=config, bundle=True)
+        await asyncio.wait_for(worker.main(), 5)
+
+        # complete files are reported and worker keeps working
+        expected_reported = [{"files": {"complete": calc_file_hash(b"0")}}]
+        self.assertListEqual(self.reported, expected_reported)
+        self.assertEqual(self.bundles, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
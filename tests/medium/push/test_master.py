@@ -0,0 +1,199 @@
+import asyncio
+import multiprocessing
+import os
+import os.path
+import random
+import tempfile
+import unittest
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import unused_port
+
+from distributed.push.master import Master
+import distributed.push.worker as push_worker
+
+from ...util import calc_file_hash, create_fake_config
+
+
+def start_worker_server(port, jobs_number):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    web.run_app(push_worker.init(jobs_number=jobs_number), port=port)
+
+
+async def _fail_job(request):
+    raise web.HTTPInternalServerError(text="can not hash file")
+
+
+async def _idle_status(request):
+    return web.json_response({"total": 2, "idle": 2, "cpu_percent": 0.0})
+
+
+def start_failing_worker_server(port):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    app = web.Application()
+    app.add_routes(
+        [web.post("/new_file", _fail_job), web.get("/status", _idle_status)]
+    )
+    web.run_app(app, port=port)
+
+
+async def _hash_shared_file_once_busy(request):
+    # busy at the first time
+    request.app["requests"] += 1
+    if request.app["requests"] == 1:
+        raise web.HTTPServiceUnavailable(text="no idle job")
+    form = await request.post()
+    full_path = os.path.join(request.app["home_dir"], form["file_path"])
+    with open(full_path, "rb") as f:
+        return web.json_response({"sha1": calc_file_hash(f.read())})
+
+
+def start_busy_shared_worker_server(port, home_dir):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    app = web.Application()
+    app["home_dir"] = home_dir
+    app["requests"] = 0
+    app.add_routes(
+        [
+            web.post("/new_file", _fail_job),
+            web.post("/hash_file", _hash_shared_file_once_busy),
+            web.get("/status", _idle_status),
+        ]
+    )
+    web.run_app(app, port=port)
+
+
+async def run_master(master):
+    async with aiohttp.ClientSession() as session:
+        master.session = session
+        collecting = asyncio.ensure_future(master.collect_status())
+        try:
+            await master.dispatch()
+        finally:
+            collecting.cancel()
+
+
+class MasterTestCase(unittest.TestCase):
+    def setUp(self):
+        self._ports = [unused_port(), unused_port()]
+        self._processes = []
+        for port, jobs_number in zip(self._ports, (1, 3)):
+            process = multiprocessing.Process(
+                target=start_worker_server, args=(port, jobs_number)
+            )
+            process.start()
+            self._processes.append(process)
+
+    def tearDown(self):
+        for process in self._processes:
+            process.terminate()
+
+    def test_task(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        with tempfile.TemporaryDirectory() as home_dir:
+            files = {}
+            for i in range(8):
+                file_path = os.path.join(home_dir, f"file{i}")
+                size = random.randint(1024 * 1024, 4 * 1024 * 1024)
+                chunk = os.urandom(size)
+                files[file_path] = calc_file_hash(chunk)
+                with open(file_path, "wb") as f:
+                    f.write(chunk)
+
+            fake_config = create_fake_config(
+                # the last worker server is unreachable
+                WORKERS=[("127.0.0.1", port) for port in self._ports]
+                + [("127.0.0.1", unused_port())],
+                COMPRESSION=True,
+                COMPRESSION_SKIP_EXTENSIONS=[".gz"],
+                COMPRESSION_MAX_CPU_PERCENT=100,
+                PUSH_MASTER_STATUS_SECONDS=0.1,
+            )
+
+            master = Master(home_dir, config=fake_config)
+            loop.run_until_complete(
+                asyncio.wait_for(run_master(master), timeout=30)
+            )
+            got_files = master.home.files
+            expected_files = {
+                master.home._get_rel_path(path): hash_
+                for path, hash_ in files.items()
+            }
+            self.assertEqual(got_files, expected_files)
+            self.assertEqual(master.workers[1].total, 3)
+            self.assertFalse(master.workers[2].reachable)
+            loop.close()
+
+    def test_task_while_worker_server_failing(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        port = unused_port()
+        process = multiprocessing.Process(
+            target=start_failing_worker_server, args=(port,)
+        )
+        process.start()
+        self._processes.append(process)
+
+        with tempfile.TemporaryDirectory() as home_dir:
+            for i in range(4):
+                with open(os.path.join(home_dir, f"file{i}"), "wb") as f:
+                    f.write(os.urandom(1024))
+
+            fake_config = create_fake_config(
+                WORKERS=[("127.0.0.1", port)], PUSH_MASTER_STATUS_SECONDS=0.1
+            )
+
+            master = Master(home_dir, config=fake_config)
+            loop.run_until_complete(
+                asyncio.wait_for(run_master(master), timeout=30)
+            )
+            # files are failed instead of pushed again forever
+            self.assertEqual(master.home.state["failed"], 4)
+            self.assertTrue(master.home.finished)
+            loop.close()
+
+
+    def test_task_with_shared_storage_while_worker_busy(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        with tempfile.TemporaryDirectory() as home_dir:
+            port = unused_port()
+            process = multiprocessing.Process(
+                target=start_busy_shared_worker_server, args=(port, home_dir)
+            )
+            process.start()
+            self._processes.append(process)
+
+            files = {}
+            for i in range(4):
+                chunk = os.urandom(1024)
+                files[f"file{i}"] = calc_file_hash(chunk)
+                with open(os.path.join(home_dir, f"file{i}"), "wb") as f:
+                    f.write(chunk)
+
+            fake_config = create_fake_config(
+                WORKERS=[("127.0.0.1", port)],
+                SHARED_STORAGE=True,
+                PUSH_MASTER_STATUS_SECONDS=0.1,
+            )
+
+            master = Master(home_dir, config=fake_config)
+            loop.run_until_complete(
+                asyncio.wait_for(run_master(master), timeout=30)
+            )
+            # busy file is pushed again instead of uploaded
+            self.assertEqual(dict(master.home.files), files)
+            self.assertNotIn("failed", master.home.state)
+            loop.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
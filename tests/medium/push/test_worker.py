@@ -0,0 +1,42 @@
+import os
+
+from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
+
+import distributed.push.worker as push_worker
+
+from ...util import calc_file_hash
+
+
+class WorkerHTTPTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        return push_worker.init(jobs_number=2)
+
+    @unittest_run_loop
+    async def test_new_file(self):
+        chunk = os.urandom(1024 * 1024)
+        headers = {"Content-Type": "application/octet-stream"}
+        resp = await self.client.post("/new_file", data=chunk, headers=headers)
+        self.assertEqual(resp.status, 200)
+        got_resp_text = await resp.text()
+        self.assertEqual(got_resp_text, calc_file_hash(chunk))
+        self.assertEqual(self.app["status"].busy, 0)
+
+    @unittest_run_loop
+    async def test_new_file_while_no_idle_job(self):
+        self.app["status"].busy = 2
+        resp = await self.client.post("/new_file", data={"file": b"0"})
+        self.assertEqual(resp.status, 503)
+
+    @unittest_run_loop
+    async def test_status(self):
+        resp = await self.client.get("/status")
+        self.assertEqual(resp.status, 200)
+        got_status = await resp.json()
+        self.assertEqual(got_status["total"], 2)
+        self.assertEqual(got_status["idle"], 2)
+        self.assertIn("cpu_percent", got_status)
+
+        self.app["status"].busy = 1
+        resp = await self.client.get("/status")
+        got_status = await resp.json()
+        self.assertEqual(got_status["idle"], 1)
@@ -3,7 +3,9 @@ import multiprocessing
 import os
 import os.path
 import random
+import socket
 import tempfile
+import time
 import unittest
 
 from aiohttp import web
@@ -12,7 +14,29 @@ from aiohttp.test_utils import unused_port
 from distributed.simple.master import Master
 import distributed.simple.worker as simple_worker
 
-from ...util import calc_file_hash
+from ...util import calc_file_hash, create_fake_config
+
+
+async def _fail_job(request):
+    raise web.HTTPInternalServerError(text="can not hash file")
+
+
+def init_failing_worker():
+    app = web.Application()
+    app.add_routes([web.post("/new_file", _fail_job)])
+    return app
+
+
+def wait_for_server(port, timeout=10):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port)).close()
+            return
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(0.05)
 
 
 def start_worker_server(app, port):
@@ -65,17 +89,52 @@ class MasterTestCase(unittest.TestCase):
                 with open(file_path, "wb") as f:
                     f.write(chunk)
 
-            class FakeConfig:
-                MASTER = ("127.0.0.1", 8000)
-                WORKERS = [
+            fake_config = create_fake_config(
+                WORKERS=[
                     ("127.0.0.1", self._port1),
                     ("127.0.0.1", self._port2),
                 ]
-                CHUNK_SIZE = 256 * 1024
-                WORKER_PROCESSING_TIMEOUT_SECONDS = 4
-                WORKER_WAIT_FOR_TIMEOUT_FILE_SECONDS = 4
+            )
 
-            master = Master(home_dir, config=FakeConfig)
+            master = Master(home_dir, config=fake_config)
+            loop.run_until_complete(master.run())
+            got_files = master.home.files
+            expected_files = {
+                master.home._get_rel_path(path): hash_
+                for path, hash_ in files.items()
+            }
+            assert got_files == expected_files
+
+    def test_task_with_concurrent_jobs(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        with tempfile.TemporaryDirectory() as home_dir:
+            dir1_path = os.path.join(home_dir, "var/dir1")
+            dir2_path = os.path.join(home_dir, "var/dir2")
+            dir3_path = os.path.join(home_dir, "var/dir2/dir3")
+            os.makedirs(dir1_path)
+            os.makedirs(dir3_path)
+            file1_path = os.path.join(dir1_path, "file1")
+            file2_path = os.path.join(dir2_path, "file2")
+            file3_path = os.path.join(dir2_path, "file3.ext")
+            file4_path = os.path.join(dir3_path, "file4")
+            files = {}
+            for file_path in (file1_path, file2_path, file3_path, file4_path):
+                size = random.randint(2 * 1024 * 1024, 10 * 1024 * 1024)
+                chunk = os.urandom(size)
+                files[file_path] = calc_file_hash(chunk)
+                with open(file_path, "wb") as f:
+                    f.write(chunk)
+
+            fake_config = create_fake_config(
+                WORKERS=[
+                    ("127.0.0.1", self._port1, 3),
+                    ("127.0.0.1", self._port2),
+                ]
+            )
+
+            master = Master(home_dir, config=fake_config)
             loop.run_until_complete(master.run())
             got_files = master.home.files
             expected_files = {
@@ -108,14 +167,9 @@ class MasterTestCase(unittest.TestCase):
                 with open(file_path, "wb") as f:
                     f.write(chunk)
 
-            class FakeConfig:
-                MASTER = ("127.0.0.1", 8000)
-                WORKERS = [("127.0.0.1", port3)]
-                CHUNK_SIZE = 256 * 1024
-                WORKER_PROCESSING_TIMEOUT_SECONDS = 4
-                WORKER_WAIT_FOR_TIMEOUT_FILE_SECONDS = 4
+            fake_config = create_fake_config(WORKERS=[("127.0.0.1", port3)])
 
-            master = Master(home_dir, config=FakeConfig)
+            master = Master(home_dir, config=fake_config)
             loop.run_until_complete(master.run())
             got_files = master.home.files
             expected_files = {
@@ -148,18 +202,15 @@ class MasterTestCase(unittest.TestCase):
                 with open(file_path, "wb") as f:
                     f.write(chunk)
 
-            class FakeConfig:
-                MASTER = ("127.0.0.1", 8000)
-                WORKERS = [
+            fake_config = create_fake_config(
+                WORKERS=[
                     ("127.0.0.1", self._port1),
                     ("127.0.0.1", self._port2),
                     ("127.0.0.1", port3),
                 ]
-                CHUNK_SIZE = 256 * 1024
-                WORKER_PROCESSING_TIMEOUT_SECONDS = 4
-                WORKER_WAIT_FOR_TIMEOUT_FILE_SECONDS = 4
+            )
 
-            master = Master(home_dir, config=FakeConfig)
+            master = Master(home_dir, config=fake_config)
             loop.run_until_complete(master.run())
             got_files = master.home.files
             expected_files = {
@@ -167,3 +218,37 @@ class MasterTestCase(unittest.TestCase):
                 for path, hash_ in files.items()
             }
             assert got_files == expected_files
+
+    def test_task_while_worker_server_failing(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        port3 = unused_port()
+        process3 = multiprocessing.Process(
+            target=start_worker_server, args=(init_failing_worker(), port3)
+        )
+        process3.start()
+        self._processes.append(process3)
+
+        with tempfile.TemporaryDirectory() as home_dir:
+            dir1_path = os.path.join(home_dir, "var/dir1")
+            os.makedirs(dir1_path)
+            file_paths = [
+                os.path.join(dir1_path, f"file{i}") for i in range(4)
+            ]
+            for file_path in file_paths:
+                with open(file_path, "wb") as f:
+                    f.write(os.urandom(1024))
+
+            fake_config = create_fake_config(WORKERS=[("127.0.0.1", port3, 2)])
+
+            wait_for_server(port3)
+            master = Master(home_dir, config=fake_config)
+            loop.run_until_complete(
+                asyncio.wait_for(master.run(), timeout=10)
+            )
+            # files are failed instead of hanging dispatcher
+            self.assertEqual(master.home.state["failed"], len(file_paths))
+            self.assertEqual(master.home.state["finished"], 0)
+            self.assertTrue(master.home.finished)
+            self.assertEqual(list(master.home.iter_unfinished_files()), [])
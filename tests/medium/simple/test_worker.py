@@ -1,10 +1,24 @@
+import asyncio
+import hashlib
 import os
+import os.path
 import random
+import signal
+import socket
+import subprocess
+import sys
 import tempfile
+import time
 import unittest
 
-from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
+import aiohttp
+from aiohttp.test_utils import (
+    AioHTTPTestCase,
+    unittest_run_loop,
+    unused_port,
+)
 
+from distributed import constants
 import distributed.simple.worker as simple_worker
 
 from ...util import calc_file_hash
@@ -48,6 +62,161 @@ class WorkerHTTPTestCase(AioHTTPTestCase):
             self.assertEqual(resp.status, 200)
             self.assertEqual(got_resp_text, expected_resp_text)
 
+    @unittest_run_loop
+    async def test_new_file_with_raw_body(self):
+        with tempfile.TemporaryFile() as fp:
+            size = random.randint(2 * 1024 * 1024, 10 * 1024 * 1024)
+            chunk = os.urandom(size)
+            fp.write(chunk)
+            fp.seek(0)
+
+            headers = {"Content-Type": "application/octet-stream"}
+            resp = await self.client.post(
+                "/new_file", data=fp, headers=headers
+            )
+            got_resp_text = await resp.text()
+            expected_resp_text = calc_file_hash(chunk)
+            self.assertEqual(resp.status, 200)
+            self.assertEqual(got_resp_text, expected_resp_text)
+
+    @unittest_run_loop
+    async def test_new_file_with_hash_algorithms(self):
+        chunk = os.urandom(1024)
+        headers = {
+            "Content-Type": "application/octet-stream",
+            constants.HTTP_HEADER_X_HASH_ALGORITHMS: "sha256,sha1",
+        }
+        resp = await self.client.post(
+            "/new_file", data=chunk, headers=headers
+        )
+        self.assertEqual(resp.status, 200)
+        got_hashes = await resp.json()
+        expected_hashes = {
+            "sha1": calc_file_hash(chunk),
+            "sha256": hashlib.sha256(chunk).hexdigest(),
+        }
+        self.assertDictEqual(got_hashes, expected_hashes)
+
+        headers[constants.HTTP_HEADER_X_HASH_ALGORITHMS] = "does-not-exist"
+        resp = await self.client.post(
+            "/new_file", data=chunk, headers=headers
+        )
+        self.assertEqual(resp.status, 400)
+
+    @unittest_run_loop
+    async def test_new_file_with_concurrent_files(self):
+        chunks = [os.urandom(1024 * 1024 + i) for i in range(4)]
+
+        async def upload(chunk):
+            resp = await self.client.post("/new_file", data={"file": chunk})
+            self.assertEqual(resp.status, 200)
+            return await resp.text()
+
+        got_resp_texts = await asyncio.gather(*map(upload, chunks))
+        expected_resp_texts = [calc_file_hash(chunk) for chunk in chunks]
+        self.assertEqual(got_resp_texts, expected_resp_texts)
+
+
+class SharedHomeWorkerHTTPTestCase(AioHTTPTestCase):
+    async def get_application(self):
+        self.home_dir = os.path.dirname(__file__)
+        return simple_worker.init(self.home_dir)
+
+    @unittest_run_loop
+    async def test_hash_file(self):
+        file_path = os.path.basename(__file__)
+        file_stat = os.stat(__file__)
+        payload = {
+            "file_path": file_path,
+            "file_size": str(file_stat.st_size),
+            "file_mtime_ns": str(file_stat.st_mtime_ns),
+        }
+        resp = await self.client.post("/hash_file", data=payload)
+        got_resp_text = await resp.text()
+        expected_resp_text = calc_file_hash(open(__file__, "rb").read())
+        self.assertEqual(resp.status, 200)
+        self.assertEqual(got_resp_text, expected_resp_text)
+
+    @unittest_run_loop
+    async def test_hash_file_while_file_not_match(self):
+        file_path = os.path.basename(__file__)
+        file_stat = os.stat(__file__)
+        payload = {
+            "file_path": file_path,
+            "file_size": str(file_stat.st_size + 1),
+            "file_mtime_ns": str(file_stat.st_mtime_ns),
+        }
+        resp = await self.client.post("/hash_file", data=payload)
+        self.assertEqual(resp.status, 409)
+
+    @unittest_run_loop
+    async def test_hash_file_while_file_not_found(self):
+        payload = {
+            "file_path": "does/not/exist",
+            "file_size": "0",
+            "file_mtime_ns": "0",
+        }
+        resp = await self.client.post("/hash_file", data=payload)
+        self.assertEqual(resp.status, 404)
+
+    @unittest_run_loop
+    async def test_hash_file_outside_home(self):
+        payload = {
+            "file_path": "../__init__.py",
+            "file_size": "0",
+            "file_mtime_ns": "0",
+        }
+        resp = await self.client.post("/hash_file", data=payload)
+        self.assertEqual(resp.status, 400)
+
+
+class WorkerProcessesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.port = unused_port()
+        self.server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "distributed.simple.worker",
+                "--port",
+                str(self.port),
+                "--processes",
+                "2",
+            ],
+            start_new_session=True,
+        )
+        self.addCleanup(self.server.wait)
+        self.addCleanup(os.killpg, self.server.pid, signal.SIGTERM)
+
+        deadline = time.time() + 10
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", self.port)).close()
+                break
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.05)
+
+    def test_new_file(self):
+        chunks = [os.urandom(1024 * 1024 + i) for i in range(4)]
+        url = f"http://127.0.0.1:{self.port}/new_file"
+
+        async def upload(session, chunk):
+            async with session.post(url, data={"file": chunk}) as resp:
+                self.assertEqual(resp.status, 200)
+                return await resp.text()
+
+        async def upload_all():
+            async with aiohttp.ClientSession() as session:
+                return await asyncio.gather(
+                    *(upload(session, chunk) for chunk in chunks)
+                )
+
+        got_resp_texts = asyncio.run(upload_all())
+        expected_resp_texts = [calc_file_hash(chunk) for chunk in chunks]
+        self.assertEqual(got_resp_texts, expected_resp_texts)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -1,10 +1,15 @@
+import asyncio
 import os
 import os.path
 import random
 import tempfile
 import unittest
+import unittest.mock
 
 from distributed.home import Home
+from distributed.index import HashIndex
+
+from ..util import gen_random_file_hash
 
 
 class HomeTest(unittest.TestCase):
@@ -33,6 +38,231 @@ class HomeTest(unittest.TestCase):
                 "var/dir2/dir3/file4": None,
             }
             self.assertDictEqual(got_files, expected_files)
+            got_total_bytes = home.state["bytes_total"]
+            expected_total_bytes = sum(
+                os.path.getsize(path)
+                for path in (file1_path, file2_path, file3_path, file4_path)
+            )
+            self.assertEqual(got_total_bytes, expected_total_bytes)
+
+    def test_load_files_with_symlink_loop(self):
+        with tempfile.TemporaryDirectory() as home_dir:
+            dir1_path = os.path.join(home_dir, "var/dir1")
+            os.makedirs(dir1_path)
+            with open(os.path.join(dir1_path, "file1"), "wb") as f:
+                f.write(os.urandom(random.randint(0, 10)))
+            os.symlink(home_dir, os.path.join(dir1_path, "loop"))
+
+            home = Home(home_dir)
+            home.load_files()
+            self.assertDictEqual(dict(home.files), {"var/dir1/file1": None})
+
+    def test_load_files_with_inaccessible_dir(self):
+        with tempfile.TemporaryDirectory() as home_dir:
+            for dir_name in ("dir1", "dir2"):
+                dir_path = os.path.join(home_dir, dir_name)
+                os.makedirs(dir_path)
+                with open(os.path.join(dir_path, "file1"), "wb") as f:
+                    f.write(os.urandom(random.randint(0, 10)))
+            dir2_path = os.path.join(home_dir, "dir2")
+            scandir = os.scandir
+
+            def _scandir(path):
+                if path == dir2_path:
+                    raise PermissionError(f"permission denied: {path}")
+                return scandir(path)
+
+            home = Home(home_dir)
+            with unittest.mock.patch("os.scandir", _scandir):
+                home.load_files()
+            self.assertDictEqual(dict(home.files), {"dir1/file1": None})
+
+    def test_stream_files(self):
+        async def stream_files(home):
+            paths = []
+            async for file_paths in home.stream_files(max_workers=4):
+                paths.extend(file_paths)
+            return paths
+
+        with tempfile.TemporaryDirectory() as home_dir:
+            expected_files = {}
+            for i in range(10):
+                dir_path = os.path.join(home_dir, f"var/dir{i}/sub")
+                os.makedirs(dir_path)
+                for j in range(3):
+                    with open(os.path.join(dir_path, f"file{j}"), "wb") as f:
+                        f.write(os.urandom(random.randint(0, 10)))
+                    expected_files[f"var/dir{i}/sub/file{j}"] = None
+            os.symlink(home_dir, os.path.join(home_dir, "var/loop"))
+
+            home = Home(home_dir)
+            got_paths = asyncio.run(stream_files(home))
+            self.assertCountEqual(got_paths, list(expected_files))
+            self.assertDictEqual(dict(home.files), expected_files)
+
+            with self.assertRaises(Exception):
+                asyncio.run(stream_files(home))
+
+    def test_load_files_with_compact_files(self):
+        with tempfile.TemporaryDirectory() as home_dir:
+            dir1_path = os.path.join(home_dir, "var/dir1")
+            os.makedirs(dir1_path)
+            file1_path = os.path.join(dir1_path, "file1")
+            file2_path = os.path.join(home_dir, "file2")
+            for file_path in (file1_path, file2_path):
+                with open(file_path, "wb") as f:
+                    f.write(os.urandom(random.randint(1, 10)))
+
+            home = Home(home_dir, compact=True)
+            home.load_files()
+            expected_files = {"var/dir1/file1": None, "file2": None}
+            self.assertDictEqual(dict(home.files), expected_files)
+            self.assertEqual(
+                home.file_sizes["var/dir1/file1"], os.path.getsize(file1_path)
+            )
+
+            file1_hash = gen_random_file_hash()
+            home.set_file_hash("var/dir1/file1", file1_hash)
+            self.assertEqual(home.files["var/dir1/file1"], file1_hash)
+            self.assertEqual(home.state["finished"], 1)
+            self.assertEqual(
+                home.state["bytes_finished"], os.path.getsize(file1_path)
+            )
+            self.assertListEqual(list(home.iter_unfinished_files()), ["file2"])
+
+    def test_load_files_with_index(self):
+        with tempfile.TemporaryDirectory() as home_dir:
+            dir1_path = os.path.join(home_dir, "var/dir1")
+            os.makedirs(dir1_path)
+            file1_path = os.path.join(dir1_path, "file1")
+            file2_path = os.path.join(dir1_path, "file2")
+            for file_path in (file1_path, file2_path):
+                with open(file_path, "wb") as f:
+                    f.write(os.urandom(random.randint(0, 10)))
+            index_path = os.path.join(home_dir, "index.sqlite3")
+
+            home = Home(home_dir, index=HashIndex(index_path))
+            home.load_files()
+            self.assertSetEqual(
+                set(home.iter_unfinished_files()),
+                {"var/dir1/file1", "var/dir1/file2", "index.sqlite3"},
+            )
+            file1_hash = gen_random_file_hash()
+            file2_hash = gen_random_file_hash()
+            home.set_file_hash("var/dir1/file1", file1_hash)
+            home.set_file_hash("var/dir1/file2", file2_hash)
+            home.close()
+
+            # file2 changed
+            with open(file2_path, "ab") as f:
+                f.write(b"changed")
+
+            home = Home(home_dir, index=HashIndex(index_path))
+            home.load_files()
+            self.assertEqual(home.files["var/dir1/file1"], file1_hash)
+            self.assertIsNone(home.files["var/dir1/file2"])
+            self.assertSetEqual(
+                set(home.iter_unfinished_files()),
+                {"var/dir1/file2", "index.sqlite3"},
+            )
+            home.close()
+
+    def test_load_files_with_index_and_hash_algorithms(self):
+        with tempfile.TemporaryDirectory() as home_dir:
+            file1_path = os.path.join(home_dir, "file1")
+            with open(file1_path, "wb") as f:
+                f.write(os.urandom(random.randint(0, 10)))
+            index_path = os.path.join(home_dir, "index.sqlite3")
+
+            home = Home(home_dir, index=HashIndex(index_path))
+            home.load_files()
+            file1_hash = gen_random_file_hash()
+            home.set_file_hash("file1", file1_hash)
+            home.close()
+
+            # sha256 hash of file1 is not in index
+            algorithms = ["sha1", "sha256"]
+            home = Home(
+                home_dir, index=HashIndex(index_path), algorithms=algorithms
+            )
+            home.load_files()
+            self.assertIsNone(home.files["file1"])
+            file1_sha256_hash = "0" * 64
+            home.set_file_hash(
+                "file1", file1_hash, {"sha256": file1_sha256_hash}
+            )
+            home.close()
+
+            home = Home(
+                home_dir,
+                index=HashIndex(index_path),
+                compact=True,
+                algorithms=algorithms,
+            )
+            home.load_files()
+            self.assertDictEqual(
+                home.get_file_hashes("file1"),
+                {"sha1": file1_hash, "sha256": file1_sha256_hash},
+            )
+            home.close()
+
+    def test_load_files_with_dedup(self):
+        with tempfile.TemporaryDirectory() as home_dir:
+            file1_path = os.path.join(home_dir, "file1")
+            with open(file1_path, "wb") as f:
+                f.write(os.urandom(10))
+            os.link(file1_path, os.path.join(home_dir, "file1.link"))
+            with open(os.path.join(home_dir, "file2"), "wb") as f:
+                f.write(os.urandom(10))
+
+            home = Home(home_dir, dedup=True)
+            home.load_files()
+            unfinished_files = list(home.iter_unfinished_files())
+            self.assertEqual(len(unfinished_files), 2)
+            self.assertIn("file2", unfinished_files)
+
+            first_path = (set(unfinished_files) - {"file2"}).pop()
+            file1_hash = gen_random_file_hash()
+            home.set_file_hash(first_path, file1_hash)
+            self.assertEqual(home.files["file1"], file1_hash)
+            self.assertEqual(home.files["file1.link"], file1_hash)
+            self.assertEqual(home.state["finished"], 2)
+            self.assertListEqual(
+                sorted(next(home.iter_duplicates())), ["file1", "file1.link"]
+            )
+
+    def test_stream_files_with_duplicates_only(self):
+        with tempfile.TemporaryDirectory() as home_dir:
+            content = os.urandom(10)
+            for file_path in ("var/file1", "file2"):
+                full_path = os.path.join(home_dir, file_path)
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                with open(full_path, "wb") as f:
+                    f.write(content)
+            with open(os.path.join(home_dir, "file3"), "wb") as f:
+                f.write(os.urandom(20))
+            os.link(
+                os.path.join(home_dir, "file3"),
+                os.path.join(home_dir, "file3.link"),
+            )
+
+            async def stream_files():
+                return [
+                    path
+                    async for paths in home.stream_files(max_workers=2)
+                    for path in paths
+                ]
+
+            home = Home(home_dir, duplicates_only=True)
+            got_paths = asyncio.run(stream_files())
+            # file3 and its hardlink are of a unique size
+            self.assertListEqual(sorted(got_paths), ["file2", "var/file1"])
+            self.assertEqual(home.state["skipped"], 2)
+            self.assertFalse(home.finished)
+            file_hash = gen_random_file_hash()
+            for path in got_paths:
+                home.set_file_hash(path, file_hash)
+            self.assertTrue(home.finished)
 
 
 if __name__ == "__main__":
@@ -1,7 +1,18 @@
+import os.path
+import time
 import unittest
 
+from distributed.chunks import get_chunk_key
+from distributed.pull.master import Master
+
+from ...util import create_fake_config
+
 
 class MasterTestCase(unittest.TestCase):
+    def setUp(self):
+        home_dir = "/does/not/exist"
+        self.master = Master(home_dir)
+
     def test_worker_register(self):
         pass
 
@@ -17,14 +28,142 @@ class MasterTestCase(unittest.TestCase):
     def test_iter_timeout_files(self):
         pass
 
+    def _create_master_of_processing_files(self):
+        fake_config = create_fake_config(WORKER_PROCESSING_TIMEOUT_SECONDS=0)
+        master = Master(os.path.dirname(__file__), config=fake_config)
+        master.worker_register("worker-1")
+        master.worker_register("worker-2")
+        master.new_processing_file("worker-1", "__init__.py")
+        master.new_processing_file(
+            "worker-2", get_chunk_key("test_master.py", 0)
+        )
+        master.new_processing_file("worker-2", "test_master.py")
+        return master
+
     def test_get_earlist_timeout_file(self):
-        pass
+        master = self._create_master_of_processing_files()
+        time.sleep(0.01)
+        worker_name, file_path, _ = master.get_earlist_timeout_file()
+        self.assertEqual((worker_name, file_path), ("worker-1", "__init__.py"))
+
+        master.file_processing_finished("worker-1", "__init__.py", "0" * 40)
+        worker_name, file_path, _ = master.get_earlist_timeout_file()
+        self.assertEqual(
+            (worker_name, file_path),
+            ("worker-2", get_chunk_key("test_master.py", 0)),
+        )
+        worker_name, file_path, _ = master.get_earlist_timeout_file(
+            chunks=False
+        )
+        self.assertEqual(
+            (worker_name, file_path), ("worker-2", "test_master.py")
+        )
+
+        # leased to other worker again
+        master.remove_current_processing_file("worker-2", "test_master.py")
+        master.new_processing_file("worker-1", "test_master.py")
+        time.sleep(0.01)
+        worker_name, file_path, _ = master.get_earlist_timeout_file(
+            chunks=False
+        )
+        self.assertEqual(
+            (worker_name, file_path), ("worker-1", "test_master.py")
+        )
+
+    def test_stale_deadlines_dropped(self):
+        master = self._create_master_of_processing_files()
+        for _ in range(1000):
+            master.new_processing_file("worker-1", "__init__.py")
+            master.file_processing_finished(
+                "worker-1", "__init__.py", "0" * 40
+            )
+        self.assertLessEqual(
+            len(master._file_deadlines) + len(master._chunk_deadlines), 100
+        )
+        time.sleep(0.01)
+        worker_name, file_path, _ = master.get_earlist_timeout_file()
+        self.assertEqual(
+            (worker_name, file_path),
+            ("worker-2", get_chunk_key("test_master.py", 0)),
+        )
+
+    def test_file_processing_failed(self):
+        master = self._create_master_of_processing_files()
+        master.home.files = {"__init__.py": None, "test_master.py": None}
+        master.file_processing_failed("worker-1", "__init__.py")
+        self.assertFalse(master.is_processing_file("worker-1", "__init__.py"))
+        self.assertEqual(master.home.state["failed"], 1)
+
+        # other chunks of a failed file are dropped
+        master._queue_file_chunks("test_master.py", 3)
+        master.file_processing_failed(
+            "worker-2", get_chunk_key("test_master.py", 0)
+        )
+        self.assertFalse(master.has_queued_chunks())
+        self.assertEqual(master.home.state["failed"], 2)
+        master.file_processing_finished(
+            "worker-2", "test_master.py", "0" * 40
+        )
+        self.assertFalse(master.has_processing_files())
 
     def test_has_processing_files(self):
-        pass
+        master = self._create_master_of_processing_files()
+        self.assertTrue(master.has_processing_files())
+        master.file_processing_finished("worker-1", "__init__.py", "0" * 40)
+        master.remove_current_processing_file(
+            "worker-2", get_chunk_key("test_master.py", 0)
+        )
+        self.assertTrue(master.has_processing_files())
+        master.file_processing_finished(
+            "worker-2", "test_master.py", "0" * 40
+        )
+        self.assertFalse(master.has_processing_files())
 
     def test_remove_current_processing_file(self):
-        pass
+        master = self._create_master_of_processing_files()
+        master.remove_current_processing_file("worker-1", "__init__.py")
+        self.assertFalse(master.is_processing_file("worker-1", "__init__.py"))
+        # removing twice does not count twice
+        master.remove_current_processing_file("worker-1", "__init__.py")
+        self.assertTrue(master.has_processing_files())
+
+    def test_evict_silent_workers(self):
+        master = self._create_master_of_processing_files()
+        master.config.MASTER_WORKER_EVICT_SECONDS = 0.01
+        time.sleep(0.02)
+        master.worker_seen("worker-1")
+        self.assertEqual(master.evict_silent_workers(), ["worker-2"])
+        self.assertFalse(master.worker_registered("worker-2"))
+        self.assertTrue(master.worker_registered("worker-1"))
+        # processing files of evicted worker are requeued at once
+        self.assertEqual(
+            master.chunks_queue.get_nowait(),
+            get_chunk_key("test_master.py", 0),
+        )
+        self.assertEqual(master.files_queue.get_nowait(), "test_master.py")
+        worker_name, file_path, _ = master.get_earlist_timeout_file()
+        self.assertEqual((worker_name, file_path), ("worker-1", "__init__.py"))
+        master.file_processing_finished("worker-1", "__init__.py", "0" * 40)
+        self.assertFalse(master.has_processing_files())
+
+    def test_is_slow_worker(self):
+        for worker_name, seconds in (
+            ("worker-1", 1),
+            ("worker-2", 2),
+            ("worker-3", 3),
+            ("worker-4", 0),
+        ):
+            self.master.worker_register(worker_name)
+            worker = self.master._get_worker(worker_name)
+            worker._total_file_size = 100 if seconds else 0
+            worker._total_processing_seconds = seconds
+        self.master._update_median_speed()
+
+        self.assertFalse(self.master.is_slow_worker("worker-1"))
+        self.assertFalse(self.master.is_slow_worker("worker-2"))
+        self.assertTrue(self.master.is_slow_worker("worker-3"))
+        # unknown yet
+        self.assertFalse(self.master.is_slow_worker("worker-4"))
 
 
 if __name__ == "__main__":
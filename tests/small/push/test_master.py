@@ -0,0 +1,27 @@
+import os.path
+import unittest
+
+from distributed.push.master import Master
+
+
+class MasterTestCase(unittest.TestCase):
+    def setUp(self):
+        self.master = Master(os.path.dirname(__file__))
+
+    def test_pick_worker(self):
+        worker1, worker2, *_ = self.master.workers
+        self.assertIsNone(self.master._pick_worker())
+
+        worker1.idle = 1
+        worker2.idle = 2
+        self.assertIs(self.master._pick_worker(), worker2)
+
+        # the least busy host first
+        worker1.idle = 2
+        worker1.cpu_percent = 50.0
+        worker2.cpu_percent = 90.0
+        self.assertIs(self.master._pick_worker(), worker1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import os
+import unittest
+
+from distributed.bundles import (
+    hash_bundle,
+    pack_failed_frame,
+    pack_frame_header,
+)
+
+from ..util import calc_file_hash
+
+
+def create_read_exactly(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader.readexactly
+
+
+class BundlesTestCase(unittest.TestCase):
+    def test_hash_bundle(self):
+        files = {
+            "empty": b"",
+            "dir/file": os.urandom(4096),
+            "dir/中文": os.urandom(100 * 1024 + 1),
+        }
+        data = b"".join(
+            pack_frame_header(file_path, len(content)) + content
+            for file_path, content in files.items()
+        )
+
+        async def hash_bundle_data():
+            return await hash_bundle(create_read_exactly(data), 1024, ["sha1"])
+
+        got_hashes = asyncio.run(hash_bundle_data())
+        expected_hashes = {
+            file_path: {"sha1": calc_file_hash(content)}
+            for file_path, content in files.items()
+        }
+        self.assertEqual(got_hashes, expected_hashes)
+
+    def test_hash_bundle_while_truncated(self):
+        data = pack_frame_header("file", 10) + b"0" * 9
+
+        async def hash_bundle_data():
+            return await hash_bundle(create_read_exactly(data), 1024, ["sha1"])
+
+        with self.assertRaises(asyncio.IncompleteReadError):
+            asyncio.run(hash_bundle_data())
+
+
+    def test_hash_bundle_with_failed_frame(self):
+        data = (
+            pack_frame_header("failed", 10)
+            + bytes(10)
+            + pack_failed_frame("failed")
+            + pack_frame_header("file", 1)
+            + b"0"
+        )
+
+        async def hash_bundle_data():
+            return await hash_bundle(create_read_exactly(data), 1024, ["sha1"])
+
+        got_hashes = asyncio.run(hash_bundle_data())
+        self.assertEqual(got_hashes, {"file": {"sha1": calc_file_hash(b"0")}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+import hashlib
+import unittest
+
+from distributed.chunks import (
+    calc_tree_hash,
+    get_chunk_key,
+    get_chunk_range,
+    get_chunks_number,
+    is_chunk_key,
+    split_chunk_key,
+)
+
+from ..util import calc_file_hash
+
+
+class ChunksTest(unittest.TestCase):
+    def test_chunk_key(self):
+        key = get_chunk_key("var/dir1/file1", 3)
+        self.assertTrue(is_chunk_key(key))
+        self.assertTupleEqual(split_chunk_key(key), ("var/dir1/file1", 3))
+
+        self.assertFalse(is_chunk_key("var/dir1/file1"))
+        self.assertTupleEqual(
+            split_chunk_key("var/dir1/file1"), ("var/dir1/file1", None)
+        )
+
+    def test_get_chunks_number(self):
+        self.assertEqual(get_chunks_number(0, 10), 0)
+        self.assertEqual(get_chunks_number(1, 10), 1)
+        self.assertEqual(get_chunks_number(10, 10), 1)
+        self.assertEqual(get_chunks_number(11, 10), 2)
+
+    def test_get_chunk_range(self):
+        self.assertTupleEqual(get_chunk_range(25, 10, 0), (0, 10))
+        self.assertTupleEqual(get_chunk_range(25, 10, 1), (10, 10))
+        self.assertTupleEqual(get_chunk_range(25, 10, 2), (20, 5))
+
+    def test_calc_tree_hash(self):
+        chunk_hashes = [calc_file_hash(b"chunk1"), calc_file_hash(b"chunk2")]
+        got_hash = calc_tree_hash(chunk_hashes)
+        expected_hash = hashlib.new(
+            "sha1",
+            hashlib.new("sha1", b"chunk1").digest()
+            + hashlib.new("sha1", b"chunk2").digest(),
+        ).hexdigest()
+        self.assertEqual(got_hash, expected_hash)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from distributed.compression import CompressionPolicy
+
+from ..util import create_fake_config
+
+
+class CompressionPolicyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.fake_config = create_fake_config(
+            COMPRESSION=True, COMPRESSION_MAX_CPU_PERCENT=100
+        )
+
+    def test_should_compress(self):
+        policy = CompressionPolicy(self.fake_config)
+        self.assertTrue(policy.should_compress("dir/file.log", 1024 * 1024))
+        self.assertTrue(policy.should_compress("dir/file", 1024 * 1024))
+        # small file
+        self.assertFalse(policy.should_compress("dir/file.log", 1))
+        # already compressed file types
+        self.assertFalse(policy.should_compress("dir/file.gz", 1024 * 1024))
+        self.assertFalse(policy.should_compress("dir/file.JPG", 1024 * 1024))
+
+    def test_should_compress_while_disabled(self):
+        self.fake_config.COMPRESSION = False
+        policy = CompressionPolicy(self.fake_config)
+        self.assertFalse(policy.should_compress("dir/file.log", 1024 * 1024))
+
+    def test_should_compress_while_cpu_busy(self):
+        self.fake_config.COMPRESSION_MAX_CPU_PERCENT = 0
+        policy = CompressionPolicy(self.fake_config)
+        self.assertFalse(policy.should_compress("dir/file.log", 1024 * 1024))
+
+
+if __name__ == "__main__":
+    unittest.main()
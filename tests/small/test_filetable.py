@@ -0,0 +1,75 @@
+import unittest
+
+from distributed.filetable import CompactFileTable
+
+from ..util import gen_random_file_hash
+
+
+class CompactFileTableTest(unittest.TestCase):
+    def setUp(self):
+        self.table = CompactFileTable()
+
+    def test_set_and_get(self):
+        file1_hash = gen_random_file_hash()
+        self.table["file1"] = None
+        self.table["var/dir1/file1"] = file1_hash
+        self.table["var/dir1/file2"] = None
+        self.assertIsNone(self.table["file1"])
+        self.assertEqual(self.table["var/dir1/file1"], file1_hash)
+        self.assertIsNone(self.table["var/dir1/file2"])
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(len(self.table._dirs), 2)
+
+        with self.assertRaises(KeyError):
+            self.table["var/dir1/file3"]
+        with self.assertRaises(KeyError):
+            self.table["var/dir2/file1"]
+
+    def test_set_invalid_hash(self):
+        with self.assertRaises(ValueError):
+            self.table["var/file1"] = "0"
+
+    def test_contains(self):
+        self.table["var/file1"] = None
+        self.assertIn("var/file1", self.table)
+        self.assertNotIn("var/file2", self.table)
+        self.assertNotIn("file1", self.table)
+
+    def test_iter(self):
+        file1_hash = gen_random_file_hash()
+        files = {
+            "file1": None,
+            "var/dir1/file1": file1_hash,
+            "var/dir2/file2": None,
+        }
+        self.table.update(files)
+        self.assertListEqual(list(self.table), list(files))
+        self.assertDictEqual(dict(self.table), files)
+
+    def test_delete(self):
+        self.table["var/file1"] = gen_random_file_hash()
+        self.table["var/file2"] = None
+        del self.table["var/file1"]
+        self.assertNotIn("var/file1", self.table)
+        self.assertListEqual(list(self.table), ["var/file2"])
+        self.assertEqual(len(self.table), 1)
+
+        with self.assertRaises(KeyError):
+            del self.table["var/file1"]
+
+        # add it back
+        self.table["var/file1"] = None
+        self.assertListEqual(list(self.table), ["var/file2", "var/file1"])
+
+    def test_sizes(self):
+        self.table["var/file1"] = None
+        self.table.sizes["var/file1"] = 2 ** 40
+        self.assertEqual(self.table.sizes["var/file1"], 2 ** 40)
+        self.assertEqual(self.table.sizes.get("var/file2", 0), 0)
+
+        with self.assertRaises(KeyError):
+            self.table.sizes["var/file2"] = 1
+
+
+if __name__ == "__main__":
+    unittest.main()
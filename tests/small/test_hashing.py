@@ -0,0 +1,36 @@
+import hashlib
+import unittest
+
+from distributed import hashing
+from distributed.hashing import MultiHash, new_hash, parse_hash_algorithms
+
+
+class HashingTest(unittest.TestCase):
+    def test_multi_hash(self):
+        h = MultiHash(["sha1", "sha256", "blake2b"])
+        h.update(b"chunk1")
+        h.update(b"chunk2")
+        expected_hashes = {
+            "sha1": hashlib.sha1(b"chunk1chunk2").hexdigest(),
+            "sha256": hashlib.sha256(b"chunk1chunk2").hexdigest(),
+            "blake2b": hashlib.blake2b(b"chunk1chunk2").hexdigest(),
+        }
+        self.assertDictEqual(h.hexdigests(), expected_hashes)
+
+    def test_parse_hash_algorithms(self):
+        self.assertListEqual(parse_hash_algorithms(None), ["sha1"])
+        self.assertListEqual(parse_hash_algorithms(""), ["sha1"])
+        self.assertListEqual(
+            parse_hash_algorithms("sha256, sha1"), ["sha256", "sha1"]
+        )
+        with self.assertRaises(ValueError):
+            parse_hash_algorithms("sha1,does-not-exist")
+
+    @unittest.skipIf(hashing.xxhash is not None, "xxhash installed")
+    def test_new_hash_without_xxhash(self):
+        with self.assertRaises(ValueError):
+            new_hash("xxh64")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,6 +27,93 @@ class HomeTest(unittest.TestCase):
         }
         self.assertDictEqual(got_files, expected_files)
 
+    def test_set_file_hash_with_extra_hashes(self):
+        home = Home("/does/not/exist", algorithms=["sha1", "sha256"])
+        home.files = {"var/file1": None, "var/file2": None}
+        file1_hash = gen_random_file_hash()
+        file1_sha256_hash = "0" * 64
+        home.set_file_hash(
+            "var/file1",
+            file1_hash,
+            {"sha256": file1_sha256_hash, "md5": "0" * 32},
+        )
+        self.assertEqual(home.files["var/file1"], file1_hash)
+        self.assertDictEqual(
+            home.get_file_hashes("var/file1"),
+            {"sha1": file1_hash, "sha256": file1_sha256_hash},
+        )
+        self.assertDictEqual(home.get_file_hashes("var/file2"), {})
+        self.assertEqual(home.state["finished"], 1)
+
+    def test_set_file_hash_while_invalid(self):
+        for compact in (False, True):
+            with self.subTest(compact=compact):
+                home = Home("/does/not/exist", compact=compact)
+                home.files = {"var/file1": None}
+                for file_hash in ("zz", "0" * 38):
+                    with self.assertRaises(ValueError):
+                        home.set_file_hash("var/file1", file_hash)
+                self.assertIsNone(home.files["var/file1"])
+                self.assertEqual(home.state["finished"], 0)
+                self.assertFalse(home.finished)
+
+    def test_set_file_failed(self):
+        self.home.file_sizes = {"var/file1": 1, "var/file2": 10}
+        self.home.files = {"var/file1": None, "var/file2": None}
+
+        self.home.set_file_failed("var/file1")
+        self.assertDictEqual(
+            self.home.state,
+            {
+                "total": 2,
+                "finished": 0,
+                "bytes_total": 11,
+                "bytes_finished": 0,
+                "failed": 1,
+            },
+        )
+        self.assertListEqual(
+            list(self.home.iter_unfinished_files()), ["var/file2"]
+        )
+        self.assertFalse(self.home.finished)
+
+        self.home.set_file_hash("var/file2", gen_random_file_hash())
+        self.assertTrue(self.home.finished)
+
+        # hashed at last
+        self.home.set_file_hash("var/file1", gen_random_file_hash())
+        self.assertEqual(self.home.state["finished"], 2)
+        self.assertNotIn("failed", self.home.state)
+
+    def test_set_file_tree_hash(self):
+        self.home.file_sizes = {"var/file1": 1, "var/file2": 10}
+        self.home.files = {"var/file1": None, "var/file2": None}
+
+        tree_hash = gen_random_file_hash()
+        self.home.set_file_tree_hash("var/file2", tree_hash, finished=True)
+        self.assertEqual(self.home.tree_hashes["var/file2"], tree_hash)
+        self.assertIsNone(self.home.files["var/file2"])
+        self.assertDictEqual(
+            self.home.state,
+            {
+                "total": 2,
+                "finished": 1,
+                "bytes_total": 11,
+                "bytes_finished": 10,
+                "tree_hashed": 1,
+            },
+        )
+        self.assertListEqual(
+            list(self.home.iter_unfinished_files()), ["var/file1"]
+        )
+
+        # plain hash set later is not counted twice
+        self.home.set_file_hash("var/file2", gen_random_file_hash())
+        self.home.set_file_hash("var/file1", gen_random_file_hash())
+        self.assertEqual(self.home.state["finished"], 2)
+        self.assertNotIn("tree_hashed", self.home.state)
+        self.assertTrue(self.home.finished)
+
     def test_get_full_path(self):
         path = "var/file1"
         got_path = self.home.get_full_path(path)
@@ -55,12 +142,22 @@ class HomeTest(unittest.TestCase):
         self.assertTrue(self.home.finished)
 
     def test_state(self):
+        self.home.file_sizes = {
+            "var/file1": 1,
+            "var/dir1/file1": 10,
+            "var/dir2/file2": 100,
+        }
         self.home.files = {
             "var/file1": None,
             "var/dir1/file1": None,
             "var/dir2/file2": None,
         }
-        expected_state = {"total": 3, "finished": 0}
+        expected_state = {
+            "total": 3,
+            "finished": 0,
+            "bytes_total": 111,
+            "bytes_finished": 0,
+        }
         self.assertDictEqual(self.home.state, expected_state)
 
         self.home.files = {
@@ -68,7 +165,12 @@ class HomeTest(unittest.TestCase):
             "var/dir1/file1": gen_random_file_hash(),
             "var/dir2/file2": None,
         }
-        expected_state = {"total": 3, "finished": 1}
+        expected_state = {
+            "total": 3,
+            "finished": 1,
+            "bytes_total": 111,
+            "bytes_finished": 10,
+        }
         self.assertDictEqual(self.home.state, expected_state)
 
         self.home.files = {
@@ -76,8 +178,41 @@ class HomeTest(unittest.TestCase):
             "var/dir1/file1": gen_random_file_hash(),
             "var/dir2/file2": gen_random_file_hash(),
         }
-        expected_state = {"total": 3, "finished": 3}
+        expected_state = {
+            "total": 3,
+            "finished": 3,
+            "bytes_total": 111,
+            "bytes_finished": 111,
+        }
+        self.assertDictEqual(self.home.state, expected_state)
+
+    def test_state_after_set_file_hash(self):
+        self.home.file_sizes = {"var/file1": 1, "var/dir1/file1": 10}
+        self.home.files = {"var/file1": None, "var/dir1/file1": None}
+
+        self.home.set_file_hash("var/dir1/file1", gen_random_file_hash())
+        expected_state = {
+            "total": 2,
+            "finished": 1,
+            "bytes_total": 11,
+            "bytes_finished": 10,
+        }
         self.assertDictEqual(self.home.state, expected_state)
+        self.assertFalse(self.home.finished)
+
+        # override file hash
+        self.home.set_file_hash("var/dir1/file1", gen_random_file_hash())
+        self.assertDictEqual(self.home.state, expected_state)
+
+        self.home.set_file_hash("var/file1", gen_random_file_hash())
+        expected_state = {
+            "total": 2,
+            "finished": 2,
+            "bytes_total": 11,
+            "bytes_finished": 11,
+        }
+        self.assertDictEqual(self.home.state, expected_state)
+        self.assertTrue(self.home.finished)
 
 
 if __name__ == "__main__":
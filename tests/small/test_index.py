@@ -0,0 +1,40 @@
+import unittest
+
+from distributed.index import HashIndex
+
+from ..util import gen_random_file_hash
+
+
+class HashIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = HashIndex(":memory:", commit_every=2)
+
+    def tearDown(self):
+        self.index.close()
+
+    def test_get_file_hash(self):
+        file_hash = gen_random_file_hash()
+        self.index.set_file_hash("var/file1", (10, 1000, 1), file_hash)
+        got_hash = self.index.get_file_hash("var/file1", (10, 1000, 1))
+        self.assertEqual(got_hash, file_hash)
+
+    def test_get_file_hash_while_signature_changed(self):
+        file_hash = gen_random_file_hash()
+        self.index.set_file_hash("var/file1", (10, 1000, 1), file_hash)
+        self.assertIsNone(self.index.get_file_hash("var/file1", (11, 1000, 1)))
+        self.assertIsNone(self.index.get_file_hash("var/file1", (10, 1001, 1)))
+        self.assertIsNone(self.index.get_file_hash("var/file1", (10, 1000, 2)))
+
+    def test_get_file_hash_while_file_not_indexed(self):
+        self.assertIsNone(self.index.get_file_hash("var/file1", (0, 0, 0)))
+
+    def test_set_file_hash_override(self):
+        file_hash = gen_random_file_hash()
+        self.index.set_file_hash("var/file1", (10, 1000, 1), "0" * 40)
+        self.index.set_file_hash("var/file1", (11, 1001, 1), file_hash)
+        got_hash = self.index.get_file_hash("var/file1", (11, 1001, 1))
+        self.assertEqual(got_hash, file_hash)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import os.path
+import tempfile
+import unittest
+
+from distributed.journal import HashJournal
+
+from ..util import gen_random_file_hash
+
+
+class HashJournalTest(unittest.TestCase):
+    def setUp(self):
+        _tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(_tmp_dir.cleanup)
+        self.journal_path = os.path.join(_tmp_dir.name, "journal")
+        self.journal = HashJournal(self.journal_path, commit_every=2)
+
+    def tearDown(self):
+        self.journal.close()
+
+    def test_get_file_hash(self):
+        file_hash = gen_random_file_hash()
+        self.journal.set_file_hash("var/file1", (10, 1000, 1), file_hash)
+        got_hash = self.journal.get_file_hash("var/file1", (10, 1000, 1))
+        self.assertEqual(got_hash, file_hash)
+        self.assertIsNone(
+            self.journal.get_file_hash("var/file1", (11, 1000, 1))
+        )
+        self.assertIsNone(self.journal.get_file_hash("var/file2", (0, 0, 0)))
+
+    def test_get_file_hash_after_reopen(self):
+        file1_hash = gen_random_file_hash()
+        file2_hash = gen_random_file_hash()
+        self.journal.set_file_hash("var/file1", (10, 1000, 1), "0" * 40)
+        self.journal.set_file_hash("var/file1", (10, 1000, 1), file1_hash)
+        self.journal.set_file_hash("var/file2", (20, 2000, 2), file2_hash)
+        self.journal.close()
+
+        # torn line written while crashing
+        with open(self.journal_path, "a") as f:
+            f.write('{"path": "var/file3", "si')
+
+        self.journal = HashJournal(self.journal_path)
+        self.assertEqual(
+            self.journal.get_file_hash("var/file1", (10, 1000, 1)),
+            file1_hash,
+        )
+        self.assertEqual(
+            self.journal.get_file_hash("var/file2", (20, 2000, 2)),
+            file2_hash,
+        )
+        self.assertIsNone(self.journal.get_file_hash("var/file3", (0, 0, 0)))
+
+        # lines appended after the torn line are kept
+        file4_hash = gen_random_file_hash()
+        self.journal.set_file_hash("var/file4", (40, 4000, 4), file4_hash)
+        self.journal.close()
+        self.journal = HashJournal(self.journal_path)
+        self.assertEqual(
+            self.journal.get_file_hash("var/file4", (40, 4000, 4)),
+            file4_hash,
+        )
+
+    def test_commit_explicitly(self):
+        journal = HashJournal(self.journal_path, commit_every=None)
+        self.addCleanup(journal.close)
+        for i in range(3):
+            journal.set_file_hash(
+                f"var/file{i}", (10, 1000, i), gen_random_file_hash()
+            )
+        self.assertEqual(journal.uncommitted, 3)
+        journal.commit()
+        self.assertEqual(journal.uncommitted, 0)
+
+    def test_compact(self):
+        for _ in range(5):
+            self.journal.set_file_hash(
+                "var/file1", (10, 1000, 1), gen_random_file_hash()
+            )
+        self.journal.close()
+
+        self.journal = HashJournal(self.journal_path)
+        with open(self.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+    def test_flush_and_sync(self):
+        self.journal.set_file_hash(
+            "var/file1", (10, 1000, 1), gen_random_file_hash()
+        )
+        self.assertEqual(self.journal.uncommitted, 1)
+        self.journal.flush()
+        self.journal.sync()
+        self.assertEqual(self.journal.uncommitted, 0)
+        with open(self.journal_path) as f:
+            self.assertEqual(len(f.readlines()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import random
+import unittest
+
+from distributed.queues import FileSizeQueue
+
+
+class FileSizeQueueTest(unittest.TestCase):
+    def setUp(self):
+        self.file_sizes = {
+            "var/file1": 10,
+            "var/file2": 1000,
+            "var/file3": 1,
+            "var/file4": 100,
+        }
+
+    def test_get_largest_first(self):
+        async def run():
+            queue = FileSizeQueue(self.file_sizes)
+            for path in self.file_sizes:
+                queue.put_nowait(path)
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        got_paths = asyncio.run(run())
+        expected_paths = ["var/file2", "var/file4", "var/file1", "var/file3"]
+        self.assertListEqual(got_paths, expected_paths)
+
+    def test_get_from_both_ends(self):
+        async def run():
+            queue = FileSizeQueue(self.file_sizes)
+            for path in self.file_sizes:
+                queue.put_nowait(path)
+            paths = [
+                queue.get_smallest_nowait(),
+                queue.get_nowait(),
+                queue.get_smallest_nowait(),
+                queue.get_nowait(),
+            ]
+            self.assertTrue(queue.empty())
+            with self.assertRaises(asyncio.QueueEmpty):
+                queue.get_smallest_nowait()
+            with self.assertRaises(asyncio.QueueEmpty):
+                queue.get_nowait()
+
+            # put back
+            queue.put_nowait("var/file1")
+            paths.append(queue.get_nowait())
+            return paths
+
+        got_paths = asyncio.run(run())
+        expected_paths = [
+            "var/file3",
+            "var/file2",
+            "var/file1",
+            "var/file4",
+            "var/file1",
+        ]
+        self.assertListEqual(got_paths, expected_paths)
+
+    def test_get_from_both_ends_randomly(self):
+        file_sizes = {
+            f"var/file{i}": random.randint(0, 100) for i in range(500)
+        }
+
+        async def run():
+            queue = FileSizeQueue(file_sizes)
+            queued_sizes = []
+            for path, size in file_sizes.items():
+                queue.put_nowait(path)
+                queued_sizes.append(size)
+                if random.random() < 0.3:
+                    continue
+                while queued_sizes and random.random() < 0.5:
+                    if random.random() < 0.5:
+                        size = file_sizes[queue.get_nowait()]
+                        self.assertEqual(size, max(queued_sizes))
+                    else:
+                        size = file_sizes[queue.get_smallest_nowait()]
+                        self.assertEqual(size, min(queued_sizes))
+                    queued_sizes.remove(size)
+            self.assertEqual(queue.qsize(), len(queued_sizes))
+            got_sizes = [
+                file_sizes[queue.get_nowait()] for _ in range(queue.qsize())
+            ]
+            self.assertListEqual(got_sizes, sorted(queued_sizes, reverse=True))
+
+        asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
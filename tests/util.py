@@ -1,6 +1,8 @@
 import hashlib
 import os
 import random
+import types
+from typing import Any
 
 from distributed import config
 
@@ -9,6 +11,16 @@ def calc_file_hash(chunk: bytes) -> str:
     return hashlib.new("sha1", chunk).hexdigest()
 
 
+def create_fake_config(**kwargs: Any) -> types.SimpleNamespace:
+    """Copy of default config with some items overridden"""
+    fake_config = types.SimpleNamespace(
+        **{k: getattr(config, k) for k in dir(config) if k.isupper()}
+    )
+    for k, v in kwargs.items():
+        setattr(fake_config, k, v)
+    return fake_config
+
+
 def gen_random_file_hash() -> str:
     size = random.randint(0, config.CHUNK_SIZE * 3)
     chunk = os.urandom(size)